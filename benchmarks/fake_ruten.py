@@ -0,0 +1,330 @@
+"""本地假露天 API 伺服器
+
+模擬 partner.ruten.com.tw：驗證 X-RT-* 簽章，提供指定數量的合成商品、訂單與分類，
+並可注入延遲與錯誤。可單獨啟動後將 RUTEN_BASE_URL 指向它：
+
+    python benchmarks/fake_ruten.py --port 8900 --products 5000 --orders 5000 --latency-ms 50 --error-rate 0.01
+
+    RUTEN_BASE_URL=http://127.0.0.1:8900 RUTEN_API_KEY=bench-key \\
+    RUTEN_SECRET_KEY=bench-secret RUTEN_SALT_KEY=bench-salt flask --app src.main:create_app run
+
+GET /__stats 回傳各端點的請求數、簽章失敗與注入錯誤的次數（不需簽章）。
+--shops N 會另外建立 N-1 個商店帳號（bench-key-1、bench-secret-1、bench-salt-1…），
+各自擁有不重複編號的商品與訂單，依 X-RT-Key 區分，用於測試多商店同步。
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import math
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CREDENTIALS = {'api_key': 'bench-key', 'secret_key': 'bench-secret', 'salt_key': 'bench-salt'}
+# 與露天相同，時間戳記誤差超過 5 分鐘即拒絕
+MAX_TIMESTAMP_SKEW = 300
+ORDER_STATUSES = ['pending', 'shipped', 'completed', 'cancelled']
+ORDER_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# 各商店帳號的商品與訂單編號間隔
+ID_SPACING = 100000000
+
+_ERROR_PAGE = b'<html><head><title>%d</title></head><body>cloudflare</body></html>'
+
+class FakeRuten:
+    """合成資料與伺服器設定；start() 在背景執行緒啟動 HTTP 伺服器"""
+
+    def __init__(self, products=1000, orders=1000, categories=50, latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, error_statuses=(500, 502, 503, 429), seed=42, credentials=None, shops=1,
+                 tenant=0):
+        self.tenant = tenant
+        self.credentials = dict(DEFAULT_CREDENTIALS, **(credentials or {}))
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.categories = self._generate_categories(categories)
+        self.products = self._generate_products(products)
+        self.products_by_id = {product['item_id']: product for product in self.products}
+        self.products_by_custom_no = {product['custom_no']: product for product in self.products}
+        self.orders = self._generate_orders(orders)
+        # 其他商店帳號：{api_key: FakeRuten}，只使用其資料與簽章驗證
+        self.tenants = {}
+        for index in range(1, shops):
+            credentials = {name: f'{value}-{index}' for name, value in DEFAULT_CREDENTIALS.items()}
+            self.tenants[credentials['api_key']] = FakeRuten(products, orders, categories, seed=seed + index,
+                                                             credentials=credentials, tenant=index)
+        self.server = None
+
+    def _generate_categories(self, count):
+        rng = self._random
+        categories = []
+        for index in range(count):
+            parent = categories[rng.randrange(index)]['category_id'] if index >= 5 else None
+            categories.append({'category_id': str(100 + index), 'name': f'分類 {index}', 'parent_id': parent})
+        return categories
+
+    def _item_id(self, index):
+        return str(21000000000000 + self.tenant * ID_SPACING + index)
+
+    def _custom_no(self, index):
+        # 各賣場的 SKU 刻意重複（商品編號不同），用來驗證自訂編號只在賣場內唯一
+        return f'SKU-{index:06d}'
+
+    def _generate_products(self, count):
+        rng = self._random
+        return [{
+            'item_id': self._item_id(index),
+            'custom_no': self._custom_no(index),
+            'title': f'測試商品 {index} {rng.choice(["黑色", "白色", "藍色", "M", "L"])}',
+            'description': f'合成商品資料 #{index}',
+            'price': rng.randint(10, 20000),
+            'stock': rng.randint(0, 500),
+            'status': 'online' if rng.random() < 0.9 else 'offline',
+            'category_id': rng.choice(self.categories)['category_id'] if self.categories else None
+        } for index in range(count)]
+
+    def _generate_orders(self, count):
+        rng = self._random
+        now = datetime.now().replace(microsecond=0)
+        orders = []
+        for index in range(count):
+            items = []
+            for product in rng.sample(self.products, min(len(self.products), rng.randint(1, 3))):
+                quantity = rng.randint(1, 5)
+                items.append({'item_id': product['item_id'], 'title': product['title'],
+                              'price': product['price'], 'quantity': quantity})
+            orders.append({
+                'order_id': str(30000000000 + self.tenant * ID_SPACING + index),
+                'buyer_name': f'買家{rng.randint(1, 9999):04d}',
+                'total_amount': sum(item['price'] * item['quantity'] for item in items),
+                'status': rng.choice(ORDER_STATUSES),
+                'order_date': (now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))).strftime(ORDER_DATE_FORMAT),
+                'items': items
+            })
+        orders.sort(key=lambda order: order['order_date'], reverse=True)
+        return orders
+
+    # -- 簽章驗證 --------------------------------------------------------
+
+    def _signature(self, path, body, timestamp):
+        sign_string = f"{self.credentials['salt_key']}{path}{body}{timestamp}"
+        return hmac.new(self.credentials['secret_key'].encode('utf-8'), sign_string.encode('utf-8'),
+                        hashlib.sha256).hexdigest()
+
+    def verify(self, headers, path, body):
+        """回傳錯誤訊息；簽章正確時回傳 None"""
+        if headers.get('X-RT-Key') != self.credentials['api_key']:
+            return 'invalid api key'
+        timestamp = headers.get('X-RT-Timestamp', '')
+        if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > MAX_TIMESTAMP_SKEW:
+            return 'timestamp expired'
+        signature = headers.get('X-RT-Authorization', '')
+        candidates = [body]
+        # 客戶端以 json.dumps(data) 簽章，但 POST 以表單編碼送出，值皆為字串時仍可還原
+        if body and '=' in body and not body.lstrip().startswith('{'):
+            candidates.append(json.dumps(dict(urllib.parse.parse_qsl(body, keep_blank_values=True))))
+        if not any(hmac.compare_digest(self._signature(path, candidate, timestamp), signature)
+                   for candidate in candidates):
+            return 'signature mismatch'
+        return None
+
+    # -- 端點 ------------------------------------------------------------
+
+    @staticmethod
+    def _page(records, query):
+        page = max(int(query.get('page', 1)), 1)
+        page_size = max(int(query.get('page_size', 30)), 1)
+        start = (page - 1) * page_size
+        return records[start:start + page_size], {
+            'page': page, 'page_size': page_size,
+            'total': len(records), 'pages': math.ceil(len(records) / page_size)
+        }
+
+    def handle(self, method, path, query, body):
+        """回傳 (狀態碼, 回應內容)"""
+        if method == 'GET' and path == '/api/v1/product/list':
+            products, paging = self._page(self.products, query)
+            with self._lock:
+                products = [dict(product) for product in products]
+            return 200, {'status': 'success', 'data': {'products': products, **paging}}
+
+        if method == 'GET' and path.startswith('/api/v1/product/item/'):
+            product = self.products_by_id.get(path.rsplit('/', 1)[1])
+            if product is None:
+                return 404, {'status': 'fail', 'error_code': 'ITEM_NOT_FOUND', 'error_msg': 'item not found'}
+            with self._lock:
+                return 200, {'status': 'success', 'data': dict(product)}
+
+        if method == 'GET' and path == '/api/v1/product/item_id':
+            product = self.products_by_custom_no.get(query.get('custom_no'))
+            return 200, {'status': 'success', 'data': {'item_id': product['item_id']} if product else {}}
+
+        if method == 'PUT' and path == '/api/v1/product/item/stock':
+            payload = json.loads(body or '{}')
+            product = self.products_by_id.get(str(payload.get('item_id')))
+            if product is None:
+                return 404, {'status': 'fail', 'error_code': 'ITEM_NOT_FOUND', 'error_msg': 'item not found'}
+            with self._lock:
+                product['stock'] = int(payload.get('qty', product['stock']))
+            return 200, {'status': 'success', 'data': {'item_id': product['item_id'], 'qty': product['stock']}}
+
+        if method == 'POST' and path == '/api/v1/product/item':
+            with self._lock:
+                index = len(self.products)
+                product = {'item_id': self._item_id(index), 'custom_no': self._custom_no(index),
+                           'title': '', 'description': '', 'price': 0, 'stock': 0, 'status': 'offline',
+                           'category_id': None}
+                self.products.append(product)
+                self.products_by_id[product['item_id']] = product
+                self.products_by_custom_no[product['custom_no']] = product
+            return 200, {'status': 'success', 'data': {'item_id': product['item_id']}}
+
+        if method == 'GET' and path == '/api/v1/order/list':
+            orders = self.orders
+            status = query.get('order_status', 'All')
+            if status and status != 'All':
+                orders = [order for order in orders if order['status'] == status]
+            start_date, end_date = query.get('start_date'), query.get('end_date')
+            if start_date or end_date:
+                def day(order):
+                    return order['order_date'][:10].replace('-', '')
+                orders = [order for order in orders
+                          if (not start_date or day(order) >= start_date) and (not end_date or day(order) <= end_date)]
+            orders, paging = self._page(orders, query)
+            return 200, {'status': 'success', 'data': {'orders': orders, **paging}}
+
+        if method == 'GET' and path == '/api/v1/category/list':
+            return 200, {'status': 'success', 'data': {'categories': self.categories}}
+
+        return 404, {'status': 'fail', 'error_code': 'NOT_FOUND', 'error_msg': f'{method} {path} not found'}
+
+    # -- 伺服器 ----------------------------------------------------------
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _send(self, status, body, content_type='application/json', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _reply(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                parsed = urllib.parse.urlsplit(self.path)
+
+                if parsed.path == '/__stats':
+                    with fake._lock:
+                        stats = dict(fake.stats)
+                    return self._send(200, json.dumps(stats).encode())
+
+                with fake._lock:
+                    fake.stats['requests'] += 1
+                    fake.stats[f'{self.command} {parsed.path}'] += 1
+
+                delay = fake.latency_ms + (fake._random.uniform(0, fake.jitter_ms) if fake.jitter_ms else 0)
+                if delay:
+                    time.sleep(delay / 1000)
+
+                tenant = fake.tenants.get(self.headers.get('X-RT-Key'), fake)
+                error = tenant.verify(self.headers, self.path, body)
+                if error:
+                    with fake._lock:
+                        fake.stats['auth_failures'] += 1
+                    payload = {'status': 'fail', 'error_code': 'UNAUTHORIZED', 'error_msg': error}
+                    return self._send(401, json.dumps(payload).encode())
+
+                if fake.error_rate and fake._random.random() < fake.error_rate:
+                    status = fake._random.choice(fake.error_statuses)
+                    with fake._lock:
+                        fake.stats['injected_errors'] += 1
+                    if status == 429:
+                        payload = {'status': 'fail', 'error_code': 'RATE_LIMITED', 'error_msg': 'too many requests'}
+                        return self._send(429, json.dumps(payload).encode(), headers={'Retry-After': '1'})
+                    # 露天前端為 Cloudflare，5xx 通常是 HTML
+                    return self._send(status, _ERROR_PAGE % status, content_type='text/html')
+
+                query = dict(urllib.parse.parse_qsl(parsed.query))
+                try:
+                    status, payload = tenant.handle(self.command, parsed.path, query, body)
+                except (ValueError, TypeError) as e:
+                    status, payload = 400, {'status': 'fail', 'error_code': 'BAD_REQUEST', 'error_msg': str(e)}
+                self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+            do_GET = do_POST = do_PUT = do_DELETE = _reply
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self, host='127.0.0.1', port=0):
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def env(self):
+        """讓應用程式連到此伺服器所需的環境變數"""
+        return {
+            'RUTEN_BASE_URL': self.url,
+            'RUTEN_API_KEY': self.credentials['api_key'],
+            'RUTEN_SECRET_KEY': self.credentials['secret_key'],
+            'RUTEN_SALT_KEY': self.credentials['salt_key']
+        }
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=0, help='每個請求的固定延遲')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='額外的隨機延遲上限')
+    parser.add_argument('--error-rate', type=float, default=0, help='回傳 5xx/429 的機率（0~1）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--shops', type=int, default=1, help='商店帳號數')
+    args = parser.parse_args()
+
+    fake = FakeRuten(products=args.products, orders=args.orders, categories=args.categories,
+                     latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                     seed=args.seed, shops=args.shops).start(args.host, args.port)
+    for name, value in fake.env().items():
+        print(f'{name}={value}')
+    for tenant in fake.tenants.values():
+        print('shop credentials: ' + ' '.join(tenant.credentials.values()))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+if __name__ == '__main__':
+    main()
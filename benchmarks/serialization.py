@@ -0,0 +1,124 @@
+"""列表序列化基準測試
+
+比較 ORM + to_dict() + jsonify 與直接取欄位值的快速路徑，並確認兩者輸出的位元組完全相同：
+
+    python benchmarks/serialization.py                 # 預設 1000 筆、每項 20 次
+    python benchmarks/serialization.py --rows 5000 --repeat 10
+    python benchmarks/serialization.py --ascii         # 純 ASCII 資料（orjson 可直接輸出）
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+SAMPLE_TITLES = ['藍牙無線耳機 黑色', 'USB 充電線 1m', 'Café crème 咖啡豆 🍵', 'tab\there "quoted" \\ slash', 'del\x7fchar', '']
+# orjson 只在輸出為純 ASCII 時使用，可用 --ascii 量測該情況
+ASCII_TITLES = ['Bluetooth headset black', 'USB cable 1m', 'tab\there "quoted" \\ slash', '']
+
+def seed(db, Product, Order, Category, rows, titles):
+    rng = random.Random(42)
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    db.session.add_all(Category(ruten_category_id=str(i), name=rng.choice(titles), parent_id=None)
+                       for i in range(min(rows, 500)))
+    db.session.add_all(Product(
+        ruten_item_id=str(1000 + i),
+        custom_no=f'SKU-{i}',
+        title=f'{rng.choice(titles)} #{i}',
+        description=rng.choice(titles) * 3,
+        price=rng.choice([Decimal('0'), None, Decimal(rng.randint(1, 99999)) / 100]),
+        stock=rng.randint(0, 500),
+        status=rng.choice(['online', 'offline']),
+        created_at=now - timedelta(minutes=i, microseconds=rng.choice([0, 123456]))
+    ) for i in range(rows))
+    db.session.add_all(Order(
+        ruten_order_id=str(5000 + i),
+        buyer_name=rng.choice(titles),
+        total_amount=Decimal(rng.randint(0, 999999)) / 100,
+        status=rng.choice(['pending', 'shipped']),
+        order_date=now - timedelta(hours=i),
+        ship_date=None if i % 3 else now
+    ) for i in range(rows))
+    db.session.commit()
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return result, samples
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='列表序列化基準測試')
+    parser.add_argument('--rows', type=int, default=1000, help='資料筆數（同時為每頁筆數）')
+    parser.add_argument('--repeat', type=int, default=20, help='每項重複次數')
+    parser.add_argument('--ascii', action='store_true', help='只使用 ASCII 文字')
+    args = parser.parse_args(argv)
+
+    from flask import jsonify
+    from src.main import create_app
+    from src.models.models import db, Product, Order, Category
+    from src.utils import serialization
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(db, Product, Order, Category, args.rows, ASCII_TITLES if args.ascii else SAMPLE_TITLES)
+
+    client = app.test_client()
+    page_size = args.rows
+
+    def legacy_products():
+        products = Product.query.paginate(page=1, per_page=page_size, error_out=False)
+        return jsonify({'status': 'success', 'data': {
+            'products': [product.to_dict() for product in products.items],
+            'total': products.total, 'page': 1, 'page_size': page_size, 'pages': products.pages
+        }}).get_data()
+
+    def legacy_orders():
+        orders = Order.query.order_by(Order.order_date.desc()).paginate(page=1, per_page=page_size, error_out=False)
+        return jsonify({'status': 'success', 'data': {
+            'orders': [order.to_dict() for order in orders.items],
+            'total': orders.total, 'page': 1, 'page_size': page_size, 'pages': orders.pages
+        }}).get_data()
+
+    def legacy_categories():
+        return jsonify({'status': 'success', 'data': {
+            'categories': [category.to_dict() for category in Category.query.all()]
+        }}).get_data()
+
+    cases = [
+        ('products', legacy_products, f'/api/products?page=1&page_size={page_size}'),
+        ('orders', legacy_orders, f'/api/orders?page=1&page_size={page_size}'),
+        ('categories', legacy_categories, '/api/categories')
+    ]
+    backends = [('stdlib', None)] + ([('orjson', serialization.orjson)] if serialization.orjson else [])
+    orjson_module = serialization.orjson
+
+    print(f"rows={args.rows} repeat={args.repeat}")
+    print(f"{'endpoint':<12}{'path':<22}{'p50 ms':>10}{'p95 ms':>10}{'speedup':>10}  identical")
+    for name, legacy, url in cases:
+        with app.test_request_context(url):
+            expected, legacy_samples = timed(legacy, args.repeat)
+        baseline = statistics.median(legacy_samples)
+        print(f"{name:<12}{'to_dict + jsonify':<22}{baseline * 1000:>10.2f}"
+              f"{sorted(legacy_samples)[int(len(legacy_samples) * 0.95) - 1] * 1000:>10.2f}{'1.00x':>10}")
+        for backend, module in backends:
+            serialization.orjson = module
+            body, samples = timed(lambda: client.get(url).get_data(), args.repeat)
+            median = statistics.median(samples)
+            print(f"{name:<12}{'rows + ' + backend:<22}{median * 1000:>10.2f}"
+                  f"{sorted(samples)[int(len(samples) * 0.95) - 1] * 1000:>10.2f}"
+                  f"{baseline / median:>9.2f}x  {body == expected}")
+        serialization.orjson = orjson_module
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""啟動時間基準測試
+
+量測從匯入 src.main 到第一個回應的延遲：
+
+    python benchmarks/startup.py               # 以 Flask test client 量測，預設 10 次
+    python benchmarks/startup.py --gunicorn    # 啟動真實 gunicorn 並輪詢 /health
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在全新的直譯器中執行，避免模組快取影響結果
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, %(root)r)
+import src.main
+t1 = time.perf_counter()
+app = src.main.create_app()
+t2 = time.perf_counter()
+response = app.test_client().get('/health')
+t3 = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import': t1 - t0, 'create_app': t2 - t1, 'first_response': t3 - t2, 'total': t3 - t0}))
+"""
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def run_in_process(env):
+    """以 test client 量測一次啟動"""
+    output = subprocess.check_output([sys.executable, '-c', PROBE % {'root': ROOT}], env=env, cwd=ROOT)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+def run_gunicorn(env, workers, timeout=30):
+    """啟動 gunicorn，量測到 /health 第一次回應 200 的時間"""
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}/health'
+    t0 = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--preload', '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', 'src.main:create_app()'],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return {'total': time.perf_counter() - t0}
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError('gunicorn did not respond in time')
+    finally:
+        process.terminate()
+        process.wait()
+
+def summarize(samples):
+    keys = samples[0].keys()
+    return {
+        key: {
+            'median_ms': round(statistics.median(s[key] for s in samples) * 1000, 2),
+            'min_ms': round(min(s[key] for s in samples) * 1000, 2),
+            'max_ms': round(max(s[key] for s in samples) * 1000, 2),
+        }
+        for key in keys
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--gunicorn', action='store_true', help='量測真實 gunicorn 啟動')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    env.setdefault('LOG_LEVEL', 'WARNING')
+
+    if args.gunicorn:
+        samples = [run_gunicorn(env, args.workers) for _ in range(args.runs)]
+    else:
+        samples = [run_in_process(env) for _ in range(args.runs)]
+
+    print(json.dumps({'mode': 'gunicorn' if args.gunicorn else 'in-process', 'runs': args.runs,
+                      'results': summarize(samples)}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""同步、寫回與列表路徑的基準測試
+
+以本地假露天伺服器（benchmarks/fake_ruten.py）取代 partner.ruten.com.tw，啟動 gunicorn 後
+對各路由施壓，回報 ops/sec 與 p50/p95/p99 延遲，結果存成 JSON 供回歸比較：
+
+    python benchmarks/suite.py                                   # 只測 SQLite
+    python benchmarks/suite.py --postgres-url postgresql://localhost/ruten_bench
+    python benchmarks/suite.py --latency-ms 80 --error-rate 0.02 --concurrency 16
+    python benchmarks/suite.py --compare benchmarks/results/baseline.json --fail-on-regression
+
+Postgres 請使用空的測試資料庫；每次執行前會清空資料表。
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_ruten import FakeRuten
+from upstream_load import ROOT, start_app
+
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+def _request(base_url, method, path, body=None, timeout=60):
+    data = json.dumps(body).encode() if body is not None else (b'' if method != 'GET' else None)
+    request = urllib.request.Request(f'{base_url}{path}', method=method, data=data,
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        payload, status = e.read(), e.code
+    except OSError:
+        payload, status = b'', None
+    return time.perf_counter() - start, status, payload
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(len(sorted_values) * fraction) - 1))
+    return round(sorted_values[index] * 1000, 2)
+
+def run_case(base_url, operations, concurrency):
+    """並行送出 operations [(method, path, body)]，回傳吞吐量與延遲分佈"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda op: _request(base_url, *op), operations))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, status, _ in results if status is not None and status < 400)
+    errors = {}
+    for _, status, _ in results:
+        if status is None or status >= 400:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    return {
+        'ops': len(operations),
+        'ok': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'ops_per_sec': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': _percentile(latencies, 0.50),
+        'p95_ms': _percentile(latencies, 0.95),
+        'p99_ms': _percentile(latencies, 0.99),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else None
+    }
+
+def _product_ids(base_url, limit):
+    _, status, payload = _request(base_url, 'GET', f'/api/products?page=1&page_size={limit}')
+    if status != 200:
+        return []
+    return [product['id'] for product in json.loads(payload)['data']['products'] if product.get('ruten_item_id')]
+
+def _orders_sync_supported():
+    sys.path.insert(0, ROOT)
+    from src.utils.ruten_client import RutenAPIClient
+    return hasattr(RutenAPIClient, 'get_orders')
+
+def build_cases(args, fake):
+    """依執行順序回傳 [(名稱, 產生 operations 的函式)]；同步需先執行，後面的案例才有資料"""
+    sync_pages = max(1, math.ceil(len(fake.products) / args.page_size))
+    order_pages = max(1, math.ceil(len(fake.orders) / args.page_size))
+
+    def cycle_pages(path, pages):
+        return lambda base_url: [('POST', f'{path}?page={index % pages + 1}&page_size={args.page_size}', None)
+                                 for index in range(max(args.requests, pages))]
+
+    def stock_updates(base_url):
+        ids = _product_ids(base_url, args.page_size)
+        return [('PUT', f'/api/products/{ids[index % len(ids)]}/stock', {'stock': index % 500})
+                for index in range(args.requests)] if ids else []
+
+    def stock_adjustments(base_url):
+        ids = _product_ids(base_url, args.page_size)
+        # 增減相抵，庫存不會變成負數
+        return [('POST', f'/api/products/{ids[index % len(ids)]}/stock/adjust', {'delta': 1 if index % 2 == 0 else -1})
+                for index in range(args.requests)] if ids else []
+
+    def listing(path, pages):
+        return lambda base_url: [('GET', path.format(page=index % pages + 1, page_size=args.page_size), None)
+                                 for index in range(args.requests)]
+
+    return [
+        ('products_sync', cycle_pages('/api/products/sync', sync_pages)),
+        ('orders_sync', cycle_pages('/api/orders/sync', order_pages) if _orders_sync_supported() else None),
+        ('stock_update', stock_updates),
+        ('stock_adjust', stock_adjustments),
+        ('list_products', listing('/api/products?page={page}&page_size={page_size}', sync_pages)),
+        ('list_orders', listing('/api/orders?page={page}&page_size={page_size}', order_pages)),
+        ('list_categories', listing('/api/categories', 1))
+    ]
+
+def _reset_postgres(database_url):
+    """清空測試資料庫中本服務的資料表"""
+    code = ("import sys; sys.path.insert(0, %r)\n"
+            "from src.main import create_app\n"
+            "from src.models.models import db\n"
+            "app = create_app()\n"
+            "with app.app_context():\n"
+            "    db.drop_all()\n") % ROOT
+    subprocess.check_call([sys.executable, '-c', code], cwd=ROOT, stdout=subprocess.DEVNULL,
+                          env=dict(os.environ, DATABASE_URL=database_url, LOG_LEVEL='WARNING'))
+
+def run_database(name, database_url, args, fake):
+    process, base_url = start_app(args.worker_class, args.workers, fake.url, database_url)
+    results = {}
+    try:
+        for case, build in build_cases(args, fake):
+            if build is None:
+                results[case] = {'skipped': 'RutenAPIClient has no get_orders()'}
+                print(f'  {case:<16} skipped')
+                continue
+            operations = build(base_url)
+            if not operations:
+                results[case] = {'skipped': 'no synced products'}
+                print(f'  {case:<16} skipped')
+                continue
+            results[case] = result = run_case(base_url, operations, args.concurrency)
+            print(f"  {case:<16}{result['ops_per_sec'] or 0:>10.1f} ops/s  p50 {result['p50_ms'] or 0:>8.1f}  "
+                  f"p95 {result['p95_ms'] or 0:>8.1f}  p99 {result['p99_ms'] or 0:>8.1f} ms  errors {result['errors'] or '-'}")
+    finally:
+        process.terminate()
+        process.wait()
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, baseline, threshold):
+    """列出與基準的差異，回傳超過門檻的退步項目"""
+    regressions = []
+    print(f"\ncompared with {baseline.get('git_commit')} ({baseline.get('created_at')})")
+    for database, cases in report['results'].items():
+        for case, result in cases.items():
+            before = baseline.get('results', {}).get(database, {}).get(case)
+            if not before or 'skipped' in result or 'skipped' in before:
+                continue
+            changes = []
+            if before.get('ops_per_sec') and result.get('ops_per_sec') is not None:
+                change = (result['ops_per_sec'] - before['ops_per_sec']) / before['ops_per_sec'] * 100
+                changes.append(f'ops/s {change:+.1f}%')
+                if change < -threshold:
+                    regressions.append(f'{database}/{case} ops/s {change:+.1f}%')
+            if before.get('p95_ms') and result.get('p95_ms') is not None:
+                change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+                changes.append(f'p95 {change:+.1f}%')
+                if change > threshold:
+                    regressions.append(f'{database}/{case} p95 {change:+.1f}%')
+            print(f"  {database}/{case:<20}{'  '.join(changes)}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--postgres-url', default=os.getenv('BENCH_POSTGRES_URL'), help='同時測試 Postgres')
+    parser.add_argument('--skip-sqlite', action='store_true')
+    parser.add_argument('--products', type=int, default=2000, help='假露天的商品數')
+    parser.add_argument('--orders', type=int, default=2000, help='假露天的訂單數')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=200, help='每個案例的請求數')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--worker-class', default='sync')
+    parser.add_argument('--latency-ms', type=float, default=20, help='假露天每個請求的延遲')
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--compare', help='與先前的結果檔比較')
+    parser.add_argument('--threshold', type=float, default=10, help='視為退步的百分比')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    fake = FakeRuten(products=args.products, orders=args.orders, latency_ms=args.latency_ms,
+                     jitter_ms=args.jitter_ms, error_rate=args.error_rate).start()
+    databases = [] if args.skip_sqlite else [('sqlite', None)]
+    if args.postgres_url:
+        databases.append(('postgresql', args.postgres_url))
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('postgres_url', 'output_dir', 'compare', 'fail_on_regression')},
+        'results': {}
+    }
+    try:
+        for name, database_url in databases:
+            print(f'{name}:')
+            if database_url is None:
+                with tempfile.TemporaryDirectory() as tmp:
+                    report['results'][name] = run_database(name, f'sqlite:///{tmp}/bench.db', args, fake)
+            else:
+                _reset_postgres(database_url)
+                report['results'][name] = run_database(name, database_url, args, fake)
+        with urllib.request.urlopen(f'{fake.url}/__stats') as response:
+            report['upstream'] = json.loads(response.read())
+    finally:
+        fake.stop()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{report['git_commit'] or 'local'}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f'\nresults saved to {path}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print('\nregressions:\n  ' + '\n  '.join(regressions))
+            if args.fail_on_regression:
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
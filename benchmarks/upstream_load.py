@@ -0,0 +1,153 @@
+"""慢速露天 API 下的負載測試
+
+啟動一個會延遲回應的本地假露天伺服器，分別以 sync 與 gevent worker 啟動 gunicorn，
+同時對需要呼叫露天的路由（POST /api/products/sync）與純本地查詢（GET /api/products）施壓，
+比較兩種模式下的吞吐量與本地查詢延遲：
+
+    python benchmarks/upstream_load.py --upstream-delay 2 --concurrency 50 --duration 15
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_slow_upstream(delay):
+    """啟動每個請求都延遲 delay 秒的假露天伺服器"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self):
+            time.sleep(delay)
+            body = json.dumps({'status': 'success', 'data': {'products': []}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = _reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', _free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_app(mode, workers, upstream_url, database_url):
+    port = _free_port()
+    env = dict(os.environ,
+               GUNICORN_WORKER_CLASS=mode,
+               WEB_CONCURRENCY=str(workers),
+               PORT=str(port),
+               DATABASE_URL=database_url,
+               RUTEN_BASE_URL=upstream_url,
+               RUTEN_API_KEY='bench-key', RUTEN_SECRET_KEY='bench-secret', RUTEN_SALT_KEY='bench-salt',
+               LOG_LEVEL='WARNING')
+    subprocess.check_call([sys.executable, '-m', 'flask', '--app', 'src.main:create_app', 'init-db'],
+                          env=env, cwd=ROOT, stdout=subprocess.DEVNULL)
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'src.main:create_app()'],
+                               env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/health', timeout=1).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'{mode} server did not start')
+
+def _timed_request(url, method='GET', timeout=60):
+    request = urllib.request.Request(url, method=method, data=b'' if method == 'POST' else None)
+    start = time.perf_counter()
+    try:
+        urllib.request.urlopen(request, timeout=timeout).read()
+        return time.perf_counter() - start, True
+    except OSError:
+        return time.perf_counter() - start, False
+
+def run_load(base_url, concurrency, duration, local_timeout):
+    stop_at = time.time() + duration
+    upstream_results, local_results = [], []
+
+    def upstream_worker():
+        while time.time() < stop_at:
+            upstream_results.append(_timed_request(f'{base_url}/api/products/sync', method='POST'))
+
+    def local_worker():
+        while time.time() < stop_at:
+            local_results.append(_timed_request(f'{base_url}/api/products', timeout=local_timeout))
+            time.sleep(0.05)
+
+    with ThreadPoolExecutor(max_workers=concurrency + 1) as executor:
+        futures = [executor.submit(upstream_worker) for _ in range(concurrency)]
+        futures.append(executor.submit(local_worker))
+        for future in futures:
+            future.result()
+
+    def latency_summary(results):
+        ok = sorted(latency for latency, success in results if success)
+        if not ok:
+            return {'ok': 0, 'failed': len(results)}
+        return {
+            'ok': len(ok),
+            'failed': len(results) - len(ok),
+            'p50_ms': round(statistics.median(ok) * 1000, 1),
+            'p95_ms': round(ok[min(len(ok) - 1, int(len(ok) * 0.95))] * 1000, 1),
+            'max_ms': round(ok[-1] * 1000, 1)
+        }
+
+    return {
+        'upstream_rps': round(sum(1 for _, success in upstream_results if success) / duration, 2),
+        'upstream': latency_summary(upstream_results),
+        'local_reads': latency_summary(local_results)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='sync,gevent')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--upstream-delay', type=float, default=2.0)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--local-timeout', type=float, default=5)
+    args = parser.parse_args()
+
+    upstream = start_slow_upstream(args.upstream_delay)
+    upstream_url = f'http://127.0.0.1:{upstream.server_address[1]}'
+    report = {}
+    try:
+        for mode in args.modes.split(','):
+            with tempfile.TemporaryDirectory() as tmp:
+                process, base_url = start_app(mode, args.workers, upstream_url, f'sqlite:///{tmp}/bench.db')
+                try:
+                    report[mode] = run_load(base_url, args.concurrency, args.duration, args.local_timeout)
+                finally:
+                    process.terminate()
+                    process.wait()
+    finally:
+        upstream.shutdown()
+
+    print(json.dumps({'workers': args.workers, 'upstream_delay_s': args.upstream_delay,
+                      'concurrency': args.concurrency, 'duration_s': args.duration, 'results': report}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Gunicorn 設定
+
+以環境變數切換 worker 類型：
+
+- GUNICORN_WORKER_CLASS=sync   （預設）每個 worker 一次只處理一個請求
+- GUNICORN_WORKER_CLASS=gevent 協作式並行，等待露天 API 時可同時服務數百個請求
+"""
+import os
+import multiprocessing
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+
+# gevent 模式必須在載入應用程式（--preload）之前完成 monkey patch，
+# 讓 requests/ssl/threading 與 psycopg2 都改為協作式 I/O
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '200'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+preload_app = True
+
+def child_exit(server, worker):
+    # worker 被終止（例如逾時）時收回其持有的露天並行名額
+    from src.utils.admission import release_process_slots
+    release_process_slots(worker.pid)
+
+def post_worker_init(worker):
+    # 每個 worker 啟動後立即開始健康檢查探測，負載平衡器第一次探測時即有結果
+    from src.utils.health import health_monitor
+    health_monitor.ensure_started(worker.wsgi)
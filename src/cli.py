@@ -0,0 +1,71 @@
+import logging
+import click
+
+logger = logging.getLogger(__name__)
+
+def register_commands(app):
+    """註冊 flask CLI 管理指令"""
+
+    @app.cli.command('init-db')
+    def init_db():
+        """建立資料表（部署時執行一次，不在每個 worker 啟動時執行）"""
+        from src.models.models import db
+        from src.utils.schema import add_missing_columns
+        from src.utils.search import ensure_search_index
+        logger.info("Creating database tables")
+        db.create_all()
+        add_missing_columns(db.engine)
+        ensure_search_index(db.engine)
+        click.echo('Database tables created')
+
+    @app.cli.command('rotate-shop-key')
+    def rotate_shop_key():
+        """以 SHOP_ENCRYPTION_KEY 的第一把金鑰重新加密所有商店憑證"""
+        from src.utils.shops import reencrypt_shop_secrets
+        count = reencrypt_shop_secrets()
+        click.echo(f"Re-encrypted credentials for {count} shops")
+
+    @app.cli.command('compact-changes')
+    def compact_changes():
+        """壓縮並清理過期的變更紀錄（建議每日執行）"""
+        from src.utils.change_log import compact_change_log
+        result = compact_change_log()
+        click.echo(f"Compacted {result['compacted']} superseded and removed {result['expired']} expired change log entries")
+
+    @app.cli.command('rebuild-sales-summary')
+    def rebuild_sales_summary_command():
+        """由訂單重新計算每日銷售統計"""
+        from src.utils.sales_summary import rebuild_sales_summary
+        rows = rebuild_sales_summary()
+        click.echo(f"Sales summary rebuilt with {rows} rows")
+
+    @app.cli.command('push-stock')
+    @click.option('--retry-dead', is_flag=True, help='先將死信中的項目重新排入')
+    def push_stock(retry_dead):
+        """推送佇列中到期、尚未送到露天的庫存"""
+        from src.utils.stock import push_pending_stock, requeue_dead_stock_pushes
+        if retry_dead:
+            click.echo(f"Requeued {requeue_dead_stock_pushes()} dead-lettered stock updates")
+        result = push_pending_stock()
+        click.echo(f"Pushed {result['pushed']} stock updates, {result['failed']} failed, "
+                   f"{result['dead_lettered']} moved to dead letter")
+
+    @app.cli.command('partition-tables')
+    @click.option('--table', 'tables', multiple=True, help='只轉換指定資料表（orders、api_logs）')
+    def partition_tables(tables):
+        """將 orders 與 api_logs 轉為依月份分割（僅 Postgres，需停機維護）"""
+        from src.models.models import db
+        from src.utils.partitioning import PARTITIONED_TABLES, convert_to_partitioned
+        if db.engine.dialect.name != 'postgresql':
+            raise click.ClickException('Table partitioning requires PostgreSQL')
+        for table in tables or PARTITIONED_TABLES:
+            converted = convert_to_partitioned(db.engine, table)
+            click.echo(f"{table}: {'converted to monthly partitions' if converted else 'already partitioned'}")
+
+    @app.cli.command('maintain-partitions')
+    def maintain_partitions_command():
+        """建立未來月份的分割並卸離、封存超過保留期限的分割"""
+        from src.models.models import db
+        from src.utils.partitioning import maintain_partitions
+        result = maintain_partitions(db.engine)
+        click.echo(f"Created {len(result['created'])} partitions, dropped {len(result['dropped'])} partitions")
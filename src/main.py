@@ -4,68 +4,145 @@ import logging
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from src.models.models import db
-from src.routes.user import user_bp
-from src.routes.products import product_bp
-from src.routes.orders import order_bp
-from src.routes.categories import category_bp
-from src.routes.auth import auth_bp
-
-# 設置日誌
-logging.basicConfig(level=logging.DEBUG)
+from flask import Flask
+
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
-app.logger.setLevel(logging.DEBUG)
-
-# 啟用 CORS
-CORS(app)
-
-# 註冊藍圖
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(product_bp, url_prefix='/api')
-app.register_blueprint(order_bp, url_prefix='/api')
-app.register_blueprint(category_bp, url_prefix='/api')
-app.register_blueprint(auth_bp, url_prefix='/api')
-
-# 資料庫配置
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# 健康檢查端點
-@app.route('/health')
-def health_check():
-    logger.debug("Health check requested")
-    return {'status': 'healthy', 'service': 'ruten-api-service'}
-
-with app.app_context():
-    logger.info("Creating database tables")
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        logger.error("Static folder not configured")
-        return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        logger.debug(f"Serving static file: {path}")
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
+STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'static')
+
+def configure_logging():
+    """依 LOG_LEVEL 設置日誌，已有 handler（例如 gunicorn）時不覆蓋"""
+    level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=level)
+    logging.getLogger().setLevel(level)
+
+def create_app(config=None):
+    """建立 Flask 應用程式
+
+    不會連線資料庫或建立資料表，可搭配 gunicorn --preload 在 master 行程載入一次後 fork。
+    資料表請透過 `flask --app src.main:create_app init-db` 建立。
+    """
+    # 延後載入較重的相依套件，讓匯入 src.main 本身保持輕量
+    from flask_cors import CORS
+    from src.models.models import db
+    from src.routes.user import user_bp
+    from src.routes.products import product_bp
+    from src.routes.orders import order_bp
+    from src.routes.categories import category_bp
+    from src.routes.auth import auth_bp
+    from src.routes.sync import sync_bp
+    from src.routes.changes import changes_bp
+    from src.routes.shops import shop_bp
+    from src.cli import register_commands
+    from src.utils.db_config import configure_database, install_engine_hooks, get_pool_status
+    from src.utils.change_log import install_change_log
+    from src.utils.sales_summary import install_sales_summary
+    from src.utils.replica import install_replica_routing, get_replica_status
+    from src.utils.assets import AssetManifest, asset_response
+    from src.utils.compression import install_response_compression
+    from src.utils.health import health_monitor
+
+    app = Flask(__name__, static_folder=STATIC_FOLDER)
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+
+    # 資料庫配置
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    if config:
+        app.config.update(config)
+    configure_database(app)
+
+    # 啟用 CORS
+    CORS(app)
+
+    # 註冊藍圖
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(product_bp, url_prefix='/api')
+    app.register_blueprint(order_bp, url_prefix='/api')
+    app.register_blueprint(category_bp, url_prefix='/api')
+    app.register_blueprint(auth_bp, url_prefix='/api')
+    app.register_blueprint(sync_bp, url_prefix='/api')
+    app.register_blueprint(changes_bp, url_prefix='/api')
+    app.register_blueprint(shop_bp, url_prefix='/api')
+
+    db.init_app(app)
+    install_engine_hooks(app, db)
+    install_change_log()
+    install_sales_summary()
+    install_replica_routing(app)
+    install_response_compression(app)
+    register_commands(app)
+
+    # 健康檢查端點：只讀取背景檢查的最近結果，不在請求中連線資料庫或露天
+    @app.route('/health')
+    def health_check():
+        """存活檢查：行程可回應即為 healthy，不受相依服務影響"""
+        logger.debug("Health check requested")
+        health_monitor.ensure_started(app)
+        return {'status': 'healthy', 'service': 'ruten-api-service', 'uptime_seconds': health_monitor.uptime()}
+
+    @app.route('/health/ready')
+    def readiness_check():
+        """就緒檢查：資料庫無法使用或尚未完成第一次檢查時回傳 503"""
+        health_monitor.ensure_started(app)
+        readiness = health_monitor.readiness()
+        return {'service': 'ruten-api-service', **readiness}, 200 if readiness['ready'] else 503
+
+    @app.route('/health/pool')
+    def pool_status():
+        return {'status': 'success', 'data': {**get_pool_status(db.engine), 'replica': get_replica_status(db)}}
+
+    # 靜態檔案於啟動時載入記憶體並預先壓縮，請求時不再存取檔案系統
+    assets = AssetManifest(app.static_folder)
+    app.extensions['assets'] = assets
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if app.static_folder is None:
+            logger.error("Static folder not configured")
+            return "Static folder not configured", 404
+
+        asset = assets.resolve(path) if path else None
+        if asset is not None:
+            logger.debug(f"Serving static file: {path}")
+            # 只有指紋網址可長期快取，原始檔名每次重新驗證
+            return asset_response(app, asset, immutable=path != asset.path)
+
+        if assets.entry_point is not None:
             logger.debug("Serving index.html")
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            logger.error("index.html not found")
-            return "index.html not found", 404
+            return asset_response(app, assets.entry_point, immutable=False)
+
+        logger.error("index.html not found")
+        return "index.html not found", 404
+
+    return app
+
+_app = None
+
+def __getattr__(name):
+    """相容 `src.main:app` 的舊啟動方式，第一次存取時才建立應用程式"""
+    global _app
+    if name == 'app':
+        if _app is None:
+            configure_logging()
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
+    configure_logging()
+    app = create_app()
+    # 本地開發時直接建立資料表
+    with app.app_context():
+        from src.models.models import db
+        from src.utils.schema import add_missing_columns
+        from src.utils.search import ensure_search_index
+        logger.info("Creating database tables")
+        db.create_all()
+        add_missing_columns(db.engine)
+        ensure_search_index(db.engine)
     logger.info("Starting Flask application")
     app.run(host='0.0.0.0', port=8000, debug=True)
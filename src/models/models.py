@@ -1,38 +1,123 @@
 from flask_sqlalchemy import SQLAlchemy
+import json
+import hashlib
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from src.utils.replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
-class Product(db.Model):
+class ContentHashMixin:
+    """以同步欄位計算內容雜湊，同步時可據此略過沒有變動的資料列"""
+    
+    # 子類別需列出參與雜湊的欄位
+    HASH_FIELDS = ()
+    
+    content_hash = db.Column(db.String(16))
+
+    @classmethod
+    def _normalize_hash_value(cls, field, value):
+        """依欄位型別正規化，讓 API 字串與資料庫值得到相同雜湊"""
+        if value is None or value == '':
+            return ''
+        column_type = cls.__table__.c[field].type
+        try:
+            if isinstance(column_type, db.Numeric):
+                return str(Decimal(str(value)).quantize(Decimal(1).scaleb(-(column_type.scale or 0))))
+            if isinstance(column_type, db.Integer):
+                return str(int(value))
+        except (InvalidOperation, TypeError, ValueError):
+            pass
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    @classmethod
+    def hash_values(cls, values):
+        """計算欄位值的內容雜湊"""
+        payload = '\x1f'.join(cls._normalize_hash_value(field, values.get(field)) for field in cls.HASH_FIELDS)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+    def compute_content_hash(self):
+        return self.hash_values({field: getattr(self, field) for field in self.HASH_FIELDS})
+
+@db.event.listens_for(ContentHashMixin, 'before_insert', propagate=True)
+@db.event.listens_for(ContentHashMixin, 'before_update', propagate=True)
+def _update_content_hash(mapper, connection, target):
+    target.content_hash = target.compute_content_hash()
+
+class Shop(db.Model):
+    __tablename__ = 'shops'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    api_key = db.Column(db.String(255), nullable=False)
+    # Secret 與 Salt 以 SHOP_ENCRYPTION_KEY 加密後儲存（見 src/utils/shops.py）
+    secret_key_encrypted = db.Column(db.Text, nullable=False)
+    salt_key_encrypted = db.Column(db.Text, nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    # 每秒請求數與突發上限，未設定時使用 SHOP_RATE_LIMIT / SHOP_RATE_BURST
+    rate_limit = db.Column(db.Float)
+    rate_burst = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'api_key_preview': f"{self.api_key[:8]}..." if self.api_key else None,
+            'active': self.active,
+            'rate_limit': self.rate_limit,
+            'rate_burst': self.rate_burst,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class Product(ContentHashMixin, db.Model):
     __tablename__ = 'products'
+    HASH_FIELDS = ('title', 'price', 'stock', 'status', 'custom_no')
     
     id = db.Column(db.Integer, primary_key=True)
     ruten_item_id = db.Column(db.String(50), unique=True, nullable=True)
+    custom_no = db.Column(db.String(100), index=True, nullable=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     price = db.Column(db.Numeric(10, 2))
     stock = db.Column(db.Integer, default=0)
     status = db.Column(db.String(20), default='offline')
     category_id = db.Column(db.String(50))
+    shop_id = db.Column(db.Integer, db.ForeignKey('shops.id'), index=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # 自訂編號（SKU）由各賣場自行管理，只在同一賣場內唯一；
+    # 預設帳號的商品 shop_id 為 NULL，複合唯一索引不約束 NULL，另以部分唯一索引維持唯一
+    __table_args__ = (
+        db.Index('uq_products_shop_id_custom_no', 'shop_id', 'custom_no', unique=True),
+        db.Index('uq_products_default_custom_no', 'custom_no', unique=True,
+                 sqlite_where=db.text('shop_id IS NULL'), postgresql_where=db.text('shop_id IS NULL')),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
             'ruten_item_id': self.ruten_item_id,
+            'custom_no': self.custom_no,
             'title': self.title,
             'description': self.description,
             'price': float(self.price) if self.price else None,
             'stock': self.stock,
             'status': self.status,
             'category_id': self.category_id,
+            'shop_id': self.shop_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
-class Order(db.Model):
+class Order(ContentHashMixin, db.Model):
     __tablename__ = 'orders'
+    HASH_FIELDS = ('buyer_name', 'total_amount', 'status', 'order_date')
     
     id = db.Column(db.Integer, primary_key=True)
     ruten_order_id = db.Column(db.String(50), unique=True, nullable=True)
@@ -41,11 +126,14 @@ class Order(db.Model):
     status = db.Column(db.String(50))
     order_date = db.Column(db.DateTime)
     ship_date = db.Column(db.DateTime)
+    shop_id = db.Column(db.Integer, db.ForeignKey('shops.id'), index=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    def to_dict(self):
-        return {
+    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan', order_by='OrderItem.id')
+
+    def to_dict(self, include_items=False):
+        data = {
             'id': self.id,
             'ruten_order_id': self.ruten_order_id,
             'buyer_name': self.buyer_name,
@@ -53,17 +141,47 @@ class Order(db.Model):
             'status': self.status,
             'order_date': self.order_date.isoformat() if self.order_date else None,
             'ship_date': self.ship_date.isoformat() if self.ship_date else None,
+            'shop_id': self.shop_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if include_items:
+            data['items'] = [item.to_dict() for item in self.items]
+        return data
+
+class OrderItem(db.Model):
+    __tablename__ = 'order_items'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, index=True)
+    ruten_item_id = db.Column(db.String(50), index=True)
+    title = db.Column(db.String(255))
+    price = db.Column(db.Numeric(10, 2))
+    quantity = db.Column(db.Integer, default=1)
+    subtotal = db.Column(db.Numeric(10, 2))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'ruten_item_id': self.ruten_item_id,
+            'title': self.title,
+            'price': float(self.price) if self.price else None,
+            'quantity': self.quantity,
+            'subtotal': float(self.subtotal) if self.subtotal else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
 
-class Category(db.Model):
+class Category(ContentHashMixin, db.Model):
     __tablename__ = 'categories'
+    HASH_FIELDS = ('name', 'parent_id')
     
     id = db.Column(db.Integer, primary_key=True)
     ruten_category_id = db.Column(db.String(50), unique=True, nullable=True)
     name = db.Column(db.String(100), nullable=False)
     parent_id = db.Column(db.Integer)
+    shop_id = db.Column(db.Integer, db.ForeignKey('shops.id'), index=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -73,6 +191,7 @@ class Category(db.Model):
             'ruten_category_id': self.ruten_category_id,
             'name': self.name,
             'parent_id': self.parent_id,
+            'shop_id': self.shop_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -101,3 +220,181 @@ class ApiLog(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+class SyncRun(db.Model):
+    __tablename__ = 'sync_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(50), nullable=False, index=True)
+    shop_id = db.Column(db.Integer, index=True)
+    status = db.Column(db.String(20), nullable=False, default='running')
+    rows = db.Column(db.Integer, default=0)
+    pages = db.Column(db.Integer, default=0)
+    duration = db.Column(db.Numeric(10, 3))
+    error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'resource': self.resource,
+            'shop_id': self.shop_id,
+            'status': self.status,
+            'rows': self.rows,
+            'pages': self.pages,
+            'duration': float(self.duration) if self.duration else None,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class SyncJob(db.Model):
+    __tablename__ = 'sync_jobs'
+    
+    id = db.Column(db.String(36), primary_key=True)
+    resource = db.Column(db.String(50), nullable=False, index=True)
+    params = db.Column(db.Text)
+    # 執行中的工作才有值，唯一索引確保相同請求只會有一個工作在執行
+    dedupe_key = db.Column(db.String(255), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    pages_done = db.Column(db.Integer, default=0)
+    pages_estimate = db.Column(db.Integer)
+    rows_written = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def eta_seconds(self):
+        """依已完成頁數與上次同步的頁數估計剩餘時間"""
+        if self.status != 'running' or not self.started_at or not self.pages_done or not self.pages_estimate:
+            return None
+        elapsed = ((self.heartbeat_at or datetime.utcnow()) - self.started_at).total_seconds()
+        remaining_pages = max(self.pages_estimate - self.pages_done, 0)
+        return round(elapsed / self.pages_done * remaining_pages, 1)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'resource': self.resource,
+            'params': json.loads(self.params) if self.params else {},
+            'status': self.status,
+            'pages_done': self.pages_done,
+            'pages_estimate': self.pages_estimate,
+            'rows_written': self.rows_written,
+            'eta_seconds': self.eta_seconds(),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)
+    changed_fields = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_change_log_entity', 'entity', 'entity_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'operation': self.operation,
+            'changed_fields': json.loads(self.changed_fields) if self.changed_fields else {},
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class SalesDailySummary(db.Model):
+    __tablename__ = 'sales_daily_summary'
+    
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'status': self.status,
+            'order_count': self.order_count,
+            'total_amount': float(self.total_amount) if self.total_amount else 0.0
+        }
+
+class StockPush(db.Model):
+    __tablename__ = 'stock_push_outbox'
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    ruten_item_id = db.Column(db.String(50), nullable=False)
+    stock = db.Column(db.Integer, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    queued_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # 失敗後依指數退避延後重試；NULL 表示立即可推送
+    next_attempt_at = db.Column(db.DateTime, index=True)
+    # 永久失敗或超過重試上限後移入死信，不再自動推送，重新排入時清除
+    dead_lettered_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'ruten_item_id': self.ruten_item_id,
+            'stock': self.stock,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'queued_at': self.queued_at.isoformat() if self.queued_at else None,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'dead_lettered_at': self.dead_lettered_at.isoformat() if self.dead_lettered_at else None
+        }
+
+class CredentialCheck(db.Model):
+    __tablename__ = 'credential_checks'
+    
+    # 'default' 為環境變數設定的帳號
+    key = db.Column(db.String(50), primary_key=True)
+    # 憑證的雜湊，憑證變更後舊的結果即失效
+    fingerprint = db.Column(db.String(64), nullable=False)
+    valid = db.Column(db.Boolean)
+    message = db.Column(db.Text)
+    checked_at = db.Column(db.DateTime)
+    # 正在向露天驗證的 worker 持有的租約，避免多個 worker 同時驗證
+    refreshing_until = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'valid': self.valid,
+            'message': self.message,
+            'checked_at': self.checked_at.isoformat() if self.checked_at else None
+        }
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    # method、路徑與 Idempotency-Key 的雜湊，相同的 key 用在不同端點不會互相衝突
+    id = db.Column(db.String(64), primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    # 請求內容的雜湊，同一個 key 搭配不同內容時拒絕
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_progress')
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.LargeBinary)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    # 處理中的請求持有的租約，逾時（例如 worker 被終止）後重試的請求可接手
+    locked_until = db.Column(db.DateTime)
@@ -1,9 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from src.utils.ruten_client import RutenAPIClient
+from src.utils.auth_status import get_credential_status, record_credential_check
+from src.utils.admission import upstream_bound
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/auth/verify', methods=['POST'])
+@upstream_bound
 def verify_credentials():
     """驗證 API 金鑰是否有效"""
     try:
@@ -16,6 +19,8 @@ def verify_credentials():
             salt_key=data.get('salt_key', '')
         )
         result = client.verify_credentials()
+        # 與目前設定的憑證相同時一併更新 /auth/status 的快取
+        record_credential_check((client.api_key, client.secret_key, client.salt_key), result)
         
         return jsonify({
             'status': 'success',
@@ -30,49 +35,12 @@ def verify_credentials():
 
 @auth_bp.route('/auth/status', methods=['GET'])
 def get_auth_status():
-    """取得目前認證狀態"""
+    """取得目前認證狀態（回傳快取的驗證結果，過期時在背景重新驗證）"""
     try:
-        import os
-        api_key = os.getenv('RUTEN_API_KEY')
-        secret_key = os.getenv('RUTEN_SECRET_KEY')
-        salt_key = os.getenv('RUTEN_SALT_KEY')
-        
-        has_credentials = bool(api_key and secret_key and salt_key)
-        
-        if has_credentials:
-            try:
-                client = RutenAPIClient()
-                result = client.verify_credentials()
-                
-                return jsonify({
-                    'status': 'success',
-                    'data': {
-                        'has_credentials': True,
-                        'credentials_valid': result.get('valid', False),
-                        'message': result.get('message', ''),
-                        'api_key_preview': f"{api_key[:8]}..." if api_key else None
-                    }
-                })
-                
-            except Exception as e:
-                return jsonify({
-                    'status': 'success',
-                    'data': {
-                        'has_credentials': True,
-                        'credentials_valid': False,
-                        'message': str(e),
-                        'api_key_preview': f"{api_key[:8]}..." if api_key else None
-                    }
-                })
-        else:
-            return jsonify({
-                'status': 'success',
-                'data': {
-                    'has_credentials': False,
-                    'credentials_valid': False,
-                    'message': 'No credentials configured'
-                }
-            })
+        return jsonify({
+            'status': 'success',
+            'data': get_credential_status(current_app._get_current_object())
+        })
         
     except Exception as e:
         return jsonify({
@@ -1,24 +1,40 @@
 from flask import Blueprint, request, jsonify
-from src.models.models import db, Category
-from src.utils.ruten_client import RutenAPIClient
+from src.models.models import db, Category, Shop
+from src.utils.shops import ShopNotFound, get_client
+from src.utils.sync import SyncError, sync_categories
+from src.utils.replica import use_replica
+from src.utils.admission import upstream_bound
+from src.utils.serialization import (
+    CATEGORY_ROWS, UnsupportedFormat, list_layout, list_response, negotiate_list_format,
+    query_rows, unsupported_format_response
+)
 import json
 from datetime import datetime
 
 category_bp = Blueprint('categories', __name__)
 
 @category_bp.route('/categories', methods=['GET'])
+@use_replica
 def get_categories():
     """查詢分類列表"""
     try:
         # 從本地資料庫查詢
-        categories = Category.query.all()
+        fmt = negotiate_list_format()
+        query = Category.query
+        shop_id = request.args.get('shop_id', type=int)
+        if shop_id is not None:
+            query = query.filter(Category.shop_id == shop_id)
+        categories = query_rows(query, CATEGORY_ROWS, list_layout(fmt))
         
-        return jsonify({
+        return list_response({
             'status': 'success',
             'data': {
-                'categories': [category.to_dict() for category in categories]
+                'categories': categories
             }
-        })
+        }, fmt)
+        
+    except UnsupportedFormat as e:
+        return unsupported_format_response(e)
         
     except Exception as e:
         return jsonify({
@@ -43,6 +59,7 @@ def get_category(category_id):
         }), 500
 
 @category_bp.route('/categories', methods=['POST'])
+@upstream_bound
 def create_category():
     """新增分類"""
     try:
@@ -55,8 +72,18 @@ def create_category():
                 'message': 'Missing required field: name'
             }), 400
         
+        shop_id = data.get('shop_id')
+        if shop_id is not None:
+            shop = db.session.get(Shop, shop_id)
+            if shop is None or not shop.active:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Shop {shop_id} not found'
+                }), 404
+        
         # 建立新分類
         category = Category(
+            shop_id=shop_id,
             name=data['name'],
             parent_id=data.get('parent_id')
         )
@@ -67,7 +94,7 @@ def create_category():
         # 如果需要同步到露天拍賣
         if data.get('sync_to_ruten', False):
             try:
-                client = RutenAPIClient()
+                client = get_client(shop_id)
                 ruten_data = {
                     'name': data['name'],
                     'parent_id': data.get('parent_id')
@@ -96,6 +123,7 @@ def create_category():
         }), 500
 
 @category_bp.route('/categories/<int:category_id>', methods=['PUT'])
+@upstream_bound
 def update_category(category_id):
     """更新分類資訊"""
     try:
@@ -114,7 +142,7 @@ def update_category(category_id):
         # 同步到露天拍賣
         if category.ruten_category_id and data.get('sync_to_ruten', True):
             try:
-                client = RutenAPIClient()
+                client = get_client(category.shop_id)
                 ruten_data = {
                     'category_id': category.ruten_category_id,
                     'name': category.name,
@@ -151,6 +179,7 @@ def update_category(category_id):
         }), 500
 
 @category_bp.route('/categories/<int:category_id>', methods=['DELETE'])
+@upstream_bound
 def delete_category(category_id):
     """刪除分類"""
     try:
@@ -167,7 +196,7 @@ def delete_category(category_id):
         # 同步刪除露天拍賣分類
         if category.ruten_category_id:
             try:
-                client = RutenAPIClient()
+                client = get_client(category.shop_id)
                 result = client.delete_category(category.ruten_category_id)
                 
                 if 'error' in result:
@@ -198,53 +227,39 @@ def delete_category(category_id):
         }), 500
 
 @category_bp.route('/categories/sync', methods=['POST'])
+@upstream_bound
 def sync_categories_from_ruten():
     """從露天拍賣同步分類資料"""
     try:
-        client = RutenAPIClient()
-        result = client.get_categories()
-        
-        if 'error' in result:
+        shop_id = request.args.get('shop_id', type=int)
+        client = get_client(shop_id)
+        try:
+            result = sync_categories(client, shop_id=shop_id)
+            synced_count = result['synced_count']
+        except SyncError as e:
             return jsonify({
                 'status': 'error',
-                'message': result.get('message', 'Failed to fetch categories from Ruten')
+                'message': str(e)
             }), 500
         
-        synced_count = 0
-        categories_data = result.get('data', {}).get('categories', [])
-        
-        for category_data in categories_data:
-            ruten_category_id = category_data.get('category_id')
-            
-            # 檢查是否已存在
-            existing_category = Category.query.filter_by(ruten_category_id=ruten_category_id).first()
-            
-            if existing_category:
-                # 更新現有分類
-                existing_category.name = category_data.get('name', existing_category.name)
-                existing_category.parent_id = category_data.get('parent_id', existing_category.parent_id)
-                existing_category.updated_at = datetime.utcnow()
-            else:
-                # 建立新分類
-                new_category = Category(
-                    ruten_category_id=ruten_category_id,
-                    name=category_data.get('name', ''),
-                    parent_id=category_data.get('parent_id')
-                )
-                db.session.add(new_category)
-            
-            synced_count += 1
-        
-        db.session.commit()
-        
         return jsonify({
             'status': 'success',
             'message': f'Successfully synced {synced_count} categories',
             'data': {
-                'synced_count': synced_count
+                'synced_count': synced_count,
+                'inserted': result['inserted'],
+                'updated': result['updated'],
+                'unchanged': result['unchanged'],
+                'shop_id': shop_id
             }
         })
         
+    except ShopNotFound as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+        
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -0,0 +1,63 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from src.models.models import db, ChangeLog
+from datetime import datetime, timedelta
+import os
+import json
+
+changes_bp = Blueprint('changes', __name__)
+
+MAX_CHANGE_BATCH = 5000
+# 只提供建立超過此秒數的紀錄，避免尚未提交的較小序號在之後才出現。
+# created_at 為 flush 時間而非提交時間：flush 後仍開著交易超過此秒數（例如等待露天回應）時，
+# 較小的序號仍可能在消費者讀過較大序號後才出現，此值需大於最長的寫入交易時間
+CHANGE_FEED_SETTLE_SECONDS = float(os.getenv('CHANGE_FEED_SETTLE_SECONDS', '2'))
+
+def _fetch_changes(since, limit, entity=None):
+    query = db.select(ChangeLog).where(
+        ChangeLog.seq > since,
+        ChangeLog.created_at <= datetime.utcnow() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+    )
+    if entity:
+        query = query.where(ChangeLog.entity == entity)
+    return db.session.execute(query.order_by(ChangeLog.seq).limit(limit)).scalars().all()
+
+@changes_bp.route('/changes', methods=['GET'])
+def get_changes():
+    """依序號取得變更紀錄；stream=true 或 Accept: application/x-ndjson 時以 NDJSON 串流回傳所有批次"""
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = min(request.args.get('limit', 500, type=int), MAX_CHANGE_BATCH)
+        entity = request.args.get('entity')
+        stream = request.args.get('stream', 'false').lower() in ('1', 'true', 'yes') or \
+            request.accept_mimetypes.best == 'application/x-ndjson'
+
+        if stream:
+            max_batches = request.args.get('max_batches', 100, type=int)
+
+            def generate(cursor):
+                for _ in range(max_batches):
+                    batch = _fetch_changes(cursor, limit, entity)
+                    for change in batch:
+                        yield json.dumps(change.to_dict(), ensure_ascii=False) + '\n'
+                    if len(batch) < limit:
+                        break
+                    cursor = batch[-1].seq
+
+            return Response(stream_with_context(generate(since)), mimetype='application/x-ndjson')
+
+        changes = _fetch_changes(since, limit, entity)
+
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'changes': [change.to_dict() for change in changes],
+                'next_since': changes[-1].seq if changes else since,
+                'has_more': len(changes) == limit
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
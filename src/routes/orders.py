@@ -1,27 +1,98 @@
 from flask import Blueprint, request, jsonify
-from src.models.models import db, Order
-from src.utils.ruten_client import RutenAPIClient
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from src.models.models import db, Order, OrderItem, SalesDailySummary
+from src.utils.shops import ShopNotFound, get_client
+from src.utils.cache import TTLCache
+from src.utils.concurrency import chunked, map_concurrently
+from src.utils.sync import SyncError, replace_order_items, sync_orders_page
+from src.utils.replica import use_replica
+from src.utils.admission import upstream_bound
+from src.utils.idempotency import idempotent
+from src.utils.serialization import (
+    ORDER_ROWS, UnsupportedFormat, list_layout, list_response, negotiate_list_format,
+    paginate_rows, to_layout, unsupported_format_response
+)
+import os
 import json
 from datetime import datetime
 
 order_bp = Blueprint('orders', __name__)
 
+# 訂單明細查詢設定
+ORDER_DETAIL_BATCH_SIZE = int(os.getenv('ORDER_DETAIL_BATCH_SIZE', '30'))
+ORDER_DETAIL_MAX_WORKERS = int(os.getenv('ORDER_DETAIL_MAX_WORKERS', '4'))
+ORDER_DETAIL_CACHE_TTL = float(os.getenv('ORDER_DETAIL_CACHE_TTL', '300'))
+ORDER_DETAIL_FINAL_CACHE_TTL = float(os.getenv('ORDER_DETAIL_FINAL_CACHE_TTL', '86400'))
+
+# 已結案的訂單狀態，明細不會再變動（已出貨的訂單仍可能退款，不屬於結案狀態）
+FINAL_ORDER_STATUSES = {'cancelled', 'refunded'}
+
+# 以 (商店ID, ruten_order_id) 為鍵的訂單明細快取，各商店的查詢互不共用
+order_detail_cache = TTLCache(default_ttl=ORDER_DETAIL_CACHE_TTL, maxsize=20000)
+
+def _evict_order_detail(order):
+    """訂單狀態在本地或露天變更後移除明細快取，避免回傳變更前的明細"""
+    if order.ruten_order_id:
+        order_detail_cache.delete((order.shop_id, str(order.ruten_order_id)))
+
+def _extract_order_details(result):
+    """從露天回應中取出各筆訂單明細"""
+    data = result.get('data') or []
+    if isinstance(data, dict):
+        data = data.get('orders', [])
+    return [detail for detail in data if isinstance(detail, dict) and detail.get('order_id')]
+
+def _store_order_detail_items(details):
+    """將訂單明細中的商品寫入本地已存在的訂單"""
+    details_by_ruten_id = {str(detail['order_id']): detail for detail in details if 'items' in detail}
+    if not details_by_ruten_id:
+        return
+    
+    orders = db.session.execute(
+        db.select(Order.id, Order.ruten_order_id).where(Order.ruten_order_id.in_(list(details_by_ruten_id.keys())))
+    ).all()
+    items_by_order_id = {
+        order_id: details_by_ruten_id[ruten_order_id]['items']
+        for order_id, ruten_order_id in orders
+    }
+    if items_by_order_id:
+        replace_order_items(items_by_order_id)
+        db.session.commit()
+
+def _order_detail_ttl(detail):
+    """已結案訂單的明細快取較久"""
+    status = str(detail.get('status') or detail.get('order_status') or '').lower()
+    if status in FINAL_ORDER_STATUSES:
+        return ORDER_DETAIL_FINAL_CACHE_TTL
+    return ORDER_DETAIL_CACHE_TTL
+
 @order_bp.route('/orders', methods=['GET'])
+@use_replica
 def get_orders():
     """查詢訂單列表"""
     try:
+        fmt = negotiate_list_format()
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('page_size', 30, type=int)
         status = request.args.get('status', 'all')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        include_items = request.args.get('include_items', 'false').lower() in ('1', 'true', 'yes')
         
         # 從本地資料庫查詢
         query = Order.query
+        if include_items:
+            # 以 selectin 一次載入本頁所有訂單的商品，避免 N+1 查詢
+            query = query.options(selectinload(Order.items))
         
         if status != 'all':
             query = query.filter(Order.status == status)
         
+        shop_id = request.args.get('shop_id', type=int)
+        if shop_id is not None:
+            query = query.filter(Order.shop_id == shop_id)
+        
         if start_date:
             try:
                 start_dt = datetime.strptime(start_date, '%Y%m%d')
@@ -42,22 +113,32 @@ def get_orders():
                     'message': 'Invalid end_date format. Use YYYYMMDD'
                 }), 400
         
-        orders = query.order_by(Order.order_date.desc()).paginate(
-            page=page, 
-            per_page=page_size, 
-            error_out=False
-        )
-        
-        return jsonify({
+        query = query.order_by(Order.order_date.desc())
+        if include_items:
+            orders = query.paginate(
+                page=page, 
+                per_page=page_size, 
+                error_out=False
+            )
+            order_rows = to_layout([order.to_dict(include_items=True) for order in orders.items], list_layout(fmt))
+            total, pages = orders.total, orders.pages
+        else:
+            # 不含商品明細時直接取欄位值序列化，不建立 model 物件
+            order_rows, total, pages = paginate_rows(query, ORDER_ROWS, page, page_size, list_layout(fmt))
+        
+        return list_response({
             'status': 'success',
             'data': {
-                'orders': [order.to_dict() for order in orders.items],
-                'total': orders.total,
+                'orders': order_rows,
+                'total': total,
                 'page': page,
                 'page_size': page_size,
-                'pages': orders.pages
+                'pages': pages
             }
-        })
+        }, fmt)
+        
+    except UnsupportedFormat as e:
+        return unsupported_format_response(e)
         
     except Exception as e:
         return jsonify({
@@ -69,10 +150,144 @@ def get_orders():
 def get_order(order_id):
     """取得單一訂單資訊"""
     try:
-        order = Order.query.get_or_404(order_id)
+        include_items = request.args.get('include_items', 'false').lower() in ('1', 'true', 'yes')
+        if include_items:
+            order = Order.query.options(joinedload(Order.items)).filter(Order.id == order_id).first_or_404()
+        else:
+            order = Order.query.get_or_404(order_id)
         return jsonify({
             'status': 'success',
-            'data': order.to_dict()
+            'data': order.to_dict(include_items=include_items)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@order_bp.route('/orders/<int:order_id>/items', methods=['GET'])
+def get_order_items(order_id):
+    """取得本地儲存的訂單商品明細"""
+    try:
+        order = Order.query.options(joinedload(Order.items)).filter(Order.id == order_id).first_or_404()
+        return jsonify({
+            'status': 'success',
+            'data': order.to_dict(include_items=True)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@order_bp.route('/orders/reports/units-sold', methods=['GET'])
+@use_replica
+def get_units_sold():
+    """依商品統計售出數量與金額"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        limit = request.args.get('limit', 100, type=int)
+        
+        units = func.sum(OrderItem.quantity).label('units')
+        query = db.select(
+            OrderItem.ruten_item_id,
+            units,
+            func.sum(OrderItem.subtotal).label('revenue'),
+            func.count(func.distinct(OrderItem.order_id)).label('order_count')
+        ).join(Order, Order.id == OrderItem.order_id)
+        
+        try:
+            if start_date:
+                query = query.where(Order.order_date >= datetime.strptime(start_date, '%Y%m%d'))
+            if end_date:
+                query = query.where(Order.order_date <= datetime.strptime(end_date, '%Y%m%d'))
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': 'Invalid date format. Use YYYYMMDD'
+            }), 400
+        
+        query = query.group_by(OrderItem.ruten_item_id).order_by(units.desc()).limit(limit)
+        rows = db.session.execute(query).all()
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'items': [{
+                    'ruten_item_id': row.ruten_item_id,
+                    'units': int(row.units or 0),
+                    'revenue': float(row.revenue) if row.revenue else None,
+                    'order_count': row.order_count
+                } for row in rows]
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@order_bp.route('/reports/sales', methods=['GET'])
+@use_replica
+def get_sales_report():
+    """依日期與狀態查詢銷售統計（讀取每日統計表，不掃描訂單）"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        statuses = [status for status in request.args.get('status', '').split(',') if status]
+        group_by = request.args.get('group_by', 'day')
+        
+        if group_by not in ('day', 'month'):
+            return jsonify({
+                'status': 'error',
+                'message': 'group_by must be day or month'
+            }), 400
+        
+        query = db.select(SalesDailySummary).where(SalesDailySummary.order_count != 0)
+        try:
+            if start_date:
+                query = query.where(SalesDailySummary.day >= datetime.strptime(start_date, '%Y%m%d').date())
+            if end_date:
+                query = query.where(SalesDailySummary.day <= datetime.strptime(end_date, '%Y%m%d').date())
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': 'Invalid date format. Use YYYYMMDD'
+            }), 400
+        if statuses:
+            query = query.where(SalesDailySummary.status.in_(statuses))
+        
+        summaries = db.session.execute(
+            query.order_by(SalesDailySummary.day, SalesDailySummary.status)
+        ).scalars().all()
+        
+        periods = {}
+        totals = {}
+        for summary in summaries:
+            period = summary.day.isoformat() if group_by == 'day' else summary.day.strftime('%Y-%m')
+            row = periods.setdefault((period, summary.status), {
+                'period': period, 'status': summary.status, 'order_count': 0, 'total_amount': 0.0
+            })
+            row['order_count'] += summary.order_count
+            row['total_amount'] += float(summary.total_amount or 0)
+            total = totals.setdefault(summary.status, {'order_count': 0, 'total_amount': 0.0})
+            total['order_count'] += summary.order_count
+            total['total_amount'] += float(summary.total_amount or 0)
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'group_by': group_by,
+                'rows': [{**row, 'total_amount': round(row['total_amount'], 2)} for row in periods.values()],
+                'totals': {
+                    status: {**total, 'total_amount': round(total['total_amount'], 2)}
+                    for status, total in totals.items()
+                }
+            }
         })
         
     except Exception as e:
@@ -82,6 +297,8 @@ def get_order(order_id):
         }), 500
 
 @order_bp.route('/orders/<int:order_id>/ship', methods=['POST'])
+@idempotent
+@upstream_bound
 def ship_order(order_id):
     """訂單出貨"""
     try:
@@ -93,17 +310,20 @@ def ship_order(order_id):
         order.ship_date = datetime.utcnow()
         order.updated_at = datetime.utcnow()
         db.session.commit()
+        _evict_order_detail(order)
         
         # 同步到露天拍賣
         if order.ruten_order_id and data.get('sync_to_ruten', True):
             try:
-                client = RutenAPIClient()
+                client = get_client(order.shop_id)
                 shipping_data = {
                     'shipping_method': data.get('shipping_method', ''),
                     'tracking_number': data.get('tracking_number', ''),
                     'shipping_note': data.get('shipping_note', '')
                 }
                 result = client.ship_order(order.ruten_order_id, shipping_data)
+                # 推送期間可能有明細查詢把露天變更前的狀態寫回快取
+                _evict_order_detail(order)
                 
                 if 'error' in result:
                     return jsonify({
@@ -134,6 +354,8 @@ def ship_order(order_id):
         }), 500
 
 @order_bp.route('/orders/<int:order_id>/cancel', methods=['POST'])
+@idempotent
+@upstream_bound
 def cancel_order(order_id):
     """取消訂單"""
     try:
@@ -146,12 +368,15 @@ def cancel_order(order_id):
         order.status = 'cancelled'
         order.updated_at = datetime.utcnow()
         db.session.commit()
+        _evict_order_detail(order)
         
         # 同步到露天拍賣
         if order.ruten_order_id and data.get('sync_to_ruten', True):
             try:
-                client = RutenAPIClient()
+                client = get_client(order.shop_id)
                 result = client.cancel_order(order.ruten_order_id, reason)
+                # 推送期間可能有明細查詢把露天變更前的狀態寫回快取
+                _evict_order_detail(order)
                 
                 if 'error' in result:
                     return jsonify({
@@ -182,6 +407,8 @@ def cancel_order(order_id):
         }), 500
 
 @order_bp.route('/orders/<int:order_id>/refund', methods=['POST'])
+@idempotent
+@upstream_bound
 def refund_order(order_id):
     """訂單退款"""
     try:
@@ -192,17 +419,20 @@ def refund_order(order_id):
         order.status = 'refunded'
         order.updated_at = datetime.utcnow()
         db.session.commit()
+        _evict_order_detail(order)
         
         # 同步到露天拍賣
         if order.ruten_order_id and data.get('sync_to_ruten', True):
             try:
-                client = RutenAPIClient()
+                client = get_client(order.shop_id)
                 refund_data = {
                     'refund_amount': data.get('refund_amount', order.total_amount),
                     'refund_reason': data.get('refund_reason', 'Customer request'),
                     'refund_note': data.get('refund_note', '')
                 }
                 result = client.refund_order(order.ruten_order_id, refund_data)
+                # 推送期間可能有明細查詢把露天變更前的狀態寫回快取
+                _evict_order_detail(order)
                 
                 if 'error' in result:
                     return jsonify({
@@ -233,10 +463,12 @@ def refund_order(order_id):
         }), 500
 
 @order_bp.route('/orders/sync', methods=['POST'])
+@upstream_bound
 def sync_orders_from_ruten():
     """從露天拍賣同步訂單資料"""
     try:
-        client = RutenAPIClient()
+        shop_id = request.args.get('shop_id', type=int)
+        client = get_client(shop_id)
         
         # 取得查詢參數
         start_date = request.args.get('start_date')
@@ -245,73 +477,43 @@ def sync_orders_from_ruten():
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('page_size', 30, type=int)
         
-        result = client.get_orders(
-            start_date=start_date,
-            end_date=end_date,
-            order_status=order_status,
-            page=page,
-            page_size=page_size
-        )
-        
-        if 'error' in result:
+        try:
+            result = sync_orders_page(
+                client,
+                page=page,
+                page_size=page_size,
+                start_date=start_date,
+                end_date=end_date,
+                order_status=order_status,
+                shop_id=shop_id
+            )
+            synced_count = result['synced_count']
+        except SyncError as e:
             return jsonify({
                 'status': 'error',
-                'message': result.get('message', 'Failed to fetch orders from Ruten')
+                'message': str(e)
             }), 500
         
-        synced_count = 0
-        orders_data = result.get('data', {}).get('orders', [])
-        
-        for order_data in orders_data:
-            ruten_order_id = order_data.get('order_id')
-            
-            # 檢查是否已存在
-            existing_order = Order.query.filter_by(ruten_order_id=ruten_order_id).first()
-            
-            # 解析訂單日期
-            order_date = None
-            if order_data.get('order_date'):
-                try:
-                    order_date = datetime.strptime(order_data['order_date'], '%Y-%m-%d %H:%M:%S')
-                except ValueError:
-                    try:
-                        order_date = datetime.strptime(order_data['order_date'], '%Y%m%d')
-                    except ValueError:
-                        pass
-            
-            if existing_order:
-                # 更新現有訂單
-                existing_order.buyer_name = order_data.get('buyer_name', existing_order.buyer_name)
-                existing_order.total_amount = order_data.get('total_amount', existing_order.total_amount)
-                existing_order.status = order_data.get('status', existing_order.status)
-                if order_date:
-                    existing_order.order_date = order_date
-                existing_order.updated_at = datetime.utcnow()
-            else:
-                # 建立新訂單
-                new_order = Order(
-                    ruten_order_id=ruten_order_id,
-                    buyer_name=order_data.get('buyer_name', ''),
-                    total_amount=order_data.get('total_amount', 0),
-                    status=order_data.get('status', 'pending'),
-                    order_date=order_date
-                )
-                db.session.add(new_order)
-            
-            synced_count += 1
-        
-        db.session.commit()
-        
         return jsonify({
             'status': 'success',
             'message': f'Successfully synced {synced_count} orders',
             'data': {
                 'synced_count': synced_count,
+                'inserted': result['inserted'],
+                'updated': result['updated'],
+                'unchanged': result['unchanged'],
                 'page': page,
-                'page_size': page_size
+                'page_size': page_size,
+                'shop_id': shop_id
             }
         })
         
+    except ShopNotFound as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+        
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -320,6 +522,7 @@ def sync_orders_from_ruten():
         }), 500
 
 @order_bp.route('/orders/detail', methods=['POST'])
+@upstream_bound
 def get_order_details():
     """查詢訂單明細"""
     try:
@@ -332,14 +535,58 @@ def get_order_details():
                 'message': 'Missing required field: order_ids'
             }), 400
         
-        client = RutenAPIClient()
-        result = client.get_order_detail(order_ids)
+        # 字串會被逐字元拆成訂單ID
+        if not isinstance(order_ids, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'order_ids must be a list'
+            }), 400
+        
+        # 去除重複並保留原始順序
+        order_ids = list(dict.fromkeys(str(order_id) for order_id in order_ids))
         
-        if 'error' in result:
+        # 快取鍵需與訂單的 shop_id 相同，變更訂單狀態時才能移除
+        shop_id = data.get('shop_id')
+        if shop_id is not None and not isinstance(shop_id, int):
             return jsonify({
                 'status': 'error',
-                'message': result.get('message', 'Failed to fetch order details from Ruten')
-            }), 500
+                'message': 'shop_id must be an integer'
+            }), 400
+        
+        cached = {
+            order_id: detail
+            for (_, order_id), detail in order_detail_cache.get_many((shop_id, order_id) for order_id in order_ids).items()
+        }
+        missing_ids = [order_id for order_id in order_ids if order_id not in cached]
+        
+        if missing_ids:
+            client = get_client(shop_id)
+            batches = chunked(missing_ids, ORDER_DETAIL_BATCH_SIZE)
+            results = map_concurrently(client.get_order_detail, batches, max_workers=ORDER_DETAIL_MAX_WORKERS)
+            
+            for batch_result in results:
+                if 'error' in batch_result:
+                    return jsonify({
+                        'status': 'error',
+                        'message': batch_result.get('message', 'Failed to fetch order details from Ruten')
+                    }), 500
+            
+            fetched = []
+            for batch_result in results:
+                for detail in _extract_order_details(batch_result):
+                    order_id = str(detail['order_id'])
+                    order_detail_cache.set((shop_id, order_id), detail, ttl=_order_detail_ttl(detail))
+                    cached[order_id] = detail
+                    fetched.append(detail)
+            
+            _store_order_detail_items(fetched)
+        
+        result = {
+            'status': 'success',
+            'data': {
+                'orders': [cached[order_id] for order_id in order_ids if order_id in cached]
+            }
+        }
         
         return jsonify({
             'status': 'success',
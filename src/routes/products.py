@@ -1,40 +1,125 @@
 from flask import Blueprint, request, jsonify
-from src.models.models import db, Product
-from src.utils.ruten_client import RutenAPIClient
+from src.models.models import db, Product, Shop
+from src.utils.shops import ShopNotFound, get_client
+from src.utils.concurrency import chunked, map_concurrently
+from src.utils.sync import SyncError, sync_products_page
+from src.utils.change_log import record_changes
+from src.utils.search import search_products
+from src.utils.stock import StockAdjustmentError, adjust_stock, enqueue_stock_pushes
+from src.utils.replica import use_replica
+from src.utils.admission import AdmissionRejected, upstream_admission, upstream_bound
+from src.utils.idempotency import idempotent
+from src.utils.serialization import (
+    PRODUCT_ROWS, UnsupportedFormat, list_layout, list_response, negotiate_list_format,
+    paginate_rows, to_layout, unsupported_format_response
+)
+import os
 import json
 from datetime import datetime
 
 product_bp = Blueprint('products', __name__)
 
+# 自訂編號解析設定
+CUSTOM_NO_QUERY_CHUNK = 500
+CUSTOM_NO_REMOTE_MAX_WORKERS = int(os.getenv('CUSTOM_NO_REMOTE_MAX_WORKERS', '8'))
+
+def _extract_item_id(result):
+    """從露天自訂編號查詢結果中取出商品ID"""
+    if 'error' in result or result.get('status') != 'success':
+        return None
+    data = result.get('data')
+    if isinstance(data, dict):
+        return data.get('item_id')
+    if isinstance(data, list):
+        return data[0].get('item_id') if data and isinstance(data[0], dict) else None
+    return data or None
+
 @product_bp.route('/products', methods=['GET'])
+@use_replica
 def get_products():
     """查詢商品列表"""
     try:
+        fmt = negotiate_list_format()
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('page_size', 30, type=int)
         status = request.args.get('status', 'all')
         
+        shop_id = request.args.get('shop_id', type=int)
+        
         # 從本地資料庫查詢
         query = Product.query
         if status != 'all':
             query = query.filter(Product.status == status)
+        if shop_id is not None:
+            query = query.filter(Product.shop_id == shop_id)
         
-        products = query.paginate(
-            page=page, 
-            per_page=page_size, 
-            error_out=False
-        )
+        # 直接取欄位值序列化，不建立 model 物件
+        products, total, pages = paginate_rows(query, PRODUCT_ROWS, page, page_size, list_layout(fmt))
+        
+        return list_response({
+            'status': 'success',
+            'data': {
+                'products': products,
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'pages': pages
+            }
+        }, fmt)
+        
+    except UnsupportedFormat as e:
+        return unsupported_format_response(e)
         
+    except Exception as e:
         return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@product_bp.route('/products/search', methods=['GET'])
+@use_replica
+def search_product_listings():
+    """全文搜尋商品標題與描述"""
+    try:
+        fmt = negotiate_list_format()
+        query = request.args.get('q', '').strip()
+        page = request.args.get('page', 1, type=int)
+        page_size = request.args.get('page_size', 30, type=int)
+        status = request.args.get('status', 'all')
+        
+        if not query:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: q'
+            }), 400
+        
+        results, total = search_products(
+            query,
+            page=page,
+            page_size=page_size,
+            status=None if status == 'all' else status,
+            shop_id=request.args.get('shop_id', type=int)
+        )
+        
+        products = []
+        for product, score in results:
+            item = product.to_dict()
+            item['score'] = round(score, 6)
+            products.append(item)
+        
+        return list_response({
             'status': 'success',
             'data': {
-                'products': [product.to_dict() for product in products.items],
-                'total': products.total,
+                'products': to_layout(products, list_layout(fmt)),
+                'total': total,
                 'page': page,
                 'page_size': page_size,
-                'pages': products.pages
+                'pages': (total + page_size - 1) // page_size if page_size > 0 else 0
             }
-        })
+        }, fmt)
+        
+    except UnsupportedFormat as e:
+        return unsupported_format_response(e)
         
     except Exception as e:
         return jsonify({
@@ -59,6 +144,8 @@ def get_product(product_id):
         }), 500
 
 @product_bp.route('/products', methods=['POST'])
+@idempotent
+@upstream_bound
 def create_product():
     """新增商品"""
     try:
@@ -73,14 +160,25 @@ def create_product():
                     'message': f'Missing required field: {field}'
                 }), 400
         
+        shop_id = data.get('shop_id')
+        if shop_id is not None:
+            shop = db.session.get(Shop, shop_id)
+            if shop is None or not shop.active:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Shop {shop_id} not found'
+                }), 404
+        
         # 建立新商品
         product = Product(
+            shop_id=shop_id,
             title=data['title'],
             description=data.get('description', ''),
             price=data['price'],
             stock=data.get('stock', 0),
             status=data.get('status', 'offline'),
-            category_id=data.get('category_id')
+            category_id=data.get('category_id'),
+            custom_no=data.get('custom_no')
         )
         
         db.session.add(product)
@@ -89,7 +187,7 @@ def create_product():
         # 如果需要同步到露天拍賣
         if data.get('sync_to_ruten', False):
             try:
-                client = RutenAPIClient()
+                client = get_client(shop_id)
                 ruten_data = {
                     'title': data['title'],
                     'description': data.get('description', ''),
@@ -139,6 +237,8 @@ def update_product(product_id):
             product.status = data['status']
         if 'category_id' in data:
             product.category_id = data['category_id']
+        if 'custom_no' in data:
+            product.custom_no = data['custom_no']
         
         product.updated_at = datetime.utcnow()
         db.session.commit()
@@ -172,11 +272,15 @@ def update_product_stock(product_id):
         product.updated_at = datetime.utcnow()
         db.session.commit()
         
-        # 同步到露天拍賣
+        # 同步到露天拍賣；露天並行已滿時改排入推送佇列，不拒絕本地更新
         if product.ruten_item_id and data.get('sync_to_ruten', True):
             try:
-                client = RutenAPIClient()
-                client.update_product_stock(product.ruten_item_id, data['stock'])
+                with upstream_admission.slot(timeout=0):
+                    client = get_client(product.shop_id)
+                    client.update_product_stock(product.ruten_item_id, data['stock'])
+            except AdmissionRejected:
+                enqueue_stock_pushes([(product.id, product.stock, product.ruten_item_id)])
+                db.session.commit()
             except Exception as e:
                 print(f"Failed to sync stock to Ruten: {e}")
         
@@ -192,7 +296,88 @@ def update_product_stock(product_id):
             'message': str(e)
         }), 500
 
+def _apply_stock_adjustments(adjustments, sync_to_ruten=True):
+    """原子地套用庫存增減，並將結果排入露天推送佇列"""
+    deltas = {}
+    for adjustment in adjustments:
+        product_id = adjustment.get('product_id')
+        delta = adjustment.get('delta')
+        if not isinstance(product_id, int) or not isinstance(delta, int) or isinstance(delta, bool):
+            return jsonify({
+                'status': 'error',
+                'message': 'Each adjustment requires integer product_id and delta'
+            }), 400
+        deltas[product_id] = deltas.get(product_id, 0) + delta
+    
+    try:
+        rows = adjust_stock(deltas)
+    except StockAdjustmentError as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': 'Stock adjustment failed, no changes were applied',
+            'failures': e.failures
+        }), 409
+    # 只排入佇列，由排程器（或 push-stock 指令）推送；請求內不呼叫露天，高頻調整不受露天延遲影響
+    queued = enqueue_stock_pushes(rows) if sync_to_ruten else 0
+    db.session.commit()
+    
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'products': [{'id': product_id, 'stock': stock} for product_id, stock, _ in rows],
+            'queued': queued
+        }
+    })
+
+@product_bp.route('/products/<int:product_id>/stock/adjust', methods=['POST'])
+def adjust_product_stock(product_id):
+    """以增減量調整商品庫存（例如售出 -2）"""
+    try:
+        data = request.get_json()
+        
+        if 'delta' not in data:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required field: delta'
+            }), 400
+        
+        return _apply_stock_adjustments(
+            [{'product_id': product_id, 'delta': data['delta']}],
+            data.get('sync_to_ruten', True)
+        )
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@product_bp.route('/products/stock/adjust', methods=['POST'])
+def adjust_products_stock():
+    """批次以增減量調整多項商品庫存，任一項失敗時整批不寫入"""
+    try:
+        data = request.get_json()
+        adjustments = data.get('adjustments', [])
+        
+        if not adjustments:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required field: adjustments'
+            }), 400
+        
+        return _apply_stock_adjustments(adjustments, data.get('sync_to_ruten', True))
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @product_bp.route('/products/<int:product_id>/price', methods=['PUT'])
+@upstream_bound
 def update_product_price(product_id):
     """更新商品價格"""
     try:
@@ -212,7 +397,7 @@ def update_product_price(product_id):
         # 同步到露天拍賣
         if product.ruten_item_id and data.get('sync_to_ruten', True):
             try:
-                client = RutenAPIClient()
+                client = get_client(product.shop_id)
                 client.update_product_price(product.ruten_item_id, data['price'])
             except Exception as e:
                 print(f"Failed to sync price to Ruten: {e}")
@@ -230,6 +415,7 @@ def update_product_price(product_id):
         }), 500
 
 @product_bp.route('/products/<int:product_id>/status', methods=['PUT'])
+@upstream_bound
 def update_product_status(product_id):
     """更新商品狀態 (上架/下架)"""
     try:
@@ -255,7 +441,7 @@ def update_product_status(product_id):
         # 同步到露天拍賣
         if product.ruten_item_id and data.get('sync_to_ruten', True):
             try:
-                client = RutenAPIClient()
+                client = get_client(product.shop_id)
                 if data['status'] == 'online':
                     client.set_product_online(product.ruten_item_id)
                 else:
@@ -276,6 +462,7 @@ def update_product_status(product_id):
         }), 500
 
 @product_bp.route('/products/<int:product_id>', methods=['DELETE'])
+@upstream_bound
 def delete_product(product_id):
     """刪除商品"""
     try:
@@ -284,7 +471,7 @@ def delete_product(product_id):
         # 先下架露天拍賣商品
         if product.ruten_item_id:
             try:
-                client = RutenAPIClient()
+                client = get_client(product.shop_id)
                 client.set_product_offline(product.ruten_item_id)
             except Exception as e:
                 print(f"Failed to offline product on Ruten: {e}")
@@ -305,63 +492,44 @@ def delete_product(product_id):
         }), 500
 
 @product_bp.route('/products/sync', methods=['POST'])
+@upstream_bound
 def sync_products_from_ruten():
     """從露天拍賣同步商品資料"""
     try:
-        client = RutenAPIClient()
+        shop_id = request.args.get('shop_id', type=int)
+        client = get_client(shop_id)
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('page_size', 30, type=int)
         
-        result = client.get_products(page=page, page_size=page_size)
-        
-        if 'error' in result:
+        try:
+            result = sync_products_page(client, page=page, page_size=page_size, shop_id=shop_id)
+            synced_count = result['synced_count']
+        except SyncError as e:
             return jsonify({
                 'status': 'error',
-                'message': result.get('message', 'Failed to fetch products from Ruten')
+                'message': str(e)
             }), 500
         
-        synced_count = 0
-        products_data = result.get('data', {}).get('products', [])
-        
-        for product_data in products_data:
-            ruten_item_id = product_data.get('item_id')
-            
-            # 檢查是否已存在
-            existing_product = Product.query.filter_by(ruten_item_id=ruten_item_id).first()
-            
-            if existing_product:
-                # 更新現有商品
-                existing_product.title = product_data.get('title', existing_product.title)
-                existing_product.price = product_data.get('price', existing_product.price)
-                existing_product.stock = product_data.get('stock', existing_product.stock)
-                existing_product.status = product_data.get('status', existing_product.status)
-                existing_product.updated_at = datetime.utcnow()
-            else:
-                # 建立新商品
-                new_product = Product(
-                    ruten_item_id=ruten_item_id,
-                    title=product_data.get('title', ''),
-                    description=product_data.get('description', ''),
-                    price=product_data.get('price', 0),
-                    stock=product_data.get('stock', 0),
-                    status=product_data.get('status', 'offline')
-                )
-                db.session.add(new_product)
-            
-            synced_count += 1
-        
-        db.session.commit()
-        
         return jsonify({
             'status': 'success',
             'message': f'Successfully synced {synced_count} products',
             'data': {
                 'synced_count': synced_count,
+                'inserted': result['inserted'],
+                'updated': result['updated'],
+                'unchanged': result['unchanged'],
                 'page': page,
-                'page_size': page_size
+                'page_size': page_size,
+                'shop_id': shop_id
             }
         })
         
+    except ShopNotFound as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+        
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -369,3 +537,83 @@ def sync_products_from_ruten():
             'message': str(e)
         }), 500
 
+
+@product_bp.route('/products/resolve', methods=['POST'])
+@upstream_bound
+def resolve_custom_numbers():
+    """批次將自訂編號對應為露天商品ID"""
+    try:
+        data = request.get_json()
+        custom_nos = data.get('custom_nos', [])
+        
+        if not custom_nos:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required field: custom_nos'
+            }), 400
+        
+        custom_nos = list(dict.fromkeys(str(custom_no) for custom_no in custom_nos))
+        # 自訂編號只在賣場內唯一，本地查詢與回寫都限定在同一商店（未指定時為預設帳號，shop_id 為 NULL）
+        shop_id = data.get('shop_id')
+        
+        # 先以本地索引批次查詢
+        mapping = {}
+        for chunk in chunked(custom_nos, CUSTOM_NO_QUERY_CHUNK):
+            rows = db.session.execute(
+                db.select(Product.custom_no, Product.ruten_item_id).where(
+                    Product.shop_id == shop_id,
+                    Product.custom_no.in_(chunk),
+                    Product.ruten_item_id.isnot(None)
+                )
+            ).all()
+            mapping.update({custom_no: ruten_item_id for custom_no, ruten_item_id in rows})
+        local_hits = len(mapping)
+        
+        # 本地找不到的再並行查詢露天
+        misses = [custom_no for custom_no in custom_nos if custom_no not in mapping]
+        remote_hits = {}
+        if misses and data.get('fallback_to_ruten', True):
+            client = get_client(shop_id)
+            results = map_concurrently(client.get_item_id_by_custom_no, misses, max_workers=CUSTOM_NO_REMOTE_MAX_WORKERS)
+            for custom_no, result in zip(misses, results):
+                item_id = _extract_item_id(result)
+                if item_id:
+                    remote_hits[custom_no] = str(item_id)
+            mapping.update(remote_hits)
+            
+            # 回寫本地已存在但尚未記錄自訂編號的商品
+            if remote_hits:
+                try:
+                    changes = []
+                    for custom_no, item_id in remote_hits.items():
+                        updated_ids = db.session.execute(
+                            db.update(Product)
+                            .where(Product.shop_id == shop_id, Product.ruten_item_id == item_id,
+                                   Product.custom_no.is_(None))
+                            .values(custom_no=custom_no, content_hash=None)
+                            .returning(Product.id)
+                        ).scalars().all()
+                        changes.extend({'id': product_id, 'custom_no': custom_no} for product_id in updated_ids)
+                    record_changes('product', changes)
+                    db.session.commit()
+                except Exception as e:
+                    # 回寫失敗不影響查詢結果
+                    db.session.rollback()
+                    print(f"Failed to store custom_no mapping: {e}")
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'mapping': mapping,
+                'not_found': [custom_no for custom_no in custom_nos if custom_no not in mapping],
+                'local_hits': local_hits,
+                'remote_hits': len(remote_hits)
+            }
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
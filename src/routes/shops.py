@@ -0,0 +1,198 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy.exc import IntegrityError
+from src.models.models import db, Shop
+from src.utils.ruten_client import RutenAPIClient
+from src.utils.shops import ShopNotFound, get_client, invalidate_client, set_shop_credentials
+from src.utils.admission import upstream_bound
+from datetime import datetime
+
+shop_bp = Blueprint('shops', __name__)
+
+CREDENTIAL_FIELDS = ('api_key', 'secret_key', 'salt_key')
+
+def _apply_rate_settings(shop, data):
+    for field in ('rate_limit', 'rate_burst'):
+        if field in data:
+            value = data[field]
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+                raise ValueError(f'{field} must be a non-negative number')
+            setattr(shop, field, value)
+
+@shop_bp.route('/shops', methods=['GET'])
+def get_shops():
+    """查詢商店列表（不含憑證）"""
+    try:
+        query = Shop.query
+        if request.args.get('active', 'true').lower() in ('1', 'true', 'yes'):
+            query = query.filter(Shop.active.is_(True))
+        shops = query.order_by(Shop.id).all()
+
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'shops': [shop.to_dict() for shop in shops]
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@shop_bp.route('/shops', methods=['POST'])
+@upstream_bound
+def create_shop():
+    """新增商店，Secret 與 Salt 加密後儲存"""
+    try:
+        data = request.get_json()
+
+        for field in ('name',) + CREDENTIAL_FIELDS:
+            if not data.get(field):
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Missing required field: {field}'
+                }), 400
+
+        # 預設先向露天驗證憑證
+        if data.get('verify', True):
+            result = RutenAPIClient(
+                api_key=data['api_key'],
+                secret_key=data['secret_key'],
+                salt_key=data['salt_key']
+            ).verify_credentials()
+            if not result.get('valid'):
+                return jsonify({
+                    'status': 'error',
+                    'message': result.get('message', 'Invalid credentials')
+                }), 400
+
+        shop = Shop(name=data['name'], active=True)
+        set_shop_credentials(shop, data['api_key'], data['secret_key'], data['salt_key'])
+        _apply_rate_settings(shop, data)
+        db.session.add(shop)
+        db.session.commit()
+
+        return jsonify({
+            'status': 'success',
+            'data': shop.to_dict()
+        }), 201
+
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f"Shop name already exists: {data.get('name')}"
+        }), 409
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@shop_bp.route('/shops/<int:shop_id>', methods=['PUT'])
+def update_shop(shop_id):
+    """更新商店名稱、速率設定或憑證（憑證需三項一起更新）"""
+    try:
+        shop = Shop.query.get_or_404(shop_id)
+        data = request.get_json()
+
+        if 'name' in data:
+            shop.name = data['name']
+        if 'active' in data:
+            shop.active = bool(data['active'])
+        _apply_rate_settings(shop, data)
+
+        credentials = [data.get(field) for field in CREDENTIAL_FIELDS]
+        if any(credentials):
+            if not all(credentials):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'api_key, secret_key and salt_key must be updated together'
+                }), 400
+            set_shop_credentials(shop, *credentials)
+
+        shop.updated_at = datetime.utcnow()
+        db.session.commit()
+        invalidate_client(shop_id)
+
+        return jsonify({
+            'status': 'success',
+            'data': shop.to_dict()
+        })
+
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f"Shop name already exists: {data.get('name')}"
+        }), 409
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@shop_bp.route('/shops/<int:shop_id>', methods=['DELETE'])
+def delete_shop(shop_id):
+    """停用商店（保留商品與訂單資料）"""
+    try:
+        shop = Shop.query.get_or_404(shop_id)
+        shop.active = False
+        shop.updated_at = datetime.utcnow()
+        db.session.commit()
+        invalidate_client(shop_id)
+
+        return jsonify({
+            'status': 'success',
+            'message': 'Shop deactivated successfully'
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@shop_bp.route('/shops/<int:shop_id>/verify', methods=['POST'])
+@upstream_bound
+def verify_shop(shop_id):
+    """以儲存的憑證向露天驗證"""
+    try:
+        result = get_client(shop_id).verify_credentials()
+
+        return jsonify({
+            'status': 'success',
+            'data': result
+        })
+
+    except ShopNotFound as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
@@ -0,0 +1,86 @@
+from flask import Blueprint, request, jsonify, current_app
+from src.models.models import db, SyncJob, SyncRun
+from src.utils.sync import SYNC_RESOURCES
+from src.utils.sync_jobs import start_job
+
+sync_bp = Blueprint('sync', __name__)
+
+# 各資源允許的同步參數
+SYNC_PARAMS = {
+    'products': ('page_size', 'shop_id'),
+    'orders': ('page_size', 'start_date', 'end_date', 'order_status', 'shop_id'),
+    'categories': ('shop_id',)
+}
+
+@sync_bp.route('/sync/<resource>', methods=['POST'])
+def create_sync_job(resource):
+    """建立背景同步工作，相同的同步正在執行時直接回傳該工作"""
+    try:
+        if resource not in SYNC_RESOURCES:
+            return jsonify({
+                'status': 'error',
+                'message': f'Unsupported sync resource: {resource}'
+            }), 404
+
+        data = request.get_json(silent=True) or {}
+        params = {}
+        for name in SYNC_PARAMS[resource]:
+            value = data.get(name, request.args.get(name))
+            if value is not None:
+                params[name] = int(value) if name in ('page_size', 'shop_id') else value
+
+        job, created = start_job(current_app._get_current_object(), resource, params)
+
+        return jsonify({
+            'status': 'success',
+            'message': 'Sync job started' if created else 'Attached to running sync job',
+            'data': job.to_dict()
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@sync_bp.route('/sync/jobs/<job_id>', methods=['GET'])
+def get_sync_job(job_id):
+    """查詢同步工作進度"""
+    try:
+        job = db.get_or_404(SyncJob, job_id)
+        return jsonify({
+            'status': 'success',
+            'data': job.to_dict()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@sync_bp.route('/sync/runs', methods=['GET'])
+def get_sync_runs():
+    """查詢排程同步的執行紀錄"""
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        query = SyncRun.query
+        if request.args.get('resource'):
+            query = query.filter(SyncRun.resource == request.args['resource'])
+        if request.args.get('shop_id'):
+            query = query.filter(SyncRun.shop_id == request.args.get('shop_id', type=int))
+        runs = query.order_by(SyncRun.started_at.desc()).limit(limit).all()
+
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'runs': [run.to_dict() for run in runs]
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
@@ -0,0 +1,240 @@
+"""背景同步排程器
+
+獨立於網頁行程執行，依設定的間隔同步商品、訂單與分類（多個商店並行同步）：
+
+    python -m src.scheduler            # 常駐執行
+    python -m src.scheduler --once     # 每項啟用的資源同步一次後結束
+
+排程器也會定期重試庫存推送佇列、維護 Postgres 的月份分割並清除過期的 Idempotency-Key 紀錄。
+同時啟動多個實例時，只有取得領導者鎖的實例會執行同步。
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+logger = logging.getLogger('src.scheduler')
+
+# 各資源的預設同步間隔（秒）；RutenAPIClient 尚未提供 get_orders 與 get_categories，
+# 訂單與分類預設停用，需要時以 SYNC_ORDERS_INTERVAL / SYNC_CATEGORIES_INTERVAL 開啟
+DEFAULT_INTERVALS = {
+    'products': 900,
+    'orders': 0,
+    'categories': 0
+}
+
+# 維護工作的執行間隔（秒），0 表示停用
+STOCK_PUSH_INTERVAL = int(os.getenv('STOCK_PUSH_INTERVAL', '30'))
+PARTITION_MAINTENANCE_INTERVAL = int(os.getenv('PARTITION_MAINTENANCE_INTERVAL', '86400'))
+IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv('IDEMPOTENCY_PURGE_INTERVAL', '3600'))
+
+def load_intervals():
+    """讀取 SYNC_<RESOURCE>_INTERVAL 環境變數，0 表示停用"""
+    return {
+        resource: int(os.getenv(f'SYNC_{resource.upper()}_INTERVAL', str(default)))
+        for resource, default in DEFAULT_INTERVALS.items()
+    }
+
+def sync_params(resource):
+    """排程同步的額外參數，訂單只回溯最近幾天"""
+    if resource == 'orders':
+        lookback_days = int(os.getenv('SYNC_ORDERS_LOOKBACK_DAYS', '7'))
+        return {'start_date': (datetime.utcnow() - timedelta(days=lookback_days)).strftime('%Y%m%d')}
+    return {}
+
+def run_shop_sync(resource, shop_id=None):
+    """同步單一商店的資源並記錄執行時間與筆數（需在 app context 內呼叫）"""
+    from src.models.models import db, SyncRun
+    from src.utils.shops import get_client
+    from src.utils.sync import sync_resource
+
+    run = SyncRun(resource=resource, shop_id=shop_id, status='running', started_at=datetime.utcnow())
+    db.session.add(run)
+    db.session.commit()
+    run_id = run.id
+
+    start = time.perf_counter()
+    try:
+        result = sync_resource(
+            resource,
+            get_client(shop_id),
+            page_size=int(os.getenv('SYNC_PAGE_SIZE', '30')),
+            max_pages=int(os.getenv('SYNC_MAX_PAGES', '1000')),
+            shop_id=shop_id,
+            **sync_params(resource)
+        )
+        status, error = 'success', None
+    except Exception as e:
+        db.session.rollback()
+        result, status, error = {'synced_count': 0, 'pages': 0}, 'failed', str(e)
+        logger.exception(f"Scheduled sync failed: {resource} (shop {shop_id})")
+
+    run = db.session.get(SyncRun, run_id)
+    run.status = status
+    run.rows = result['synced_count']
+    run.pages = result['pages']
+    run.duration = round(time.perf_counter() - start, 3)
+    run.error = error
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"Sync {resource} (shop {shop_id}): status={status}, rows={run.rows}, pages={run.pages}, "
+                f"inserted={result.get('inserted', 0)}, updated={result.get('updated', 0)}, "
+                f"unchanged={result.get('unchanged', 0)}, duration={run.duration}s")
+    return run.to_dict()
+
+def run_sync(resource):
+    """所有商店並行同步同一項資源，各商店使用自己的速率預算（需在 app context 內呼叫）"""
+    from flask import current_app
+    from src.utils.shops import for_each_shop
+
+    results = for_each_shop(current_app._get_current_object(), lambda shop_id: run_shop_sync(resource, shop_id))
+    if not results:
+        logger.warning(f"Sync {resource} skipped: no Ruten credentials or active shops configured")
+    return [result for result in results.values() if not isinstance(result, Exception)]
+
+def run_stock_push():
+    """推送佇列中尚未送到露天的庫存（需在 app context 內呼叫）"""
+    from src.models.models import db
+    from src.utils.stock import push_pending_stock
+
+    try:
+        result = push_pending_stock()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Stock push failed")
+        return
+    if result['pushed'] or result['failed']:
+        logger.info(f"Stock push: pushed={result['pushed']}, failed={result['failed']}, "
+                    f"dead_lettered={result['dead_lettered']}")
+
+def run_partition_maintenance():
+    """建立未來月份的分割並套用保留期限（需在 app context 內呼叫）"""
+    from src.models.models import db
+    from src.utils.partitioning import maintain_partitions
+
+    try:
+        result = maintain_partitions(db.engine)
+    except Exception:
+        logger.exception("Partition maintenance failed")
+        return
+    if result['created'] or result['dropped']:
+        logger.info(f"Partition maintenance: created={result['created']}, dropped={result['dropped']}")
+
+def run_idempotency_purge():
+    """刪除過期的 Idempotency-Key 紀錄（需在 app context 內呼叫）"""
+    from src.utils.idempotency import purge_expired_idempotency_keys
+
+    try:
+        purged = purge_expired_idempotency_keys()
+    except Exception:
+        logger.exception("Idempotency key purge failed")
+        return
+    if purged:
+        logger.info(f"Purged {purged} expired idempotency keys")
+
+def maintenance_tasks():
+    """排程器在同步之外定期執行的維護工作：{名稱: (間隔, 函式)}"""
+    return {
+        name: (interval, task)
+        for name, interval, task in (
+            ('stock_push', STOCK_PUSH_INTERVAL, run_stock_push),
+            ('partitions', PARTITION_MAINTENANCE_INTERVAL, run_partition_maintenance),
+            ('idempotency_keys', IDEMPOTENCY_PURGE_INTERVAL, run_idempotency_purge)
+        )
+        if interval > 0
+    }
+
+class Scheduler:
+    """依間隔執行同步，每輪先確認自己是否為領導者"""
+
+    def __init__(self, app, resources, tick=1.0):
+        from src.utils.leader import LeaderLock
+
+        self.app = app
+        self.intervals = {resource: interval for resource, interval in load_intervals().items()
+                          if resource in resources and interval > 0}
+        self.tick = tick
+        self.next_run = {resource: 0.0 for resource in self.intervals}
+        self.tasks = maintenance_tasks()
+        self.next_task_run = {name: 0.0 for name in self.tasks}
+        self.lock = LeaderLock(app.config['SQLALCHEMY_DATABASE_URI'])
+        self.stopping = False
+
+    def stop(self, *args):
+        logger.info("Scheduler stopping")
+        self.stopping = True
+
+    def run_due(self):
+        now = time.monotonic()
+        for resource, interval in self.intervals.items():
+            if self.stopping:
+                break
+            if now >= self.next_run[resource]:
+                with self.app.app_context():
+                    run_sync(resource)
+                self.next_run[resource] = time.monotonic() + interval
+        for name, (interval, task) in self.tasks.items():
+            if self.stopping:
+                break
+            if time.monotonic() >= self.next_task_run[name]:
+                with self.app.app_context():
+                    task()
+                self.next_task_run[name] = time.monotonic() + interval
+
+    def run_forever(self):
+        was_leader = False
+        try:
+            while not self.stopping:
+                try:
+                    is_leader = self.lock.acquire()
+                except Exception as e:
+                    logger.warning(f"Leader election failed: {e}")
+                    is_leader = False
+                if is_leader != was_leader:
+                    logger.info("Acquired scheduler leadership" if is_leader else "Waiting for scheduler leadership")
+                    was_leader = is_leader
+                if is_leader:
+                    self.run_due()
+                time.sleep(self.tick)
+        finally:
+            self.lock.release()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='露天同步排程器')
+    parser.add_argument('--once', action='store_true', help='每項啟用的資源同步一次後結束')
+    parser.add_argument('--resources', default='products,orders,categories', help='以逗號分隔的同步資源')
+    args = parser.parse_args(argv)
+
+    from src.main import configure_logging, create_app
+
+    configure_logging()
+    app = create_app()
+    resources = [resource.strip() for resource in args.resources.split(',') if resource.strip()]
+
+    scheduler = Scheduler(app, resources)
+
+    if args.once:
+        if not scheduler.lock.acquire():
+            logger.info("Another scheduler instance holds the lock, skipping")
+            return
+        try:
+            with app.app_context():
+                for resource in scheduler.intervals:
+                    run_sync(resource)
+                for _, task in maintenance_tasks().values():
+                    task()
+        finally:
+            scheduler.lock.release()
+        return
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run_forever()
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,10 @@ async function checkAuthStatus() {
             if (data.has_credentials && data.credentials_valid) {
                 statusDot.classList.add('connected');
                 statusText.textContent = `已連線 (${data.api_key_preview})`;
+            } else if (data.has_credentials && data.credentials_valid === null) {
+                // 伺服器正在背景驗證憑證，稍後再查詢
+                statusText.textContent = '驗證憑證中…';
+                setTimeout(checkAuthStatus, 3000);
             } else if (data.has_credentials) {
                 statusText.textContent = '憑證無效，請重新設定';
             } else {
@@ -513,61 +517,57 @@ function renderPagination(currentPage, totalPages, functionName) {
 }
 
 // 同步功能
-async function syncProducts() {
+// 建立背景同步工作並輪詢進度，其他人正在同步時會共用同一個工作
+async function runSyncJob(resource, label, onDone) {
     try {
-        showAlert('warning', '正在同步商品資料...');
-        const response = await fetch(`${apiBaseUrl}/api/products/sync`, {
+        showAlert('warning', `正在同步${label}資料...`);
+        const response = await fetch(`${apiBaseUrl}/api/sync/${resource}`, {
             method: 'POST'
         });
         const result = await response.json();
         
-        if (result.status === 'success') {
-            showAlert('success', `成功同步 ${result.data.synced_count} 個商品`);
-            loadProducts();
-        } else {
+        if (result.status !== 'success') {
             showAlert('danger', `同步失敗: ${result.message}`);
+            return;
         }
-    } catch (error) {
-        showAlert('danger', `同步失敗: ${error.message}`);
-    }
-}
-
-async function syncOrders() {
-    try {
-        showAlert('warning', '正在同步訂單資料...');
-        const response = await fetch(`${apiBaseUrl}/api/orders/sync`, {
-            method: 'POST'
-        });
-        const result = await response.json();
         
-        if (result.status === 'success') {
-            showAlert('success', `成功同步 ${result.data.synced_count} 個訂單`);
-            loadOrders();
+        let job = result.data;
+        while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const jobResponse = await fetch(`${apiBaseUrl}/api/sync/jobs/${job.id}`);
+            const jobResult = await jobResponse.json();
+            if (jobResult.status !== 'success') {
+                showAlert('danger', `同步失敗: ${jobResult.message}`);
+                return;
+            }
+            job = jobResult.data;
+            if (job.status === 'running') {
+                const eta = job.eta_seconds !== null ? `，預估剩餘 ${Math.ceil(job.eta_seconds)} 秒` : '';
+                showAlert('warning', `正在同步${label}資料... 已完成 ${job.pages_done} 頁、${job.rows_written} 筆${eta}`);
+            }
+        }
+        
+        if (job.status === 'succeeded') {
+            showAlert('success', `成功同步 ${job.rows_written} 個${label}`);
+            onDone();
         } else {
-            showAlert('danger', `同步失敗: ${result.message}`);
+            showAlert('danger', `同步失敗: ${job.error}`);
         }
     } catch (error) {
         showAlert('danger', `同步失敗: ${error.message}`);
     }
 }
 
+async function syncProducts() {
+    await runSyncJob('products', '商品', () => loadProducts());
+}
+
+async function syncOrders() {
+    await runSyncJob('orders', '訂單', () => loadOrders());
+}
+
 async function syncCategories() {
-    try {
-        showAlert('warning', '正在同步分類資料...');
-        const response = await fetch(`${apiBaseUrl}/api/categories/sync`, {
-            method: 'POST'
-        });
-        const result = await response.json();
-        
-        if (result.status === 'success') {
-            showAlert('success', `成功同步 ${result.data.synced_count} 個分類`);
-            loadCategories();
-        } else {
-            showAlert('danger', `同步失敗: ${result.message}`);
-        }
-    } catch (error) {
-        showAlert('danger', `同步失敗: ${error.message}`);
-    }
+    await runSyncJob('categories', '分類', () => loadCategories());
 }
 
 // 刪除功能
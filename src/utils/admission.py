@@ -0,0 +1,215 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict
+
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+def _default_workers() -> int:
+    # 與 gunicorn.conf.py 相同的預設值
+    return int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+
+_SYNC_WORKERS = os.getenv('GUNICORN_WORKER_CLASS', 'sync') == 'sync'
+
+# 每個 worker 同時等待露天回應的請求數上限（gevent 模式下才會超過 1）
+UPSTREAM_WORKER_CONCURRENCY = int(os.getenv('UPSTREAM_WORKER_CONCURRENCY', '16'))
+# 所有 worker 合計的上限，預設保留一個 worker 的容量給只讀寫本地資料庫的路由
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv(
+    'UPSTREAM_MAX_CONCURRENCY',
+    str(max(1, _default_workers() - 1) * (1 if _SYNC_WORKERS else UPSTREAM_WORKER_CONCURRENCY))
+))
+# 額滿時最多排隊等待的秒數與每個 worker 的排隊人數，超過即回傳 503；
+# sync worker 排隊時無法處理其他請求，預設不排隊
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', '0' if _SYNC_WORKERS else '2'))
+UPSTREAM_MAX_QUEUE = int(os.getenv('UPSTREAM_MAX_QUEUE', '32'))
+UPSTREAM_RETRY_AFTER = int(os.getenv('UPSTREAM_RETRY_AFTER', '5'))
+
+_POLL_INTERVAL = 0.02
+
+class AdmissionRejected(Exception):
+    """露天相關請求已達並行上限"""
+
+class SlotTable:
+    """跨行程的並行名額，每個名額記錄持有者的 PID
+
+    在 gunicorn --preload 的 master 行程匯入時建立共享記憶體，fork 後所有 worker 共用；
+    worker 異常結束時由 master 的 child_exit hook（或下一次額滿時的檢查）收回其名額。
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._slots = multiprocessing.Array('i', self.size)
+
+    def try_acquire(self) -> bool:
+        pid = os.getpid()
+        with self._slots.get_lock():
+            for index in range(self.size):
+                if self._slots[index] == 0:
+                    self._slots[index] = pid
+                    return True
+            # 額滿時收回已結束行程的名額
+            for index in range(self.size):
+                if not _process_alive(self._slots[index]):
+                    logger.warning(f"Reclaimed upstream slot held by exited process {self._slots[index]}")
+                    self._slots[index] = pid
+                    return True
+        return False
+
+    def release(self, pid: int = None) -> None:
+        pid = pid or os.getpid()
+        with self._slots.get_lock():
+            for index in range(self.size):
+                if self._slots[index] == pid:
+                    self._slots[index] = 0
+                    return
+
+    def release_all(self, pid: int) -> int:
+        released = 0
+        with self._slots.get_lock():
+            for index in range(self.size):
+                if self._slots[index] == pid:
+                    self._slots[index] = 0
+                    released += 1
+        return released
+
+    def in_use(self) -> int:
+        with self._slots.get_lock():
+            return sum(1 for index in range(self.size) if self._slots[index])
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class AdmissionController:
+    """限制每個 worker 與全部 worker 同時呼叫露天的請求數"""
+
+    def __init__(self, worker_limit: int, global_limit: int, queue_timeout: float, max_queue: int):
+        self.worker_limit = max(1, worker_limit)
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.global_slots = SlotTable(global_limit) if global_limit > 0 else None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._local = threading.BoundedSemaphore(self.worker_limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _check_fork(self) -> None:
+        # fork 後重建行程內的計數與鎖（共享的全域名額不重建）
+        if self._pid != os.getpid():
+            self._reset()
+
+    def acquire(self, timeout: float = None) -> None:
+        """取得名額，額滿時最多等待 timeout 秒；仍無名額時拋出 AdmissionRejected"""
+        self._check_fork()
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected('Too many requests waiting for Ruten')
+            self.waiting += 1
+        try:
+            if not self._local.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise AdmissionRejected('Worker upstream capacity exhausted')
+            if self.global_slots is not None:
+                # 以輪詢取得跨行程名額，gevent 模式下 sleep 會讓出執行權
+                while not self.global_slots.try_acquire():
+                    if time.monotonic() >= deadline:
+                        self._local.release()
+                        raise AdmissionRejected('Global upstream capacity exhausted')
+                    time.sleep(_POLL_INTERVAL)
+        except AdmissionRejected:
+            with self._lock:
+                self.waiting -= 1
+                self.rejected += 1
+            raise
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+
+    def release(self) -> None:
+        if self.global_slots is not None:
+            self.global_slots.release()
+        self._local.release()
+        with self._lock:
+            self.active -= 1
+
+    @contextmanager
+    def slot(self, timeout: float = None):
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def status(self) -> Dict[str, Any]:
+        self._check_fork()
+        with self._lock:
+            status = {
+                'worker_limit': self.worker_limit,
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+        if self.global_slots is not None:
+            status.update(global_limit=self.global_slots.size, global_in_use=self.global_slots.in_use())
+        return status
+
+upstream_admission = AdmissionController(
+    UPSTREAM_WORKER_CONCURRENCY, UPSTREAM_MAX_CONCURRENCY, UPSTREAM_QUEUE_TIMEOUT, UPSTREAM_MAX_QUEUE
+)
+
+def release_process_slots(pid: int) -> None:
+    """釋放已結束 worker 持有的全域名額（由 gunicorn child_exit hook 呼叫）"""
+    if upstream_admission.global_slots is not None:
+        released = upstream_admission.global_slots.release_all(pid)
+        if released:
+            logger.warning(f"Released {released} upstream slots held by worker {pid}")
+
+def overloaded_response(message: str):
+    response = jsonify({
+        'status': 'error',
+        'message': f'Ruten API is busy, please retry later ({message})'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(UPSTREAM_RETRY_AFTER)
+    return response
+
+def upstream_bound(view):
+    """標記會同步呼叫露天的路由：超過並行上限時短暫排隊，仍額滿則回傳 503 與 Retry-After
+
+    只讀寫本地資料庫的路由不需標記，露天變慢時仍保有處理容量。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            upstream_admission.acquire()
+        except AdmissionRejected as e:
+            logger.warning(f"Rejected upstream-bound request: {e}")
+            return overloaded_response(str(e))
+        try:
+            return view(*args, **kwargs)
+        finally:
+            upstream_admission.release()
+    return wrapper
@@ -0,0 +1,118 @@
+import os
+import re
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from flask import request
+from src.utils.compression import COMPRESSIBLE_MIMETYPES, choose_encoding, compress, supported_encodings
+
+logger = logging.getLogger(__name__)
+
+# 入口頁面不加指紋，其他檔案以內容雜湊命名並長期快取
+ENTRY_POINT = 'index.html'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+# 小於此大小的檔案不預先壓縮
+PRECOMPRESS_MIN_BYTES = 256
+
+_ASSET_REFERENCE = re.compile(r'''(\b(?:src|href)\s*=\s*["'])([^"'#?]+)(["'])''')
+
+@dataclass
+class Asset:
+    path: str
+    url_path: str
+    mimetype: str
+    etag: str
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+def _fingerprinted(path: str, digest: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+class AssetManifest:
+    """啟動時讀取靜態檔案，計算內容指紋並預先壓縮，之後只從記憶體提供"""
+
+    def __init__(self, static_folder: str):
+        self.static_folder = static_folder
+        self.assets: Dict[str, Asset] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self._by_url: Dict[str, Asset] = {}
+        if static_folder and os.path.isdir(static_folder):
+            self._load()
+
+    def _read_files(self) -> Dict[str, bytes]:
+        files = {}
+        for root, dirs, names in os.walk(self.static_folder):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, self.static_folder).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    files[path] = f.read()
+        return files
+
+    def _add(self, path: str, url_path: str, data: bytes) -> Asset:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        digest = hashlib.sha256(data).hexdigest()
+        asset = Asset(path=path, url_path=url_path, mimetype=mimetype, etag=digest[:32], bodies={'identity': data})
+        if mimetype in COMPRESSIBLE_MIMETYPES and len(data) >= PRECOMPRESS_MIN_BYTES:
+            for encoding in supported_encodings():
+                compressed = compress(data, encoding, level=11 if encoding == 'br' else 9)
+                if len(compressed) < len(data):
+                    asset.bodies[encoding] = compressed
+        self._by_url[url_path] = asset
+        return asset
+
+    def _rewrite_references(self, html: bytes) -> bytes:
+        """將入口頁面中引用的靜態檔案改為指紋網址"""
+        def replace(match):
+            reference = match.group(2)
+            fingerprinted = self.fingerprints.get(reference.lstrip('./'))
+            if fingerprinted is None:
+                return match.group(0)
+            prefix = '/' if reference.startswith('/') else ''
+            return f"{match.group(1)}{prefix}{fingerprinted}{match.group(3)}"
+        return _ASSET_REFERENCE.sub(replace, html.decode('utf-8')).encode('utf-8')
+
+    def _load(self) -> None:
+        files = self._read_files()
+        for path, data in files.items():
+            if path == ENTRY_POINT:
+                continue
+            url_path = _fingerprinted(path, hashlib.sha256(data).hexdigest()[:12])
+            self.fingerprints[path] = url_path
+            asset = self._add(path, url_path, data)
+            self.assets[path] = asset
+            # 未加指紋的原始網址仍可存取，但需每次驗證
+            self._by_url[path] = asset
+        if ENTRY_POINT in files:
+            self.assets[ENTRY_POINT] = self._add(ENTRY_POINT, ENTRY_POINT, self._rewrite_references(files[ENTRY_POINT]))
+        logger.info(f"Loaded {len(self.assets)} static assets")
+
+    def resolve(self, url_path: str) -> Optional[Asset]:
+        return self._by_url.get(url_path)
+
+    @property
+    def entry_point(self) -> Optional[Asset]:
+        return self.assets.get(ENTRY_POINT)
+
+    def manifest(self) -> Dict[str, str]:
+        return dict(self.fingerprints)
+
+def asset_response(app, asset: Asset, immutable: bool):
+    """依 Accept-Encoding 選擇預先壓縮的內容並處理 ETag 條件請求"""
+    encoding = choose_encoding([encoding for encoding in supported_encodings() if encoding in asset.bodies])
+    body = asset.bodies[encoding or 'identity']
+    response = app.response_class(body, mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if len(asset.bodies) > 1:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(f"{asset.etag}-{encoding}" if encoding else asset.etag)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    return response.make_conditional(request)
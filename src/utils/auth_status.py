@@ -0,0 +1,178 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from src.models.models import db, CredentialCheck
+from src.utils.cache import TTLCache
+from src.utils.ruten_client import RutenAPIClient
+
+logger = logging.getLogger(__name__)
+
+# 驗證結果的有效秒數，過期後仍先回傳舊結果並在背景重新驗證
+AUTH_STATUS_TTL = int(os.getenv('AUTH_STATUS_TTL', '300'))
+# 驗證失敗的結果較快重新驗證（可能只是露天暫時無法連線）
+AUTH_STATUS_FAILURE_TTL = int(os.getenv('AUTH_STATUS_FAILURE_TTL', '60'))
+# 各 worker 在記憶體中保留資料庫結果的秒數
+AUTH_STATUS_LOCAL_TTL = float(os.getenv('AUTH_STATUS_LOCAL_TTL', '5'))
+# 背景驗證的租約秒數，逾時後其他 worker 可接手
+AUTH_STATUS_REFRESH_TIMEOUT = int(os.getenv('AUTH_STATUS_REFRESH_TIMEOUT', '60'))
+
+DEFAULT_KEY = 'default'
+CREDENTIAL_ENV = ('RUTEN_API_KEY', 'RUTEN_SECRET_KEY', 'RUTEN_SALT_KEY')
+
+# {fingerprint: (valid, message, checked_at)}
+_local = TTLCache(default_ttl=AUTH_STATUS_LOCAL_TTL, maxsize=16)
+_refresh_lock = threading.Lock()
+_refreshing_until = 0.0
+
+def _default_credentials() -> Optional[Tuple[str, str, str]]:
+    credentials = tuple(os.getenv(name) for name in CREDENTIAL_ENV)
+    return credentials if all(credentials) else None
+
+def _fingerprint(credentials: Tuple[str, str, str]) -> str:
+    return hashlib.sha256('\0'.join(credentials).encode('utf-8')).hexdigest()
+
+def _is_stale(valid: Optional[bool], checked_at: Optional[datetime]) -> bool:
+    if checked_at is None:
+        return True
+    ttl = AUTH_STATUS_TTL if valid else AUTH_STATUS_FAILURE_TTL
+    return (datetime.utcnow() - checked_at).total_seconds() > ttl
+
+def _load(fingerprint: str) -> tuple:
+    cached = _local.get(fingerprint)
+    if cached is None:
+        row = db.session.get(CredentialCheck, DEFAULT_KEY)
+        if row is not None and row.fingerprint == fingerprint and row.checked_at is not None:
+            cached = (row.valid, row.message, row.checked_at)
+        else:
+            cached = (None, 'Verifying credentials', None)
+        _local.set(fingerprint, cached)
+    return cached
+
+def get_credential_status(app) -> Dict[str, Any]:
+    """回傳預設帳號的憑證狀態，不會等待露天回應
+
+    結果存於 credential_checks 資料表供所有 worker 共用；過期時仍回傳舊結果並在背景重新驗證，
+    尚未驗證過時 credentials_valid 為 None。
+    """
+    credentials = _default_credentials()
+    if credentials is None:
+        return {
+            'has_credentials': False,
+            'credentials_valid': False,
+            'message': 'No credentials configured'
+        }
+
+    fingerprint = _fingerprint(credentials)
+    valid, message, checked_at = _load(fingerprint)
+    stale = _is_stale(valid, checked_at)
+    if stale:
+        schedule_refresh(app)
+
+    return {
+        'has_credentials': True,
+        'credentials_valid': valid,
+        'message': message,
+        'api_key_preview': f"{credentials[0][:8]}...",
+        'checked_at': checked_at.isoformat() if checked_at else None,
+        'stale': stale
+    }
+
+def schedule_refresh(app) -> bool:
+    """在背景執行緒重新驗證；本行程已在驗證中時不重複啟動"""
+    global _refreshing_until
+    with _refresh_lock:
+        now = time.monotonic()
+        if _refreshing_until > now:
+            return False
+        _refreshing_until = now + AUTH_STATUS_REFRESH_TIMEOUT
+    threading.Thread(target=_refresh, args=(app,), daemon=True, name='auth-status-refresh').start()
+    return True
+
+def _claim(fingerprint: str) -> bool:
+    """取得重新驗證的租約；結果仍有效或其他 worker 正在驗證時回傳 False"""
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=AUTH_STATUS_REFRESH_TIMEOUT)
+    claimed = db.session.execute(
+        db.update(CredentialCheck)
+        .where(
+            CredentialCheck.key == DEFAULT_KEY,
+            or_(CredentialCheck.refreshing_until.is_(None), CredentialCheck.refreshing_until < now),
+            or_(
+                CredentialCheck.fingerprint != fingerprint,
+                CredentialCheck.checked_at.is_(None),
+                CredentialCheck.checked_at < now - timedelta(seconds=min(AUTH_STATUS_TTL, AUTH_STATUS_FAILURE_TTL))
+            )
+        )
+        .values(refreshing_until=lease)
+    ).rowcount
+    if not claimed and db.session.get(CredentialCheck, DEFAULT_KEY) is None:
+        db.session.add(CredentialCheck(key=DEFAULT_KEY, fingerprint=fingerprint, refreshing_until=lease))
+        claimed = 1
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 其他 worker 同時建立了資料列並正在驗證
+        db.session.rollback()
+        return False
+    if claimed:
+        # 依驗證結果套用各自的期限，仍有效時不需重新驗證
+        row = db.session.get(CredentialCheck, DEFAULT_KEY)
+        if row.fingerprint == fingerprint and not _is_stale(row.valid, row.checked_at):
+            row.refreshing_until = None
+            db.session.commit()
+            _local.set(fingerprint, (row.valid, row.message, row.checked_at))
+            return False
+    return bool(claimed)
+
+def _refresh(app) -> None:
+    global _refreshing_until
+    try:
+        with app.app_context():
+            try:
+                credentials = _default_credentials()
+                if credentials is None:
+                    return
+                fingerprint = _fingerprint(credentials)
+                if not _claim(fingerprint):
+                    return
+                result = RutenAPIClient(*credentials).verify_credentials()
+                record_credential_check(credentials, result)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Credential status refresh failed")
+            finally:
+                db.session.remove()
+    finally:
+        with _refresh_lock:
+            _refreshing_until = 0.0
+
+def record_credential_check(credentials: Tuple[str, str, str], result: Dict[str, Any]) -> None:
+    """儲存驗證結果並釋放租約；只記錄預設帳號的憑證"""
+    if credentials != _default_credentials():
+        return
+    fingerprint = _fingerprint(credentials)
+    checked_at = datetime.utcnow()
+    valid = bool(result.get('valid'))
+    row = db.session.get(CredentialCheck, DEFAULT_KEY)
+    if row is None:
+        row = CredentialCheck(key=DEFAULT_KEY)
+        db.session.add(row)
+    row.fingerprint = fingerprint
+    row.valid = valid
+    row.message = result.get('message', '')
+    row.checked_at = checked_at
+    row.refreshing_until = None
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return
+    _local.set(fingerprint, (valid, row.message, checked_at))
+    logger.info(f"Ruten credentials checked: valid={valid}")
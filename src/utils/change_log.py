@@ -0,0 +1,179 @@
+import os
+import json
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import event, func, insert, inspect
+from sqlalchemy.orm import Session
+from src.models.models import db, ChangeLog, Product, Order, Category
+
+logger = logging.getLogger(__name__)
+
+# 寫入變更紀錄的實體與名稱
+TRACKED_ENTITIES = {
+    Product: 'product',
+    Order: 'order',
+    Category: 'category'
+}
+
+# 不列入變更欄位的系統欄位
+IGNORED_FIELDS = {'id', 'created_at', 'updated_at', 'content_hash'}
+
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', '30'))
+CHANGE_LOG_COMPACT_AFTER_DAYS = int(os.getenv('CHANGE_LOG_COMPACT_AFTER_DAYS', '1'))
+# 壓縮時每批處理的實體數
+COMPACT_BATCH_SIZE = 500
+
+_PENDING_KEY = 'change_log_pending'
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _column_fields(obj) -> List[str]:
+    return [attr.key for attr in inspect(obj).mapper.column_attrs if attr.key not in IGNORED_FIELDS]
+
+def _changed_fields(obj) -> Dict[str, Any]:
+    """取得物件尚未 flush 的欄位變更"""
+    state = inspect(obj)
+    changes = {}
+    for field in _column_fields(obj):
+        history = state.attrs[field].history
+        if history.has_changes():
+            changes[field] = _json_value(history.added[0] if history.added else None)
+    return changes
+
+def _before_flush(session, flush_context, instances):
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for obj in session.new:
+        if type(obj) in TRACKED_ENTITIES:
+            pending.append((obj, 'insert', None))
+    for obj in session.dirty:
+        if type(obj) in TRACKED_ENTITIES and session.is_modified(obj, include_collections=False):
+            changes = _changed_fields(obj)
+            if changes:
+                pending.append((obj, 'update', changes))
+    for obj in session.deleted:
+        if type(obj) in TRACKED_ENTITIES:
+            pending.append((obj, 'delete', {}))
+
+def _after_flush(session, flush_context):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    rows = []
+    now = datetime.utcnow()
+    for obj, operation, changes in pending:
+        if operation == 'insert':
+            changes = {field: _json_value(getattr(obj, field)) for field in _column_fields(obj)}
+        rows.append({
+            'entity': TRACKED_ENTITIES[type(obj)],
+            'entity_id': obj.id,
+            'operation': operation,
+            'changed_fields': json.dumps(changes, ensure_ascii=False),
+            'created_at': now
+        })
+    session.connection().execute(insert(ChangeLog), rows)
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+def install_change_log() -> None:
+    """註冊 session 事件，讓 ORM 寫入自動產生變更紀錄"""
+    if not event.contains(Session, 'before_flush', _before_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_soft_rollback', lambda session, previous_transaction: _after_rollback(session))
+
+def record_changes(entity: str, changes: Iterable[Dict[str, Any]], operation: str = 'update') -> None:
+    """記錄繞過 ORM 的批次更新（每筆需包含 id 與變更欄位）"""
+    now = datetime.utcnow()
+    rows = []
+    for change in changes:
+        change = dict(change)
+        entity_id = change.pop('id')
+        rows.append({
+            'entity': entity,
+            'entity_id': entity_id,
+            'operation': operation,
+            'changed_fields': json.dumps({key: _json_value(value) for key, value in change.items()}, ensure_ascii=False),
+            'created_at': now
+        })
+    if rows:
+        db.session.execute(insert(ChangeLog), rows)
+
+def _fold_changes(rows: List[ChangeLog]) -> tuple:
+    """依序合併同一實體的多筆紀錄，回傳 (operation, changed_fields)
+
+    update 只記錄變動的欄位，因此合併到最近一次 insert 的完整內容上；最後為 delete 時只保留 delete。
+    """
+    operation, fields = None, {}
+    for row in rows:
+        changes = json.loads(row.changed_fields) if row.changed_fields else {}
+        if row.operation == 'delete':
+            operation, fields = 'delete', {}
+        elif row.operation == 'insert':
+            operation, fields = 'insert', changes
+        else:
+            operation, fields = 'insert' if operation == 'insert' else 'update', {**fields, **changes}
+    return operation, fields
+
+def _group_ids(entities) -> Dict[str, List[int]]:
+    grouped = {}
+    for entity, entity_id in entities:
+        grouped.setdefault(entity, []).append(entity_id)
+    return grouped
+
+def compact_change_log(now: datetime = None) -> Dict[str, int]:
+    """壓縮並清理變更紀錄
+
+    - 超過 CHANGE_LOG_COMPACT_AFTER_DAYS 的紀錄，每個實體合併為一筆（保留其中最大的序號）：
+      insert 與之後的 update 合併為一筆完整內容的 insert，最後為 delete 時只保留 delete
+    - 超過 CHANGE_LOG_RETENTION_DAYS 的紀錄全部刪除
+    """
+    now = now or datetime.utcnow()
+    compact_before = now - timedelta(days=CHANGE_LOG_COMPACT_AFTER_DAYS)
+    retention_before = now - timedelta(days=CHANGE_LOG_RETENTION_DAYS)
+
+    entities = db.session.execute(
+        db.select(ChangeLog.entity, ChangeLog.entity_id)
+        .where(ChangeLog.created_at < compact_before)
+        .group_by(ChangeLog.entity, ChangeLog.entity_id)
+        .having(func.count() > 1)
+    ).all()
+    compacted = 0
+    for start in range(0, len(entities), COMPACT_BATCH_SIZE):
+        rows_by_entity = {}
+        for entity, entity_ids in _group_ids(entities[start:start + COMPACT_BATCH_SIZE]).items():
+            rows = db.session.execute(
+                db.select(ChangeLog)
+                .where(ChangeLog.entity == entity, ChangeLog.entity_id.in_(entity_ids),
+                       ChangeLog.created_at < compact_before)
+                .order_by(ChangeLog.seq)
+            ).scalars()
+            for row in rows:
+                rows_by_entity.setdefault((row.entity, row.entity_id), []).append(row)
+        superseded = []
+        for rows in rows_by_entity.values():
+            operation, fields = _fold_changes(rows)
+            # 保留最大的序號，已讀到較小序號的消費者仍會收到合併後的內容
+            rows[-1].operation = operation
+            rows[-1].changed_fields = json.dumps(fields, ensure_ascii=False)
+            superseded.extend(row.seq for row in rows[:-1])
+        if superseded:
+            compacted += db.session.execute(
+                db.delete(ChangeLog).where(ChangeLog.seq.in_(superseded)).execution_options(synchronize_session=False)
+            ).rowcount
+        db.session.commit()
+
+    expired = db.session.execute(
+        db.delete(ChangeLog).where(ChangeLog.created_at < retention_before).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    logger.info(f"Change log compacted: superseded={compacted}, expired={expired}")
+    return {'compacted': compacted, 'expired': expired}
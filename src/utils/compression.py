@@ -0,0 +1,76 @@
+import os
+import gzip
+import logging
+from typing import Iterable, Optional
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli 為選用套件
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'true').lower() in ('1', 'true', 'yes')
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+# 動態回應以速度為主，靜態檔案於啟動時以最高壓縮率預先壓縮
+DYNAMIC_GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', '5'))
+DYNAMIC_BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', '4'))
+
+# 會壓縮的回應類型
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/vnd.columnar+json',
+    'application/x-msgpack',
+    'application/javascript',
+    'text/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'image/svg+xml'
+}
+
+def supported_encodings():
+    """依偏好順序列出可用的壓縮格式"""
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+def choose_encoding(available: Iterable[str]) -> Optional[str]:
+    """依 Accept-Encoding 與伺服器偏好（br 優先）選擇壓縮格式"""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress(data: bytes, encoding: str, level: int = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=DYNAMIC_BROTLI_QUALITY if level is None else level)
+    if encoding == 'gzip':
+        # mtime 固定為 0，相同內容得到相同位元組（ETag 穩定）
+        return gzip.compress(data, compresslevel=DYNAMIC_GZIP_LEVEL if level is None else level, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def install_response_compression(app) -> None:
+    """壓縮超過門檻的 API 回應（串流與已壓縮的回應不處理）"""
+    if not RESPONSE_COMPRESSION:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        encoding = choose_encoding(supported_encodings())
+        if encoding is None:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List
+
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """將清單切分為固定大小的批次"""
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def map_concurrently(func: Callable[[Any], Any], items: Iterable[Any], max_workers: int = 4) -> List[Any]:
+    """以執行緒池並行執行 func，結果順序與輸入相同"""
+    items = list(items)
+    if not items:
+        return []
+    if len(items) == 1 or max_workers <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
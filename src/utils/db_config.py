@@ -0,0 +1,198 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# 可用的連線池設定檔
+POOL_PROFILES = ('postgres', 'pgbouncer', 'sqlite')
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+class PoolStats:
+    """記錄連線池取得連線的等待時間"""
+
+    def __init__(self, maxlen: int = 2000):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._samples.append(wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+            checkouts, timeouts, total_wait, max_wait = self.checkouts, self.timeouts, self.total_wait, self.max_wait
+
+        def percentile(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 3)
+
+        return {
+            'checkouts': checkouts,
+            'timeouts': timeouts,
+            'avg_wait_ms': round(total_wait / checkouts * 1000, 3) if checkouts else None,
+            'p50_wait_ms': percentile(0.50),
+            'p95_wait_ms': percentile(0.95),
+            'p99_wait_ms': percentile(0.99),
+            'max_wait_ms': round(max_wait * 1000, 3)
+        }
+
+pool_stats = PoolStats()
+
+class TimedQueuePool(QueuePool):
+    """會記錄取得連線等待時間的 QueuePool"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start)
+        return connection
+
+def normalize_database_url(url: str) -> str:
+    """將 Heroku/Render 的 postgres:// 轉為 SQLAlchemy 可用的 postgresql://"""
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def detect_profile(url: str) -> str:
+    """依 DB_POOL_PROFILE 或連線字串判斷連線池設定檔"""
+    profile = os.getenv('DB_POOL_PROFILE', 'auto').lower()
+    if profile in POOL_PROFILES:
+        return profile
+    if profile != 'auto':
+        raise ValueError(f"未知的 DB_POOL_PROFILE：{profile}，可用值：auto, {', '.join(POOL_PROFILES)}")
+    if url.startswith('sqlite'):
+        return 'sqlite'
+    # PgBouncer 預設使用 6432 埠
+    if ':6432/' in url:
+        return 'pgbouncer'
+    return 'postgres'
+
+def build_engine_options(url: str, profile: str = None) -> Dict[str, Any]:
+    """依設定檔產生 SQLALCHEMY_ENGINE_OPTIONS"""
+    profile = profile or detect_profile(url)
+
+    if profile == 'postgres':
+        options = {
+            'poolclass': TimedQueuePool,
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+            'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+            # 資料庫重啟後自動丟棄失效連線
+            'pool_pre_ping': True,
+            'connect_args': {
+                'connect_timeout': _env_int('DB_CONNECT_TIMEOUT', 10),
+                'keepalives': 1,
+                'keepalives_idle': 30,
+            }
+        }
+        statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+        if statement_timeout > 0:
+            options['connect_args']['options'] = f'-c statement_timeout={statement_timeout}'
+        return options
+
+    if profile == 'pgbouncer':
+        # PgBouncer transaction pooling 已負責連線池，應用端不保留連線；
+        # psycopg2 不使用伺服器端 prepared statement，也不傳送 startup options，
+        # statement_timeout 請設定在資料庫角色上（ALTER ROLE ... SET statement_timeout）
+        return {
+            'poolclass': NullPool,
+            'connect_args': {
+                'connect_timeout': _env_int('DB_CONNECT_TIMEOUT', 10),
+            }
+        }
+
+    if profile == 'sqlite':
+        if url in ('sqlite://', 'sqlite:///:memory:'):
+            # 記憶體資料庫沿用 Flask-SQLAlchemy 預設的 StaticPool
+            return {}
+        return {
+            'poolclass': TimedQueuePool,
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+            'connect_args': {
+                'timeout': _env_int('SQLITE_BUSY_TIMEOUT', 30),
+                'check_same_thread': False,
+            }
+        }
+
+    raise ValueError(f"未知的連線池設定檔：{profile}")
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """SQLite 連線建立時啟用 WAL 與效能相關 PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute(f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT', 30) * 1000}")
+    finally:
+        cursor.close()
+
+def configure_database(app) -> None:
+    """設定資料庫連線字串與連線池參數，需在 db.init_app 之前呼叫"""
+    url = normalize_database_url(app.config.get('SQLALCHEMY_DATABASE_URI') or 'sqlite:///app.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    profile = detect_profile(url)
+    app.config['DB_POOL_PROFILE'] = profile
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in app.config or not app.config['SQLALCHEMY_ENGINE_OPTIONS']:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(url, profile)
+    logger.info(f"Database pool profile: {profile}")
+
+    # 唯讀副本（選用），由 RoutingSession 將標記為唯讀的路由查詢導向副本
+    replica_url = normalize_database_url(app.config.get('DATABASE_REPLICA_URL') or os.getenv('DATABASE_REPLICA_URL', ''))
+    if replica_url:
+        from src.utils.replica import REPLICA_BIND_KEY
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND_KEY] = {'url': replica_url, **build_engine_options(replica_url)}
+        app.config['SQLALCHEMY_BINDS'] = binds
+        logger.info("Read replica routing enabled")
+
+def install_engine_hooks(app, db) -> None:
+    """註冊引擎事件，需在 db.init_app 之後呼叫"""
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
+
+def get_pool_status(engine) -> Dict[str, Any]:
+    """取得連線池目前狀態與等待時間統計"""
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow()
+        })
+    status['wait'] = pool_stats.snapshot()
+    return status
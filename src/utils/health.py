@@ -0,0 +1,201 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict
+
+import requests
+from sqlalchemy import text
+from src.utils.admission import upstream_admission
+from src.utils.db_config import get_pool_status
+from src.utils.replica import get_replica_status
+from src.utils.ruten_transport import get_default_transport
+
+logger = logging.getLogger(__name__)
+
+# 背景檢查間隔與單次檢查逾時（秒）
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', '15'))
+HEALTH_PROBE_TIMEOUT = float(os.getenv('HEALTH_PROBE_TIMEOUT', '5'))
+# 檢查結果超過此秒數未更新即視為未知（預設為三個檢查間隔）
+HEALTH_STALE_SECONDS = float(os.getenv('HEALTH_STALE_SECONDS', str(HEALTH_PROBE_INTERVAL * 3)))
+# 庫存推送佇列超過此筆數或最舊一筆等待超過此秒數時視為 degraded
+HEALTH_OUTBOX_MAX_DEPTH = int(os.getenv('HEALTH_OUTBOX_MAX_DEPTH', '1000'))
+HEALTH_OUTBOX_MAX_AGE = int(os.getenv('HEALTH_OUTBOX_MAX_AGE', '900'))
+# 露天回應超過此毫秒數視為 degraded
+HEALTH_RUTEN_SLOW_MS = float(os.getenv('HEALTH_RUTEN_SLOW_MS', '2000'))
+
+# 未通過時 /health/ready 回傳 503 的檢查；其他檢查只影響整體狀態（degraded）
+READINESS_CHECKS = ('database',)
+PROBES = ('database', 'ruten', 'stock_outbox', 'replica', 'upstream_admission')
+
+class HealthMonitor:
+    """在背景執行緒定期檢查相依服務，健康檢查端點只讀取最近一次的結果
+
+    每個 worker 行程各自檢查；gunicorn --preload fork 之後於第一次呼叫時重新啟動執行緒，
+    檢查執行緒意外結束時也會在下一次呼叫時重新啟動。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._pid = None
+        self._pool_timeouts = None
+        self._admission_rejected = None
+        self.started_at = time.monotonic()
+
+    def _running(self) -> bool:
+        return self._pid == os.getpid() and len(self._threads) == len(PROBES) and \
+            all(thread.is_alive() for thread in self._threads.values())
+
+    def ensure_started(self, app) -> None:
+        if self._running():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._results = {}
+                self._threads = {}
+                self._pool_timeouts = None
+                self._admission_rejected = None
+                self.started_at = time.monotonic()
+                self._pid = os.getpid()
+            # 每項檢查各自一個執行緒，露天變慢不會延誤資料庫的檢查結果；已結束的執行緒重新啟動
+            for name in PROBES:
+                thread = self._threads.get(name)
+                if thread is not None and thread.is_alive():
+                    continue
+                if thread is not None:
+                    logger.warning(f"Health probe thread {name} exited, restarting")
+                thread = threading.Thread(target=self._run, args=(app, name), daemon=True, name=f'health-{name}')
+                self._threads[name] = thread
+                thread.start()
+
+    def _run(self, app, name: str) -> None:
+        while True:
+            with app.app_context():
+                self.probe(name)
+            time.sleep(HEALTH_PROBE_INTERVAL)
+
+    def probe(self, name: str) -> None:
+        from src.models.models import db
+        start = time.perf_counter()
+        try:
+            result = getattr(self, f'_probe_{name}')(db)
+        except Exception as e:
+            result = {'status': 'down', 'error': str(e)}
+        finally:
+            db.session.remove()
+        result.setdefault('latency_ms', round((time.perf_counter() - start) * 1000, 2))
+        result['checked_at'] = datetime.utcnow().isoformat()
+        result['_checked'] = time.monotonic()
+        with self._lock:
+            previous = self._results.get(name, {}).get('status')
+            self._results[name] = result
+        # 只在狀態改變時記錄，避免每次檢查都寫入日誌
+        if previous != result['status'] and (previous or result['status'] not in ('ok', 'skipped')):
+            log = logger.info if result['status'] in ('ok', 'skipped') else logger.warning
+            log(f"Health check {name}: {previous or 'unknown'} -> {result['status']}"
+                + (f" ({result['error']})" if result.get('error') else ''))
+
+    def _probe_database(self, db) -> Dict[str, Any]:
+        engine = db.engine
+        start = time.perf_counter()
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+        latency = round((time.perf_counter() - start) * 1000, 2)
+        pool = get_pool_status(engine)
+        timeouts = pool['wait']['timeouts']
+        # 自上次檢查後有請求等不到連線時視為 degraded
+        starved = self._pool_timeouts is not None and timeouts > self._pool_timeouts
+        self._pool_timeouts = timeouts
+        return {'status': 'degraded' if starved else 'ok', 'latency_ms': latency, 'pool': pool}
+
+    def _probe_ruten(self, db) -> Dict[str, Any]:
+        if not get_default_transport().live:
+            return {'status': 'skipped', 'reason': 'replay transport'}
+        base_url = os.getenv('RUTEN_BASE_URL', 'https://partner.ruten.com.tw').rstrip('/')
+        start = time.perf_counter()
+        response = requests.get(base_url, timeout=HEALTH_PROBE_TIMEOUT, allow_redirects=False, stream=True)
+        latency = round((time.perf_counter() - start) * 1000, 2)
+        response.close()
+        # 未簽章的請求回應 4xx 仍代表可連線；5xx 代表露天或 Cloudflare 異常
+        if response.status_code >= 500:
+            status = 'down'
+        elif latency > HEALTH_RUTEN_SLOW_MS:
+            status = 'degraded'
+        else:
+            status = 'ok'
+        return {'status': status, 'latency_ms': latency, 'status_code': response.status_code}
+
+    def _probe_stock_outbox(self, db) -> Dict[str, Any]:
+        from src.models.models import StockPush
+        live = StockPush.dead_lettered_at.is_(None)
+        depth, oldest, max_attempts, dead_letters = db.session.execute(
+            db.select(
+                db.func.count().filter(live),
+                db.func.min(StockPush.queued_at).filter(live),
+                db.func.max(StockPush.attempts).filter(live),
+                db.func.count().filter(StockPush.dead_lettered_at.isnot(None))
+            )
+        ).one()
+        oldest_age = round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None
+        # 死信不會自動重試，需人工處理（push-stock --retry-dead）
+        degraded = (depth > HEALTH_OUTBOX_MAX_DEPTH or dead_letters > 0
+                    or (oldest_age is not None and oldest_age > HEALTH_OUTBOX_MAX_AGE))
+        return {
+            'status': 'degraded' if degraded else 'ok',
+            'depth': depth,
+            'oldest_age_seconds': oldest_age,
+            'max_attempts': max_attempts or 0,
+            'dead_letters': dead_letters
+        }
+
+    def _probe_replica(self, db) -> Dict[str, Any]:
+        replica = get_replica_status(db)
+        if not replica['configured']:
+            return {'status': 'skipped', **replica}
+        # 副本延遲過高時讀取已自動改走主資料庫（斷路），服務仍可運作
+        return {
+            'status': 'ok' if replica['healthy'] else 'degraded',
+            'routing': 'replica' if replica['healthy'] else 'primary',
+            **replica
+        }
+
+    def _probe_upstream_admission(self, db) -> Dict[str, Any]:
+        status = upstream_admission.status()
+        # 自上次檢查後有露天相關請求因並行已滿被拒絕時視為 degraded
+        shedding = self._admission_rejected is not None and status['rejected'] > self._admission_rejected
+        self._admission_rejected = status['rejected']
+        return {'status': 'degraded' if shedding else 'ok', **status}
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        """最近一次的檢查結果，過久未更新的結果標示為 unknown"""
+        now = time.monotonic()
+        with self._lock:
+            results = dict(self._results)
+        report = {}
+        for name, result in results.items():
+            result = {key: value for key, value in result.items() if key != '_checked'}
+            age = now - results[name]['_checked']
+            if age > HEALTH_STALE_SECONDS:
+                result['status'] = 'unknown'
+            result['age_seconds'] = round(age, 1)
+            report[name] = result
+        return report
+
+    def readiness(self) -> Dict[str, Any]:
+        checks = self.results()
+        ready = all(checks.get(name, {}).get('status') in ('ok', 'degraded') for name in READINESS_CHECKS)
+        if not ready:
+            status = 'unavailable' if checks else 'starting'
+        elif any(check['status'] in ('degraded', 'down', 'unknown') for check in checks.values()):
+            status = 'degraded'
+        else:
+            status = 'ok'
+        return {'ready': ready, 'status': status, 'checks': checks}
+
+    def uptime(self) -> float:
+        return round(time.monotonic() - self.started_at, 1)
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,149 @@
+import os
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Optional
+
+from flask import Response, jsonify, make_response, request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from src.models.models import db, IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# 儲存回應的保留秒數
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400'))
+# 處理中請求的租約秒數，需大於露天請求逾時
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '120'))
+# 重複的請求等待處理中請求完成的秒數，逾時回傳 409；
+# sync worker 等待時無法處理其他請求，與露天並行控制相同預設不等待（見 src/utils/admission.py）
+_SYNC_WORKERS = os.getenv('GUNICORN_WORKER_CLASS', 'sync') == 'sync'
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '0' if _SYNC_WORKERS else '30'))
+# 回傳 409 時的 Retry-After 秒數
+IDEMPOTENCY_RETRY_AFTER = int(os.getenv('IDEMPOTENCY_RETRY_AFTER', '5'))
+
+_POLL_INTERVAL = 0.05
+_table = IdempotencyKey.__table__
+
+def _sha256(value: bytes) -> str:
+    return hashlib.sha256(value).hexdigest()
+
+def _error(status: int, message: str, retry_after: int = None) -> Response:
+    response = jsonify({'status': 'error', 'message': message})
+    response.status_code = status
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def _replay(row) -> Response:
+    response = Response(row.response_body, status=row.response_status, content_type=row.content_type)
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+def _try_claim(record_id: str, key: str, request_hash: str) -> Optional[object]:
+    """嘗試取得 key 的處理權
+
+    回傳 None 表示由本請求處理；否則回傳既有的資料列（已完成或處理中）。
+    同一個 key 搭配不同的請求內容時拋出 ValueError。
+    """
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        row = connection.execute(select(_table).where(_table.c.id == record_id)).first()
+        if row is not None and row.expires_at <= now:
+            connection.execute(delete(_table).where(_table.c.id == record_id, _table.c.expires_at <= now))
+            row = None
+        if row is None:
+            connection.execute(insert(_table).values(
+                id=record_id, key=key, method=request.method, path=request.path[:255],
+                request_hash=request_hash, status='in_progress', created_at=now,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL),
+                locked_until=now + timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT)
+            ))
+            return None
+        if row.request_hash != request_hash:
+            raise ValueError('Idempotency-Key was already used with a different request')
+        if row.status == 'in_progress' and (row.locked_until is None or row.locked_until <= now):
+            # 原本處理的 worker 已中斷，由本請求接手
+            taken = connection.execute(
+                update(_table)
+                .where(_table.c.id == record_id, _table.c.status == 'in_progress',
+                       _table.c.locked_until == row.locked_until)
+                .values(locked_until=now + timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT))
+            ).rowcount
+            if taken:
+                logger.warning(f"Taking over stalled idempotent request {row.method} {row.path}")
+                return None
+        return row
+
+def _complete(record_id: str, response: Response) -> None:
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(_table)
+            .where(_table.c.id == record_id)
+            .values(status='completed', response_status=response.status_code,
+                    response_body=response.get_data(), content_type=response.content_type,
+                    locked_until=None)
+        )
+
+def _release(record_id: str) -> None:
+    """處理失敗時刪除紀錄，讓重試可以重新執行"""
+    with db.engine.begin() as connection:
+        connection.execute(delete(_table).where(_table.c.id == record_id))
+
+def idempotent(view):
+    """支援 Idempotency-Key 標頭：相同 key 的重試直接回傳第一次的回應，不再執行路由與露天呼叫
+
+    同時送出的重複請求最多等待 IDEMPOTENCY_WAIT_TIMEOUT 秒（sync worker 預設不等待），仍在處理中時回傳 409。
+    5xx 回應與例外不儲存，重試時會重新執行。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return _error(400, 'Idempotency-Key must be at most 255 characters')
+
+        record_id = _sha256(f"{request.method} {request.path} {key}".encode('utf-8'))
+        request_hash = _sha256(request.get_data())
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            try:
+                row = _try_claim(record_id, key, request_hash)
+            except IntegrityError:
+                # 其他 worker 同時建立了相同的 key，稍後重新讀取
+                pass
+            except ValueError as e:
+                return _error(422, str(e))
+            else:
+                if row is None:
+                    break
+                if row.status == 'completed':
+                    return _replay(row)
+            if time.monotonic() >= deadline:
+                return _error(409, 'A request with this Idempotency-Key is still in progress',
+                              retry_after=IDEMPOTENCY_RETRY_AFTER)
+            time.sleep(_POLL_INTERVAL)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(record_id)
+            raise
+        if response.status_code >= 500:
+            _release(record_id)
+        else:
+            _complete(record_id, response)
+        return response
+    return wrapper
+
+def purge_expired_idempotency_keys(now: datetime = None) -> int:
+    """刪除超過保留期限的紀錄"""
+    now = now or datetime.utcnow()
+    with db.engine.begin() as connection:
+        return connection.execute(delete(_table).where(_table.c.expires_at <= now)).rowcount
@@ -0,0 +1,102 @@
+import os
+import hashlib
+import logging
+import tempfile
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+def _advisory_key(name: str) -> int:
+    """將鎖名稱轉為 Postgres advisory lock 使用的 64 位元整數"""
+    return int.from_bytes(hashlib.sha256(name.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+def lock_for_transaction(session, name: str) -> None:
+    """在目前交易內取得 Postgres advisory lock，提交或 rollback 時自動釋放；其他資料庫不做任何事"""
+    if session.get_bind().dialect.name == 'postgresql':
+        session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': _advisory_key(name)})
+
+class LeaderLock:
+    """跨行程的領導者鎖 - Postgres 使用 advisory lock，其他資料庫退回本機檔案鎖
+
+    advisory lock 綁定在資料庫 session 上，PgBouncer transaction pooling 下無法使用，
+    此時請以 LEADER_LOCK_DATABASE_URL 指定直連 Postgres 的連線字串。
+    """
+
+    def __init__(self, database_url: str, name: str = 'ruten-sync-scheduler'):
+        self.name = name
+        self.database_url = os.getenv('LEADER_LOCK_DATABASE_URL', database_url)
+        self.is_postgres = self.database_url.startswith('postgresql')
+        self._engine = None
+        self._connection = None
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._connection is not None or self._file is not None
+
+    def acquire(self) -> bool:
+        """嘗試取得鎖（不阻塞），已持有時確認連線仍有效"""
+        if self.held:
+            if self.is_alive():
+                return True
+            logger.warning(f"Leader lock connection lost: {self.name}")
+            self.release()
+        return self._acquire_advisory() if self.is_postgres else self._acquire_file()
+
+    def is_alive(self) -> bool:
+        """確認持有鎖的資料庫連線仍存在，連線中斷時鎖已自動釋放"""
+        if self._connection is None:
+            return self._file is not None
+        try:
+            self._connection.execute(text('SELECT 1'))
+            return True
+        except Exception:
+            return False
+
+    def release(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': _advisory_key(self.name)})
+            except Exception:
+                pass
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+        if self._file is not None:
+            import fcntl
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def _acquire_advisory(self) -> bool:
+        if self._engine is None:
+            self._engine = create_engine(self.database_url, poolclass=NullPool)
+        connection = self._engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        try:
+            acquired = connection.execute(
+                text('SELECT pg_try_advisory_lock(:key)'), {'key': _advisory_key(self.name)}
+            ).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def _acquire_file(self) -> bool:
+        import fcntl
+        path = os.getenv('LEADER_LOCK_FILE', os.path.join(tempfile.gettempdir(), f'{self.name}.lock'))
+        lock_file = open(path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
@@ -0,0 +1,242 @@
+"""Postgres 依月份分割 orders 與 api_logs
+
+- convert_to_partitioned：將既有資料表一次性轉為依月份 RANGE 分割（需停機維護）
+- ensure_partitions：預先建立未來月份的分割
+- apply_retention：卸離超過保留期限的分割，封存為 gzip CSV 後刪除
+
+分割後的資料表無法建立不含分割欄位的主鍵或唯一限制，因此 id 改為一般索引（仍由 sequence 產生），
+ruten_order_id 改為 UNIQUE (ruten_order_id, order_date)，order_items 對 orders 的外鍵也會移除。
+order_date 為 NULL 的訂單不受此限制涵蓋，訂單同步另以 advisory lock 依序執行（見 src/utils/sync.py）。
+"""
+import os
+import gzip
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# 分割的資料表與分割欄位
+PARTITIONED_TABLES = {
+    'orders': 'order_date',
+    'api_logs': 'created_at'
+}
+
+# 分割後改以一般索引取代的欄位
+PARTITION_INDEXES = {
+    'orders': ('id', 'status'),
+    'api_logs': ('id',)
+}
+
+# 分割後加在母表的唯一限制（需包含分割欄位）
+PARTITION_CONSTRAINTS = {
+    'orders': {'uq_orders_ruten_order_id_order_date': 'UNIQUE (ruten_order_id, order_date)'}
+}
+
+PARTITION_PREMAKE_MONTHS = int(os.getenv('PARTITION_PREMAKE_MONTHS', '3'))
+PARTITION_ARCHIVE_DIR = os.getenv('PARTITION_ARCHIVE_DIR', '')
+
+def retention_months() -> Dict[str, int]:
+    """各資料表保留月數，0 表示永久保留"""
+    return {
+        'orders': int(os.getenv('ORDERS_RETENTION_MONTHS', '0')),
+        'api_logs': int(os.getenv('API_LOGS_RETENTION_MONTHS', '6'))
+    }
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def _add_months(value: date, months: int) -> date:
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+def _parse_partition_month(table: str, name: str) -> Optional[date]:
+    try:
+        return datetime.strptime(name[len(table) + 2:], '%Y_%m').date()
+    except ValueError:
+        return None
+
+def _require_postgres(engine) -> None:
+    if engine.dialect.name != 'postgresql':
+        raise RuntimeError('Table partitioning requires PostgreSQL')
+
+def is_partitioned(connection, table: str) -> bool:
+    return connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {'table': table}
+    ).first() is not None
+
+def _list_partitions(connection, table: str) -> List[str]:
+    return list(connection.execute(text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(:table)
+        ORDER BY child.relname
+    """), {'table': table}).scalars())
+
+def _create_month_partition(connection, table: str, month: date) -> bool:
+    """建立單月分割；預設分割中已有該月資料時先搬移"""
+    name = partition_name(table, month)
+    if connection.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar():
+        return False
+
+    column = PARTITIONED_TABLES[table]
+    start, end = month.isoformat(), _add_months(month, 1).isoformat()
+    default = f"{table}_default"
+    in_range = f"{column} >= '{start}' AND {column} < '{end}'"
+    has_default_rows = connection.execute(text(f"SELECT 1 FROM {default} WHERE {in_range} LIMIT 1")).first()
+
+    if has_default_rows:
+        connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    connection.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+    if has_default_rows:
+        connection.execute(text(f"INSERT INTO {table} SELECT * FROM {default} WHERE {in_range}"))
+        connection.execute(text(f"DELETE FROM {default} WHERE {in_range}"))
+        connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    logger.info(f"Created partition {name}")
+    return True
+
+def ensure_partition_constraints(connection, table: str) -> List[str]:
+    """在已分割的母表加上缺少的唯一限制；既有資料違反限制時記錄警告並略過"""
+    added = []
+    for name, definition in PARTITION_CONSTRAINTS.get(table, {}).items():
+        exists = connection.execute(
+            text("SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(:table) AND conname = :name"),
+            {'table': table, 'name': name}
+        ).first()
+        if exists:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"))
+        except Exception as e:
+            logger.warning(f"Could not add {name} to {table}, remove duplicate rows first: {e}")
+            continue
+        added.append(name)
+        logger.info(f"Added constraint {name} to {table}")
+    return added
+
+def convert_to_partitioned(engine, table: str, today: date = None) -> bool:
+    """將既有資料表轉為依月份分割，已分割時不做任何事"""
+    _require_postgres(engine)
+    column = PARTITIONED_TABLES[table]
+    legacy = f"{table}_unpartitioned"
+    current = _month_start(today or datetime.utcnow().date())
+
+    with engine.begin() as connection:
+        if is_partitioned(connection, table):
+            return False
+
+        connection.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+        sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': table}).scalar()
+        first, last = connection.execute(text(f"SELECT min({column}), max({column}) FROM {table}")).one()
+
+        # 舊表的限制名稱在 schema 內唯一，先改名避免與新表衝突
+        connection.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+        constraints = connection.execute(
+            text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:legacy) AND contype IN ('p', 'u')"),
+            {'legacy': legacy}
+        ).scalars().all()
+        for constraint in constraints:
+            connection.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {constraint} TO {legacy}_{constraint}"))
+
+        connection.execute(text(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})"
+        ))
+        connection.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+
+        month = _month_start(first.date()) if first else current
+        end = _add_months(max(_month_start(last.date()) if last else current, current), PARTITION_PREMAKE_MONTHS)
+        while month <= end:
+            _create_month_partition(connection, table, month)
+            month = _add_months(month, 1)
+
+        connection.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+        if sequence:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+        connection.execute(text(f"DROP TABLE {legacy} CASCADE"))
+
+        for index_column in PARTITION_INDEXES[table]:
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{index_column} ON {table} ({index_column})"
+            ))
+        ensure_partition_constraints(connection, table)
+
+    logger.info(f"Converted {table} to monthly partitions on {column}")
+    return True
+
+def ensure_partitions(engine, today: date = None, months_ahead: int = None) -> List[str]:
+    """建立本月起未來數個月的分割，回傳新建立的分割名稱"""
+    if engine.dialect.name != 'postgresql':
+        return []
+    current = _month_start(today or datetime.utcnow().date())
+    months_ahead = PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+    created = []
+    with engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(connection, table):
+                continue
+            # 補上早期轉換時尚未建立的唯一限制
+            ensure_partition_constraints(connection, table)
+            for offset in range(months_ahead + 1):
+                month = _add_months(current, offset)
+                if _create_month_partition(connection, table, month):
+                    created.append(partition_name(table, month))
+    return created
+
+def _archive_query(connection, query: str, path: str) -> None:
+    """以 COPY 將查詢結果寫入 gzip 壓縮的 CSV"""
+    cursor = connection.connection.cursor()
+    try:
+        with gzip.open(path, 'wb') as archive:
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", archive)
+    finally:
+        cursor.close()
+
+def apply_retention(engine, today: date = None) -> List[str]:
+    """卸離並刪除超過保留期限的分割；設定 PARTITION_ARCHIVE_DIR 時先封存"""
+    if engine.dialect.name != 'postgresql':
+        return []
+    current = _month_start(today or datetime.utcnow().date())
+    dropped = []
+    with engine.begin() as connection:
+        for table, months in retention_months().items():
+            if months <= 0 or not is_partitioned(connection, table):
+                continue
+            cutoff = _add_months(current, -months)
+            for name in _list_partitions(connection, table):
+                month = _parse_partition_month(table, name)
+                if month is None or month >= cutoff:
+                    continue
+
+                connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                if PARTITION_ARCHIVE_DIR:
+                    os.makedirs(PARTITION_ARCHIVE_DIR, exist_ok=True)
+                    _archive_query(connection, f"SELECT * FROM {name}",
+                                   os.path.join(PARTITION_ARCHIVE_DIR, f"{name}.csv.gz"))
+                    if table == 'orders':
+                        _archive_query(
+                            connection,
+                            f"SELECT * FROM order_items WHERE order_id IN (SELECT id FROM {name})",
+                            os.path.join(PARTITION_ARCHIVE_DIR, f"order_items_{name}.csv.gz")
+                        )
+                if table == 'orders':
+                    connection.execute(text(f"DELETE FROM order_items WHERE order_id IN (SELECT id FROM {name})"))
+                connection.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+                logger.info(f"Dropped partition {name} (retention {months} months)")
+    return dropped
+
+def maintain_partitions(engine, today: date = None) -> Dict[str, List[str]]:
+    """建立未來分割並套用保留期限（排程器與 CLI 定期執行）"""
+    return {
+        'created': ensure_partitions(engine, today),
+        'dropped': apply_retention(engine, today)
+    }
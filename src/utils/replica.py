@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+import threading
+from functools import wraps
+from typing import Any, Dict
+
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger(__name__)
+
+# 唯讀副本的 bind key
+REPLICA_BIND_KEY = 'replica'
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '10'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '5'))
+# 寫入後在此秒數內的讀取改走主資料庫（read-your-writes）
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+
+READ_PRIMARY_COOKIE = 'read_primary_until'
+READ_PRIMARY_HEADER = 'X-Read-Primary'
+
+_REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+class ReplicaMonitor:
+    """定期檢查副本延遲，延遲過高或無法連線時改走主資料庫"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self.lag = None
+        self.error = None
+
+    def _check(self, engine) -> None:
+        try:
+            if engine.dialect.name == 'postgresql':
+                with engine.connect() as connection:
+                    self.lag = float(connection.execute(text(_REPLICA_LAG_SQL)).scalar() or 0)
+            else:
+                self.lag = 0.0
+            self.error = None
+        except Exception as e:
+            self.lag, self.error = None, str(e)
+            logger.warning(f"Replica lag check failed: {e}")
+
+    def available(self, engine) -> bool:
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= REPLICA_LAG_CHECK_INTERVAL:
+            # 只讓一個執行緒檢查，其他執行緒沿用上次結果
+            if self._lock.acquire(blocking=self._checked_at is None):
+                try:
+                    self._check(engine)
+                    self._checked_at = time.monotonic()
+                finally:
+                    self._lock.release()
+        return self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'lag_seconds': self.lag,
+            'max_lag_seconds': REPLICA_MAX_LAG_SECONDS,
+            'healthy': self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS,
+            'error': self.error
+        }
+
+replica_monitor = ReplicaMonitor()
+
+def _is_read(clause) -> bool:
+    if clause is None:
+        return False
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip().upper().startswith('SELECT')
+    return bool(getattr(clause, 'is_select', False))
+
+class RoutingSession(Session):
+    """依請求將唯讀查詢導向副本，寫入與 flush 一律使用主資料庫
+
+    同一個 session 一旦寫入，之後的讀取也改走主資料庫。
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('_db_use_replica'):
+            if not _is_read(clause):
+                if clause is not None or mapper is None:
+                    self.info['_db_wrote'] = True
+            elif not self.info.get('_db_wrote'):
+                engine = self._db.engines.get(REPLICA_BIND_KEY)
+                if engine is not None and replica_monitor.available(engine):
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _read_primary_requested() -> bool:
+    if request.headers.get(READ_PRIMARY_HEADER, '').lower() in ('1', 'true', 'yes'):
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def use_replica(view):
+    """標記唯讀路由，查詢改由副本處理（剛寫入過的用戶端仍讀主資料庫）"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _read_primary_requested():
+            g._db_use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+def install_replica_routing(app) -> None:
+    """有設定副本時，成功的寫入請求會設定 cookie，讓後續幾秒的讀取走主資料庫"""
+    if REPLICA_BIND_KEY not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+
+    @app.after_request
+    def mark_read_primary(response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            until = int(time.time()) + REPLICA_STICKY_SECONDS
+            response.set_cookie(READ_PRIMARY_COOKIE, str(until), max_age=REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+            response.headers['X-Read-Primary-Until'] = str(until)
+        return response
+
+def get_replica_status(db) -> Dict[str, Any]:
+    engine = db.engines.get(REPLICA_BIND_KEY)
+    if engine is None:
+        return {'configured': False}
+    replica_monitor.available(engine)
+    return {'configured': True, **replica_monitor.status()}
@@ -4,16 +4,23 @@ import hmac
 import hashlib
 import json
 import time
+import threading
 import requests
 import urllib.parse
 from typing import Dict, Any, List
 from datetime import datetime
+from src.utils.ruten_transport import get_default_transport
+
+# 系統時間每個行程只檢查一次，避免每次建立客戶端都呼叫外部時間服務
+_system_time_checked = False
+_system_time_lock = threading.Lock()
 
 class RutenAPIClient:
     """露天拍賣 API 客戶端 - 包含查詢商品、商品管理與圖片上傳功能"""
     
-    def __init__(self, api_key: str = None, secret_key: str = None, salt_key: str = None):
-        self.base_url = "https://partner.ruten.com.tw"
+    def __init__(self, api_key: str = None, secret_key: str = None, salt_key: str = None, transport=None, rate_budget=None):
+        self.base_url = os.getenv('RUTEN_BASE_URL', "https://partner.ruten.com.tw").rstrip('/')
+        self.timeout = float(os.getenv('RUTEN_REQUEST_TIMEOUT', '30'))
         self.api_key = api_key or os.getenv('RUTEN_API_KEY')
         self.secret_key = secret_key or os.getenv('RUTEN_SECRET_KEY')
         self.salt_key = salt_key or os.getenv('RUTEN_SALT_KEY')
@@ -21,15 +28,25 @@ class RutenAPIClient:
         if not all([self.api_key, self.secret_key, self.salt_key]):
             raise ValueError("缺少必要的憑證：RUTEN_API_KEY、RUTEN_SECRET_KEY、RUTEN_SALT_KEY")
         
-        # 設置日誌
-        logging.getLogger(__name__).setLevel(logging.DEBUG)
+        # 傳輸層可切換為錄製或重播（見 src/utils/ruten_transport.py）
+        self.transport = transport or get_default_transport()
+        # 多商店時每個商店各自的請求速率預算（見 src/utils/shops.py）
+        self.rate_budget = rate_budget
+        
         logging.debug(f"初始化完成：api_key={self.api_key[:8]}..., secret_key={self.secret_key[:8]}..., salt_key={self.salt_key}")
         
         # 檢查本地系統時間
         self._check_system_time()
     
     def _check_system_time(self) -> None:
-        """檢查本地系統時間是否合理同步"""
+        """檢查本地系統時間是否合理同步（每個行程一次）"""
+        global _system_time_checked
+        if not self.transport.live or _system_time_checked:
+            return
+        with _system_time_lock:
+            if _system_time_checked:
+                return
+            _system_time_checked = True
         try:
             response = requests.get('http://worldtimeapi.org/api/timezone/Asia/Taipei', timeout=5)
             if response.status_code == 200:
@@ -69,7 +86,7 @@ class RutenAPIClient:
         logging.debug(f"生成標頭：簽章={signature[:8]}..., 時間戳記={timestamp}")
         
         return {
-            'Host': 'partner.ruten.com.tw',
+            'Host': urllib.parse.urlparse(self.base_url).netloc,
             'Content-Type': content_type,
             'X-RT-Key': self.api_key,
             'X-RT-Timestamp': timestamp,
@@ -79,6 +96,9 @@ class RutenAPIClient:
     def _make_request(self, method: str, endpoint: str, params: Dict[str, Any] = None, data: Dict[str, Any] = None, files: Dict[str, Any] = None) -> Dict[str, Any]:
         """發送 API 請求"""
         url = f"{self.base_url}{endpoint}"
+        # 先等待速率預算再簽章，避免等待期間時間戳記過期
+        if self.rate_budget is not None:
+            self.rate_budget.acquire()
         request_body = json.dumps(data) if data else ""
         local_timestamp = str(int(time.time()))
         
@@ -86,12 +106,13 @@ class RutenAPIClient:
         logging.debug(f"Ruten API 請求：{method} {url}, 標頭={headers}, 參數={params}, 資料={data}, 本地時間戳記={local_timestamp}")
         
         try:
+            secrets = (self.api_key, self.secret_key, self.salt_key)
             if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=params, timeout=30)
+                response = self.transport.send('GET', url, headers=headers, params=params, timeout=self.timeout, redact=secrets)
             elif method.upper() == 'POST':
-                response = requests.post(url, headers=headers, params=params, data=data, files=files, timeout=30)
+                response = self.transport.send('POST', url, headers=headers, params=params, data=data, files=files, timeout=self.timeout, redact=secrets)
             elif method.upper() == 'PUT':
-                response = requests.put(url, headers=headers, params=params, json=data, timeout=30)
+                response = self.transport.send('PUT', url, headers=headers, params=params, json=data, timeout=self.timeout, redact=secrets)
             else:
                 raise ValueError(f"不支持的請求方法：{method}")
                 
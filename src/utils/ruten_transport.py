@@ -0,0 +1,182 @@
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+import urllib.parse
+from collections import defaultdict, deque
+from http import HTTPStatus
+from typing import Any, Dict, Iterable, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# live：直接呼叫露天；record：呼叫露天並寫入 cassette；replay：只從 cassette 回應
+RUTEN_TRANSPORT = os.getenv('RUTEN_TRANSPORT', 'live').lower()
+RUTEN_CASSETTE = os.getenv('RUTEN_CASSETTE', 'ruten_cassette.jsonl.gz')
+# original：依錄製時的延遲回應；fast：立即回應
+RUTEN_REPLAY_TIMING = os.getenv('RUTEN_REPLAY_TIMING', 'original').lower()
+
+REDACTED = '<redacted>'
+# 一律遮蔽的請求標頭
+SECRET_HEADERS = ('X-RT-Key', 'X-RT-Authorization')
+# 錄製時保留的回應標頭
+RECORDED_RESPONSE_HEADERS = ('Content-Type', 'Date', 'Retry-After', 'CF-Ray')
+
+class CassetteMiss(requests.exceptions.RequestException):
+    """重播時 cassette 中沒有對應的請求"""
+
+def _request_key(method: str, url: str, params: Optional[Dict[str, Any]], body: str) -> tuple:
+    path = urllib.parse.urlsplit(url).path
+    query = urllib.parse.urlencode(params, doseq=True) if params else ''
+    return method.upper(), f"{path}?{query}" if query else path, body
+
+def _request_body(data: Any, json_body: Any, files: Any) -> str:
+    """以排序後的 JSON 表示請求內容（檔案只記錄欄位與檔名）"""
+    payload = json_body if json_body is not None else data
+    if files:
+        payload = {'data': payload, 'files': {name: value[0] if isinstance(value, tuple) else name
+                                              for name, value in files.items()}}
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False) if payload else ''
+
+def _redact(text: str, secrets: Iterable[str]) -> str:
+    for secret in secrets:
+        if secret:
+            text = text.replace(secret, REDACTED)
+    return text
+
+class HTTPTransport:
+    """以 requests 直接呼叫露天 API"""
+
+    live = True
+
+    def send(self, method: str, url: str, headers: Dict[str, str], params: Dict[str, Any] = None,
+             data: Any = None, json: Any = None, files: Any = None, timeout: float = None,
+             redact: Iterable[str] = ()) -> requests.Response:
+        return requests.request(method, url, headers=headers, params=params, data=data,
+                                json=json, files=files, timeout=timeout)
+
+class RecordingTransport:
+    """呼叫露天並將請求與回應逐筆附加到 gzip JSON Lines cassette，憑證一律遮蔽"""
+
+    live = True
+
+    def __init__(self, path: str, inner: HTTPTransport = None):
+        self.path = path
+        self.inner = inner or HTTPTransport()
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def send(self, method, url, headers, params=None, data=None, json=None, files=None, timeout=None, redact=()):
+        secrets = [value for value in redact if value]
+        _, path, body = _request_key(method, url, params, _request_body(data, json, files))
+        request_headers = {name: REDACTED if name in SECRET_HEADERS else value
+                           for name, value in headers.items() if name != 'Host'}
+        entry = {
+            'method': method.upper(),
+            'path': path,
+            'body': body,
+            'headers': request_headers,
+            'at': round(time.monotonic() - self._started, 4)
+        }
+        start = time.perf_counter()
+        try:
+            response = self.inner.send(method, url, headers=headers, params=params, data=data,
+                                       json=json, files=files, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            entry.update(elapsed=round(time.perf_counter() - start, 4), error=type(e).__name__, message=str(e))
+            self._write(entry, secrets)
+            raise
+        entry.update(
+            elapsed=round(time.perf_counter() - start, 4),
+            status=response.status_code,
+            response_headers={name: response.headers[name] for name in RECORDED_RESPONSE_HEADERS
+                              if name in response.headers},
+            response=response.text
+        )
+        self._write(entry, secrets)
+        return response
+
+    def _write(self, entry: Dict[str, Any], secrets) -> None:
+        line = _redact(json.dumps(entry, ensure_ascii=False), secrets) + '\n'
+        with self._lock:
+            # 每筆為獨立的 gzip member，程序中斷時已寫入的紀錄仍可讀取
+            with gzip.open(self.path, 'ab') as f:
+                f.write(line.encode('utf-8'))
+
+def load_cassette(path: str):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class ReplayTransport:
+    """依 (method, path+query, body) 從 cassette 依序取出回應，不連線露天
+
+    同一個請求錄製多次時依錄製順序回應，用完後重複最後一筆。
+    """
+
+    live = False
+
+    def __init__(self, path: str, timing: str = 'original'):
+        if timing not in ('original', 'fast'):
+            raise ValueError(f"Unsupported replay timing: {timing}")
+        self.path = path
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._entries = defaultdict(deque)
+        self._last = {}
+        for entry in load_cassette(path):
+            self._entries[(entry['method'], entry['path'], entry['body'])].append(entry)
+        logger.info(f"Loaded {sum(len(entries) for entries in self._entries.values())} Ruten responses from {path}")
+
+    def _next(self, key):
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries:
+                self._last[key] = entries.popleft()
+            return self._last.get(key)
+
+    def send(self, method, url, headers, params=None, data=None, json=None, files=None, timeout=None, redact=()):
+        key = _request_key(method, url, params, _request_body(data, json, files))
+        entry = self._next(key)
+        if entry is None:
+            raise CassetteMiss(f"No recorded response for {key[0]} {key[1]}")
+        if self.timing == 'original' and entry.get('elapsed'):
+            time.sleep(entry['elapsed'])
+        if 'error' in entry:
+            error_class = getattr(requests.exceptions, entry['error'], requests.exceptions.RequestException)
+            raise error_class(entry.get('message'))
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        try:
+            response.reason = HTTPStatus(entry['status']).phrase
+        except ValueError:
+            response.reason = ''
+        response.headers = CaseInsensitiveDict(entry.get('response_headers') or {})
+        response._content = entry['response'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = f"{url}?{key[1].split('?', 1)[1]}" if '?' in key[1] else url
+        return response
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+def get_default_transport():
+    """依 RUTEN_TRANSPORT 建立程序共用的傳輸層"""
+    global _default_transport
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                if RUTEN_TRANSPORT == 'record':
+                    _default_transport = RecordingTransport(RUTEN_CASSETTE)
+                    logger.info(f"Recording Ruten API traffic to {RUTEN_CASSETTE}")
+                elif RUTEN_TRANSPORT == 'replay':
+                    _default_transport = ReplayTransport(RUTEN_CASSETTE, timing=RUTEN_REPLAY_TIMING)
+                elif RUTEN_TRANSPORT == 'live':
+                    _default_transport = HTTPTransport()
+                else:
+                    raise ValueError(f"Unsupported RUTEN_TRANSPORT: {RUTEN_TRANSPORT}")
+    return _default_transport
@@ -0,0 +1,166 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from src.models.models import db, Order, SalesDailySummary
+
+logger = logging.getLogger(__name__)
+
+# 影響銷售統計的訂單欄位
+SUMMARY_FIELDS = ('status', 'total_amount', 'order_date', 'created_at')
+
+_PENDING_KEY = 'sales_summary_pending'
+
+def _to_decimal(value) -> Decimal:
+    if value is None or value == '':
+        return Decimal('0')
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal('0')
+
+def _to_datetime(value) -> Optional[datetime]:
+    if isinstance(value, datetime) or value is None:
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return None
+
+def _summary_key(values: Dict) -> Tuple[date, str]:
+    """訂單歸屬的統計鍵：(訂單日期，無則建立日期；狀態)"""
+    moment = _to_datetime(values.get('order_date')) or _to_datetime(values.get('created_at')) or datetime.utcnow()
+    return moment.date(), values.get('status') or 'unknown'
+
+def _current_values(obj) -> Dict:
+    return {field: getattr(obj, field) for field in SUMMARY_FIELDS}
+
+def _previous_values(session, dirty_orders) -> Dict[int, Dict]:
+    """取得訂單 flush 前的欄位值，屬性歷程不完整時改由資料庫讀取"""
+    previous = {}
+    missing = []
+    for obj in dirty_orders:
+        state = inspect(obj)
+        values = {}
+        for field in SUMMARY_FIELDS:
+            history = state.attrs[field].history
+            if not history.has_changes():
+                values[field] = getattr(obj, field)
+            elif history.deleted:
+                values[field] = history.deleted[0]
+            else:
+                missing.append(obj.id)
+                break
+        else:
+            previous[obj.id] = values
+    if missing:
+        columns = [getattr(Order, field) for field in SUMMARY_FIELDS]
+        rows = session.connection().execute(select(Order.id, *columns).where(Order.id.in_(missing)))
+        for row in rows:
+            previous[row.id] = {field: getattr(row, field) for field in SUMMARY_FIELDS}
+    return previous
+
+def _before_flush(session, flush_context, instances):
+    deltas = session.info.setdefault(_PENDING_KEY, defaultdict(lambda: [0, Decimal('0')]))
+
+    def apply(values, sign):
+        key = _summary_key(values)
+        deltas[key][0] += sign
+        deltas[key][1] += sign * _to_decimal(values.get('total_amount'))
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            apply(_current_values(obj), 1)
+
+    dirty_orders = [
+        obj for obj in session.dirty
+        if isinstance(obj, Order) and obj.id is not None
+        and any(inspect(obj).attrs[field].history.has_changes() for field in SUMMARY_FIELDS)
+    ]
+    deleted_orders = [obj for obj in session.deleted if isinstance(obj, Order) and obj.id is not None]
+    previous = _previous_values(session, dirty_orders + deleted_orders)
+    for obj in dirty_orders:
+        if obj.id in previous:
+            apply(previous[obj.id], -1)
+        apply(_current_values(obj), 1)
+    for obj in deleted_orders:
+        if obj.id in previous:
+            apply(previous[obj.id], -1)
+
+def _upsert(connection, rows) -> None:
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = dialect_insert(SalesDailySummary)
+        statement = statement.on_conflict_do_update(
+            index_elements=['day', 'status'],
+            set_={
+                'order_count': SalesDailySummary.order_count + statement.excluded.order_count,
+                'total_amount': SalesDailySummary.total_amount + statement.excluded.total_amount,
+                'updated_at': statement.excluded.updated_at
+            }
+        )
+        connection.execute(statement, rows)
+        return
+
+    for row in rows:
+        result = connection.execute(
+            update(SalesDailySummary)
+            .where(SalesDailySummary.day == row['day'], SalesDailySummary.status == row['status'])
+            .values(
+                order_count=SalesDailySummary.order_count + row['order_count'],
+                total_amount=SalesDailySummary.total_amount + row['total_amount'],
+                updated_at=row['updated_at']
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(SalesDailySummary), [row])
+
+def _after_flush(session, flush_context):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {'day': day, 'status': status, 'order_count': count, 'total_amount': amount, 'updated_at': now}
+        for (day, status), (count, amount) in sorted(deltas.items())
+        if count or amount
+    ]
+    if rows:
+        _upsert(session.connection(), rows)
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+def install_sales_summary() -> None:
+    """註冊 session 事件，讓訂單寫入時同步更新每日銷售統計"""
+    if not event.contains(Session, 'before_flush', _before_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_soft_rollback', lambda session, previous_transaction: _after_rollback(session))
+
+def rebuild_sales_summary() -> int:
+    """由 orders 重新計算每日銷售統計（首次部署或資料修正時使用）"""
+    day = func.date(func.coalesce(Order.order_date, Order.created_at))
+    status = func.coalesce(Order.status, 'unknown')
+    source = (
+        select(
+            day, status,
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total_amount), 0),
+            func.now()
+        )
+        .group_by(day, status)
+    )
+    db.session.execute(db.delete(SalesDailySummary))
+    db.session.execute(
+        insert(SalesDailySummary).from_select(['day', 'status', 'order_count', 'total_amount', 'updated_at'], source)
+    )
+    db.session.commit()
+    rows = db.session.query(func.count()).select_from(SalesDailySummary).scalar()
+    logger.info(f"Sales summary rebuilt: {rows} day/status rows")
+    return rows
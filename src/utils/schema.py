@@ -0,0 +1,52 @@
+import logging
+from typing import Dict, List, Tuple
+
+from sqlalchemy import inspect, text
+from src.models.models import db
+
+logger = logging.getLogger(__name__)
+
+# 在既有資料表上新增的欄位：{資料表: (欄位, ...)}
+# db.create_all 不會修改已存在的資料表，init-db 時由 add_missing_columns 補上欄位與相關索引
+ADDED_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'products': ('custom_no', 'content_hash', 'shop_id'),
+    'orders': ('content_hash', 'shop_id'),
+    'categories': ('content_hash', 'shop_id'),
+    'sync_runs': ('shop_id',),
+    'stock_push_outbox': ('next_attempt_at', 'dead_lettered_at'),
+}
+
+def add_missing_columns(engine, added_columns: Dict[str, Tuple[str, ...]] = None) -> List[str]:
+    """為既有資料庫補上模型中新增的欄位，並同步這些資料表的索引（含唯一索引）
+
+    欄位一律以可為 NULL 的方式新增，唯一限制以唯一索引建立（SQLite 的 ADD COLUMN 不支援 UNIQUE）。
+    模型中有、資料庫中沒有的索引會補建；同名但唯一性不同的索引（例如 custom_no 由全域唯一改為
+    賣場內唯一）會先刪除再依模型重建。回傳新增的欄位（資料表.欄位）。
+    """
+    added = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+        for table_name, column_names in (added_columns or ADDED_COLUMNS).items():
+            if table_name not in existing_tables:
+                continue
+            table = db.metadata.tables[table_name]
+            existing = {column['name'] for column in inspector.get_columns(table_name)}
+            new_columns = [name for name in column_names if name not in existing]
+            for name in new_columns:
+                column = table.c[name]
+                definition = f'{name} {column.type.compile(dialect=engine.dialect)}'
+                for foreign_key in column.foreign_keys:
+                    definition += f' REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})'
+                logger.info(f"Adding {name} column to {table_name}")
+                connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {definition}'))
+                added.append(f'{table_name}.{name}')
+            existing_indexes = {index['name']: bool(index['unique']) for index in inspector.get_indexes(table_name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    if existing_indexes[index.name] == bool(index.unique):
+                        continue
+                    logger.info(f"Rebuilding index {index.name} on {table_name}")
+                    index.drop(connection)
+                index.create(connection)
+    return added
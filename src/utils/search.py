@@ -0,0 +1,147 @@
+import logging
+from typing import List, Tuple
+
+from sqlalchemy import text
+from src.models.models import db, Product
+
+logger = logging.getLogger(__name__)
+
+# SQLite FTS5 trigram 斷詞至少需要 3 個字元
+SQLITE_TRIGRAM_MIN_LENGTH = 3
+
+POSTGRES_INDEX_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # 'simple' 設定不做語言處理，中文標題整段視為一個詞，因此另以 trigram 處理部分比對
+    "CREATE INDEX IF NOT EXISTS ix_products_search_tsv ON products USING GIN "
+    "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')))",
+    "CREATE INDEX IF NOT EXISTS ix_products_title_trgm ON products USING GIN (title gin_trgm_ops)",
+]
+
+# 以 external content 建立 FTS5 表，透過 trigger 隨 products 寫入同步更新
+SQLITE_INDEX_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "title, description, content='products', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO products_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+_fts_available = {}
+
+def ensure_search_index(engine) -> None:
+    """建立商品全文搜尋索引（init-db 時執行）"""
+    dialect = engine.dialect.name
+    if dialect == 'postgresql':
+        statements = POSTGRES_INDEX_STATEMENTS
+    elif dialect == 'sqlite':
+        statements = SQLITE_INDEX_STATEMENTS
+    else:
+        logger.warning(f"Full-text search index not supported on {dialect}, falling back to LIKE")
+        return
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+    _fts_available.pop(engine.url, None)
+    logger.info(f"Product search index ready ({dialect})")
+
+def _has_search_index(engine) -> bool:
+    """確認搜尋索引是否已建立（結果依引擎快取）"""
+    if engine.url not in _fts_available:
+        dialect = engine.dialect.name
+        with engine.connect() as connection:
+            if dialect == 'sqlite':
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+                ).first() is not None
+            elif dialect == 'postgresql':
+                exists = connection.execute(
+                    text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                ).first() is not None
+            else:
+                exists = False
+        _fts_available[engine.url] = exists
+    return _fts_available[engine.url]
+
+def _load_ranked(ids_with_scores) -> List[Tuple[Product, float]]:
+    ids = [row_id for row_id, _ in ids_with_scores]
+    products = {product.id: product for product in Product.query.filter(Product.id.in_(ids))} if ids else {}
+    return [(products[row_id], float(score)) for row_id, score in ids_with_scores if row_id in products]
+
+def _search_postgres(query, status, limit, offset, shop_id=None):
+    where = """
+        (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')) @@ websearch_to_tsquery('simple', :q)
+         OR title ILIKE :like OR title % :q)
+    """
+    params = {'q': query, 'like': f'%{query}%', 'limit': limit, 'offset': offset}
+    if status:
+        where += " AND status = :status"
+        params['status'] = status
+    if shop_id is not None:
+        where += " AND shop_id = :shop_id"
+        params['shop_id'] = shop_id
+    total = db.session.execute(text(f"SELECT count(*) FROM products WHERE {where}"), params).scalar()
+    rows = db.session.execute(text(f"""
+        SELECT id,
+               ts_rank(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')),
+                       websearch_to_tsquery('simple', :q)) + similarity(title, :q) AS score
+        FROM products
+        WHERE {where}
+        ORDER BY score DESC, id DESC
+        LIMIT :limit OFFSET :offset
+    """), params).all()
+    return _load_ranked(rows), total
+
+def _search_sqlite(query, status, limit, offset, shop_id=None):
+    # 以片語查詢避免 FTS5 語法字元造成錯誤
+    match = '"' + query.replace('"', '""') + '"'
+    where = "products_fts MATCH :match"
+    params = {'match': match, 'limit': limit, 'offset': offset}
+    if status:
+        where += " AND products.status = :status"
+        params['status'] = status
+    if shop_id is not None:
+        where += " AND products.shop_id = :shop_id"
+        params['shop_id'] = shop_id
+    total = db.session.execute(text(f"""
+        SELECT count(*) FROM products_fts JOIN products ON products.id = products_fts.rowid WHERE {where}
+    """), params).scalar()
+    rows = db.session.execute(text(f"""
+        SELECT products.id, -bm25(products_fts, 2.0, 1.0) AS score
+        FROM products_fts JOIN products ON products.id = products_fts.rowid
+        WHERE {where}
+        ORDER BY bm25(products_fts, 2.0, 1.0), products.id DESC
+        LIMIT :limit OFFSET :offset
+    """), params).all()
+    return _load_ranked(rows), total
+
+def _search_like(query, status, limit, offset, shop_id=None):
+    like = f'%{query}%'
+    base = Product.query.filter(db.or_(Product.title.ilike(like), Product.description.ilike(like)))
+    if status:
+        base = base.filter(Product.status == status)
+    if shop_id is not None:
+        base = base.filter(Product.shop_id == shop_id)
+    total = base.count()
+    title_match = db.case((Product.title.ilike(like), 1), else_=0)
+    products = base.order_by(title_match.desc(), Product.id.desc()).limit(limit).offset(offset).all()
+    return [(product, 1.0 if query.lower() in (product.title or '').lower() else 0.5) for product in products], total
+
+def search_products(query: str, page: int = 1, page_size: int = 30, status: str = None, shop_id: int = None):
+    """搜尋商品標題與描述，回傳 ([(product, score)], total)"""
+    limit = page_size
+    offset = (max(page, 1) - 1) * page_size
+    engine = db.engine
+    dialect = engine.dialect.name
+
+    if dialect == 'postgresql' and _has_search_index(engine):
+        return _search_postgres(query, status, limit, offset, shop_id)
+    if dialect == 'sqlite' and len(query) >= SQLITE_TRIGRAM_MIN_LENGTH and _has_search_index(engine):
+        return _search_sqlite(query, status, limit, offset, shop_id)
+    return _search_like(query, status, limit, offset, shop_id)
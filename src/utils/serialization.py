@@ -0,0 +1,184 @@
+import math
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+
+from flask import current_app, jsonify, request
+from src.models.models import Product, Order, Category
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 為選用套件
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# datetime、dataclass 與 str 子類別交由 Flask 的 JSON provider 處理，確保輸出一致
+ORJSON_OPTIONS = (
+    orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS
+) if orjson else 0
+
+def _raw(values):
+    return list(values)
+
+def _float_or_none(values):
+    # 與 to_dict 一致：0 也會輸出為 None
+    return [float(value) if value else None for value in values]
+
+def _isoformat_or_none(values):
+    return [value.isoformat() if value else None for value in values]
+
+CONVERTERS = {
+    'raw': _raw,
+    'float': _float_or_none,
+    'datetime': _isoformat_or_none
+}
+
+class RowSerializer:
+    """直接查詢欄位值並依欄位批次轉換，輸出與 model.to_dict() 相同的 dict"""
+
+    def __init__(self, fields: Sequence[Tuple[str, Any, str]]):
+        self.keys = [key for key, _, _ in fields]
+        self.columns = [column for _, column, _ in fields]
+        self.converters = [CONVERTERS[kind] for _, _, kind in fields]
+
+    def serialize(self, rows, layout: str = 'rows'):
+        """layout 為 'rows' 時回傳 dict 清單，'columnar' 時回傳 {'columns': 欄位名稱, 'rows': 值陣列}"""
+        columns = [convert(values) for convert, values in zip(self.converters, zip(*rows))] if rows else []
+        if layout == 'columnar':
+            return {'columns': list(self.keys), 'rows': [list(values) for values in zip(*columns)]}
+        keys = self.keys
+        return [dict(zip(keys, values)) for values in zip(*columns)]
+
+PRODUCT_ROWS = RowSerializer([
+    ('id', Product.id, 'raw'),
+    ('ruten_item_id', Product.ruten_item_id, 'raw'),
+    ('custom_no', Product.custom_no, 'raw'),
+    ('title', Product.title, 'raw'),
+    ('description', Product.description, 'raw'),
+    ('price', Product.price, 'float'),
+    ('stock', Product.stock, 'raw'),
+    ('status', Product.status, 'raw'),
+    ('category_id', Product.category_id, 'raw'),
+    ('shop_id', Product.shop_id, 'raw'),
+    ('created_at', Product.created_at, 'datetime'),
+    ('updated_at', Product.updated_at, 'datetime')
+])
+
+ORDER_ROWS = RowSerializer([
+    ('id', Order.id, 'raw'),
+    ('ruten_order_id', Order.ruten_order_id, 'raw'),
+    ('buyer_name', Order.buyer_name, 'raw'),
+    ('total_amount', Order.total_amount, 'float'),
+    ('status', Order.status, 'raw'),
+    ('order_date', Order.order_date, 'datetime'),
+    ('ship_date', Order.ship_date, 'datetime'),
+    ('shop_id', Order.shop_id, 'raw'),
+    ('created_at', Order.created_at, 'datetime'),
+    ('updated_at', Order.updated_at, 'datetime')
+])
+
+CATEGORY_ROWS = RowSerializer([
+    ('id', Category.id, 'raw'),
+    ('ruten_category_id', Category.ruten_category_id, 'raw'),
+    ('name', Category.name, 'raw'),
+    ('parent_id', Category.parent_id, 'raw'),
+    ('shop_id', Category.shop_id, 'raw'),
+    ('created_at', Category.created_at, 'datetime'),
+    ('updated_at', Category.updated_at, 'datetime')
+])
+
+def query_rows(query, serializer: RowSerializer, layout: str = 'rows'):
+    """以 ORM 查詢的條件與排序直接取欄位值，不建立 model 物件"""
+    return serializer.serialize(query.with_entities(*serializer.columns).all(), layout)
+
+def paginate_rows(query, serializer: RowSerializer, page: int, per_page: int, layout: str = 'rows') -> Tuple[Any, int, int]:
+    """與 query.paginate(error_out=False) 相同的分頁規則，回傳 (資料列, total, pages)"""
+    page = page if page and page >= 1 else 1
+    per_page = per_page if per_page and per_page >= 1 else 20
+    rows = query.with_entities(*serializer.columns).limit(per_page).offset((page - 1) * per_page).all()
+    total = query.order_by(None).count()
+    pages = math.ceil(total / per_page) if total else 0
+    return serializer.serialize(rows, layout), total, pages
+
+def to_layout(records: List[Dict[str, Any]], layout: str = 'rows'):
+    """將 dict 清單轉為指定格式（欄位以第一筆資料為準）"""
+    if layout != 'columnar':
+        return records
+    columns = list(records[0].keys()) if records else []
+    return {'columns': columns, 'rows': [[record.get(column) for column in columns] for record in records]}
+
+def fast_jsonify(payload: Any):
+    """與 jsonify 輸出相同位元組的回應；安裝 orjson 時改用 orjson 編碼"""
+    provider = current_app.json
+    compact = not ((provider.compact is None and current_app.debug) or provider.compact is False)
+    if orjson is None or not compact or not getattr(provider, 'sort_keys', True):
+        return jsonify(payload)
+
+    try:
+        body = orjson.dumps(payload, option=ORJSON_OPTIONS)
+    except TypeError:
+        # 日期、Decimal 等 Flask 有自訂格式的型別，以及超過 64 位元的整數交給標準 JSON
+        return jsonify(payload)
+
+    # orjson 不跳脫非 ASCII 字元；事後跳脫比標準 JSON 的 C 編碼器更慢，因此交回 jsonify
+    if getattr(provider, 'ensure_ascii', True) and not body.isascii():
+        return jsonify(payload)
+    return current_app.response_class(body, mimetype=provider.mimetype)
+
+# 列表端點支援的回應格式；預設仍為逐筆物件的 JSON（app.js 使用）
+LIST_FORMATS = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.columnar+json',
+    'msgpack': 'application/x-msgpack'
+}
+_MIMETYPE_FORMATS = {
+    'application/json': 'json',
+    'application/vnd.columnar+json': 'columnar',
+    'application/x-msgpack': 'msgpack',
+    'application/msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack'
+}
+
+class UnsupportedFormat(Exception):
+    """用戶端要求的回應格式無法提供"""
+
+def negotiate_list_format() -> str:
+    """依 format 參數或 Accept 標頭決定格式：json、columnar 或 msgpack"""
+    requested = request.args.get('format')
+    if requested:
+        if requested not in LIST_FORMATS:
+            raise UnsupportedFormat(f"Unsupported format: {requested}. Use one of {', '.join(LIST_FORMATS)}")
+        fmt = requested
+    else:
+        fmt = _MIMETYPE_FORMATS[request.accept_mimetypes.best_match(list(_MIMETYPE_FORMATS), default='application/json')]
+    if fmt == 'msgpack' and msgpack is None:
+        raise UnsupportedFormat('MessagePack is not available: install msgpack')
+    return fmt
+
+def list_layout(fmt: str) -> str:
+    """columnar 與 msgpack 都使用欄位名稱只出現一次的欄式結構"""
+    return 'rows' if fmt == 'json' else 'columnar'
+
+def list_response(payload: Any, fmt: str):
+    """依協商結果輸出列表回應"""
+    if fmt == 'msgpack':
+        response = current_app.response_class(msgpack.packb(payload, use_bin_type=True), mimetype=LIST_FORMATS['msgpack'])
+    else:
+        response = fast_jsonify(payload)
+        if fmt == 'columnar':
+            response.mimetype = LIST_FORMATS['columnar']
+    response.vary.add('Accept')
+    return response
+
+def unsupported_format_response(error: UnsupportedFormat):
+    return jsonify({
+        'status': 'error',
+        'message': str(error),
+        'formats': list(LIST_FORMATS)
+    }), 406
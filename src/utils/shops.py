@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from src.models.models import db, Shop
+from src.utils.ruten_client import RutenAPIClient
+
+logger = logging.getLogger(__name__)
+
+# 以逗號分隔的 Fernet 金鑰，第一把用於加密，其餘只用於解密（輪替金鑰時使用）
+SHOP_ENCRYPTION_KEY = os.getenv('SHOP_ENCRYPTION_KEY', '')
+# 每個商店呼叫露天的預設速率（每秒請求數，0 為不限制）與突發上限
+SHOP_RATE_LIMIT = float(os.getenv('SHOP_RATE_LIMIT', '5'))
+SHOP_RATE_BURST = int(os.getenv('SHOP_RATE_BURST', '10'))
+# 同時同步的商店數上限
+SHOP_SYNC_MAX_WORKERS = int(os.getenv('SHOP_SYNC_MAX_WORKERS', '8'))
+
+class ShopConfigError(Exception):
+    """商店憑證無法加解密（例如未設定 SHOP_ENCRYPTION_KEY）"""
+
+class ShopNotFound(LookupError):
+    """商店不存在或已停用"""
+
+_fernet = None
+_fernet_lock = threading.Lock()
+
+def _cipher():
+    global _fernet
+    if _fernet is None:
+        keys = [key.strip() for key in SHOP_ENCRYPTION_KEY.split(',') if key.strip()]
+        if not keys:
+            raise ShopConfigError('SHOP_ENCRYPTION_KEY is not configured')
+        from cryptography.fernet import Fernet, MultiFernet
+        with _fernet_lock:
+            if _fernet is None:
+                _fernet = MultiFernet([Fernet(key.encode()) for key in keys])
+    return _fernet
+
+def encrypt_secret(value: str) -> str:
+    return _cipher().encrypt(value.encode('utf-8')).decode('ascii')
+
+def decrypt_secret(token: str) -> str:
+    from cryptography.fernet import InvalidToken
+    try:
+        return _cipher().decrypt(token.encode('ascii')).decode('utf-8')
+    except InvalidToken:
+        raise ShopConfigError('Shop credentials cannot be decrypted with SHOP_ENCRYPTION_KEY')
+
+def set_shop_credentials(shop: Shop, api_key: str, secret_key: str, salt_key: str) -> None:
+    shop.api_key = api_key
+    shop.secret_key_encrypted = encrypt_secret(secret_key)
+    shop.salt_key_encrypted = encrypt_secret(salt_key)
+
+def reencrypt_shop_secrets() -> int:
+    """以目前第一把金鑰重新加密所有商店憑證（輪替金鑰後執行）"""
+    shops = Shop.query.all()
+    for shop in shops:
+        shop.secret_key_encrypted = _cipher().rotate(shop.secret_key_encrypted.encode('ascii')).decode('ascii')
+        shop.salt_key_encrypted = _cipher().rotate(shop.salt_key_encrypted.encode('ascii')).decode('ascii')
+    db.session.commit()
+    return len(shops)
+
+class RateBudget:
+    """令牌桶：平均每秒 rate 個請求，最多累積 burst 個；rate 為 0 時不限制"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """取得一個令牌，必要時等待；回傳等待秒數"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+# {shop_id: (版本, client)}；shop_id 為 None 時代表以環境變數設定的預設帳號
+_clients: Dict[Optional[int], tuple] = {}
+_clients_lock = threading.Lock()
+
+def default_credentials_configured() -> bool:
+    return all(os.getenv(name) for name in ('RUTEN_API_KEY', 'RUTEN_SECRET_KEY', 'RUTEN_SALT_KEY'))
+
+def get_client(shop_id: Optional[int] = None) -> RutenAPIClient:
+    """取得商店的露天客戶端，依商店快取；商店設定變更後自動重建"""
+    if shop_id is None:
+        version = tuple(os.getenv(name) for name in ('RUTEN_API_KEY', 'RUTEN_SECRET_KEY', 'RUTEN_SALT_KEY'))
+        cached = _clients.get(None)
+        if cached and cached[0] == version:
+            return cached[1]
+        client = RutenAPIClient()
+    else:
+        shop = db.session.get(Shop, shop_id)
+        if shop is None or not shop.active:
+            raise ShopNotFound(f'Shop {shop_id} not found')
+        version = shop.updated_at
+        cached = _clients.get(shop_id)
+        if cached and cached[0] == version:
+            return cached[1]
+        client = RutenAPIClient(
+            api_key=shop.api_key,
+            secret_key=decrypt_secret(shop.secret_key_encrypted),
+            salt_key=decrypt_secret(shop.salt_key_encrypted),
+            rate_budget=RateBudget(
+                SHOP_RATE_LIMIT if shop.rate_limit is None else shop.rate_limit,
+                SHOP_RATE_BURST if shop.rate_burst is None else shop.rate_burst
+            )
+        )
+    with _clients_lock:
+        _clients[shop_id] = (version, client)
+    return client
+
+def invalidate_client(shop_id: Optional[int]) -> None:
+    with _clients_lock:
+        _clients.pop(shop_id, None)
+
+def sync_shop_ids() -> List[Optional[int]]:
+    """要同步的商店：已設定環境變數憑證時包含預設帳號（None），以及所有啟用中的商店"""
+    shop_ids = [None] if default_credentials_configured() else []
+    shop_ids.extend(db.session.execute(
+        db.select(Shop.id).where(Shop.active.is_(True)).order_by(Shop.id)
+    ).scalars())
+    return shop_ids
+
+def for_each_shop(app, func: Callable[[Optional[int]], Any], shop_ids: List[Optional[int]] = None,
+                  max_workers: int = None) -> Dict[Optional[int], Any]:
+    """在各自的 app context 中並行執行 func(shop_id)
+
+    回傳 {shop_id: 結果}，失敗的商店對應到例外物件，不影響其他商店。
+    """
+    if shop_ids is None:
+        shop_ids = sync_shop_ids()
+    if not shop_ids:
+        return {}
+
+    def run(shop_id):
+        with app.app_context():
+            try:
+                return func(shop_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Shop {shop_id} task failed")
+                return e
+            finally:
+                db.session.remove()
+
+    workers = min(max_workers or SHOP_SYNC_MAX_WORKERS, len(shop_ids))
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='shop') as executor:
+        return dict(zip(shop_ids, executor.map(run, shop_ids)))
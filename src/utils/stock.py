@@ -0,0 +1,192 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.models import db, Product, StockPush
+from src.utils.change_log import record_changes
+from src.utils.concurrency import map_concurrently
+
+logger = logging.getLogger(__name__)
+
+STOCK_PUSH_BATCH_SIZE = int(os.getenv('STOCK_PUSH_BATCH_SIZE', '100'))
+STOCK_PUSH_MAX_WORKERS = int(os.getenv('STOCK_PUSH_MAX_WORKERS', '4'))
+# 推送失敗後的重試間隔：STOCK_PUSH_BACKOFF_BASE * 2^(失敗次數-1) 秒，最多 STOCK_PUSH_BACKOFF_MAX 秒
+STOCK_PUSH_BACKOFF_BASE = float(os.getenv('STOCK_PUSH_BACKOFF_BASE', '30'))
+STOCK_PUSH_BACKOFF_MAX = float(os.getenv('STOCK_PUSH_BACKOFF_MAX', '3600'))
+# 連續失敗達此次數後移入死信
+STOCK_PUSH_MAX_ATTEMPTS = int(os.getenv('STOCK_PUSH_MAX_ATTEMPTS', '10'))
+
+class StockAdjustmentError(Exception):
+    """庫存調整失敗（商品不存在或庫存不足），整批不會寫入"""
+
+    def __init__(self, failures: List[Dict[str, Any]]):
+        super().__init__('Stock adjustment failed')
+        self.failures = failures
+
+def adjust_stock(deltas: Dict[int, int]) -> List[Tuple[int, int, str]]:
+    """以單一 UPDATE 原子地增減庫存，回傳 [(商品ID, 調整後庫存, 露天商品ID)]
+
+    每個商品執行 `stock = stock + :delta WHERE stock + :delta >= 0`，不需先讀取或鎖定資料列；
+    任一商品失敗時拋出 StockAdjustmentError，呼叫端需 rollback。
+    """
+    results = []
+    failures = []
+    now = datetime.utcnow()
+    # 依主鍵排序，避免多筆批次同時調整時互相等待
+    for product_id in sorted(deltas):
+        delta = deltas[product_id]
+        row = db.session.execute(
+            db.update(Product)
+            .where(Product.id == product_id, Product.stock + delta >= 0)
+            .values(stock=Product.stock + delta, content_hash=None, updated_at=now)
+            .returning(Product.id, Product.stock, Product.ruten_item_id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            exists = db.session.execute(db.select(Product.id).where(Product.id == product_id)).first()
+            failures.append({'product_id': product_id, 'reason': 'insufficient_stock' if exists else 'not_found'})
+            continue
+        results.append(tuple(row))
+
+    if failures:
+        raise StockAdjustmentError(failures)
+
+    record_changes('product', [{'id': product_id, 'stock': stock} for product_id, stock, _ in results])
+    return results
+
+def enqueue_stock_pushes(rows: List[Tuple[int, int, str]]) -> int:
+    """將調整後的庫存排入露天推送佇列，同一商品只保留最新數值"""
+    now = datetime.utcnow()
+    values = [
+        {'product_id': product_id, 'ruten_item_id': ruten_item_id, 'stock': stock, 'attempts': 0,
+         'last_error': None, 'queued_at': now, 'next_attempt_at': now, 'dead_lettered_at': None}
+        for product_id, stock, ruten_item_id in rows if ruten_item_id
+    ]
+    if not values:
+        return 0
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = dialect_insert(StockPush)
+        statement = statement.on_conflict_do_update(
+            index_elements=['product_id'],
+            set_={column: statement.excluded[column]
+                  for column in ('ruten_item_id', 'stock', 'attempts', 'last_error', 'queued_at',
+                                 'next_attempt_at', 'dead_lettered_at')}
+        )
+        db.session.execute(statement, values)
+    else:
+        db.session.execute(db.delete(StockPush).where(StockPush.product_id.in_([v['product_id'] for v in values])))
+        db.session.execute(insert(StockPush), values)
+    return len(values)
+
+def requeue_dead_stock_pushes() -> int:
+    """將死信中的項目重新排入（例如修正商店設定後），回傳筆數"""
+    result = db.session.execute(
+        db.update(StockPush)
+        .where(StockPush.dead_lettered_at.isnot(None))
+        .values(attempts=0, next_attempt_at=datetime.utcnow(), dead_lettered_at=None)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def _is_permanent_failure(result: Dict[str, Any]) -> bool:
+    """露天回報商品不存在（已在露天刪除）時重試不會成功"""
+    return result.get('status_code') == 404 or result.get('error_code') == 'ITEM_NOT_FOUND'
+
+def push_pending_stock(client=None, product_ids: List[int] = None, limit: int = None) -> Dict[str, int]:
+    """將到期的佇列項目庫存推送到露天，成功後移除（推送期間庫存又變動的項目會保留或重新排入）
+
+    未指定 client 時依商品所屬商店選擇客戶端，各商店受各自的速率預算限制。失敗的項目依指數退避
+    延後重試，避免同一批失敗項目一直佔住批次；商品已在露天刪除、商店已停用或連續失敗達
+    STOCK_PUSH_MAX_ATTEMPTS 次的項目移入死信。
+    """
+    from src.utils.shops import ShopNotFound, get_client
+
+    now = datetime.utcnow()
+    # 推送商品目前的庫存，避免佇列中的數值已被後續未推送的調整覆蓋
+    query = (
+        db.select(StockPush.product_id, StockPush.ruten_item_id, Product.stock, StockPush.queued_at,
+                  Product.shop_id, StockPush.attempts)
+        .join(Product, Product.id == StockPush.product_id)
+        .where(
+            StockPush.dead_lettered_at.is_(None),
+            db.or_(StockPush.next_attempt_at.is_(None), StockPush.next_attempt_at <= now)
+        )
+        .order_by(StockPush.next_attempt_at.nulls_first())
+        .limit(limit or STOCK_PUSH_BATCH_SIZE)
+    )
+    if product_ids is not None:
+        query = query.where(StockPush.product_id.in_(product_ids))
+    pending = [tuple(row) for row in db.session.execute(query)]
+    if not pending:
+        db.session.commit()
+        return {'pushed': 0, 'failed': 0, 'dead_lettered': 0}
+
+    clients = {}
+    for shop_id in {entry[4] for entry in pending}:
+        try:
+            clients[shop_id] = client or get_client(shop_id)
+        except Exception as e:
+            clients[shop_id] = e
+    # 推送期間不持有交易
+    db.session.commit()
+
+    def push(entry):
+        """回傳 (錯誤訊息, 是否為永久失敗)，成功時錯誤訊息為 None"""
+        _, ruten_item_id, stock, _, shop_id, _ = entry
+        shop_client = clients[shop_id]
+        if isinstance(shop_client, Exception):
+            return str(shop_client), isinstance(shop_client, ShopNotFound)
+        try:
+            result = shop_client.update_product_stock(ruten_item_id, stock)
+        except Exception as e:
+            return str(e), False
+        if 'error' in result:
+            return result.get('message', 'Failed to update stock on Ruten'), _is_permanent_failure(result)
+        return None, False
+
+    outcomes = map_concurrently(push, pending, max_workers=STOCK_PUSH_MAX_WORKERS)
+
+    counts = {'pushed': 0, 'failed': 0, 'dead_lettered': 0}
+    now = datetime.utcnow()
+    for (product_id, ruten_item_id, stock, queued_at, _, attempts), (error, permanent) in zip(pending, outcomes):
+        if error is None:
+            # 只有推送的數值仍是目前庫存且期間未重新排入時才移除；另一個推送者可能已送出較新的數值，
+            # 本次較舊的數值晚到露天時需重新排入目前庫存，否則露天會停留在舊值
+            db.session.execute(
+                db.delete(StockPush).where(
+                    StockPush.product_id == product_id,
+                    StockPush.queued_at == queued_at,
+                    db.select(Product.stock).where(Product.id == product_id).scalar_subquery() == stock
+                )
+            )
+            current = db.session.execute(db.select(Product.stock).where(Product.id == product_id)).scalar()
+            if current is not None and current != stock:
+                enqueue_stock_pushes([(product_id, current, ruten_item_id)])
+            counts['pushed'] += 1
+            continue
+
+        attempts += 1
+        values = {'attempts': attempts, 'last_error': error}
+        if permanent or attempts >= STOCK_PUSH_MAX_ATTEMPTS:
+            values['dead_lettered_at'] = now
+            counts['dead_lettered'] += 1
+            logger.error(f"Stock push for product {product_id} moved to dead letter after {attempts} attempts: {error}")
+        else:
+            delay = min(STOCK_PUSH_BACKOFF_BASE * 2 ** (attempts - 1), STOCK_PUSH_BACKOFF_MAX)
+            values['next_attempt_at'] = now + timedelta(seconds=delay)
+            logger.warning(f"Failed to push stock for product {product_id}, retrying in {delay:.0f}s: {error}")
+        # 推送期間重新排入的項目是新的數值，保留其重試狀態
+        db.session.execute(
+            db.update(StockPush)
+            .where(StockPush.product_id == product_id, StockPush.queued_at == queued_at)
+            .values(**values)
+        )
+        counts['failed'] += 1
+    db.session.commit()
+    return counts
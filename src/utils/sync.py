@@ -0,0 +1,280 @@
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, insert
+from src.models.models import db, Product, Order, OrderItem, Category
+from src.utils.concurrency import chunked
+from src.utils.leader import lock_for_transaction
+
+logger = logging.getLogger(__name__)
+
+# 支援同步的資源
+SYNC_RESOURCES = ('products', 'orders', 'categories')
+
+# 排程器、同步工作與各資源的 /sync 端點可能同時同步同一資源，
+# 以交易內的 advisory lock 讓「查詢既有資料再新增」依序執行
+PRODUCT_SYNC_LOCK = 'ruten-product-sync'
+ORDER_SYNC_LOCK = 'ruten-order-sync'
+CATEGORY_SYNC_LOCK = 'ruten-category-sync'
+
+class SyncError(Exception):
+    """露天 API 回傳錯誤導致同步失敗"""
+
+def _check_result(result: Dict[str, Any], default_message: str) -> None:
+    if 'error' in result:
+        raise SyncError(result.get('message', default_message))
+
+def _parse_order_date(value: Optional[str]) -> Optional[datetime]:
+    """解析露天訂單日期"""
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y%m%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+def order_item_rows(order_id: int, items_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """將露天訂單商品資料轉為 order_items 資料列"""
+    rows = []
+    for item in items_data or []:
+        if not isinstance(item, dict):
+            continue
+        quantity = item.get('quantity', item.get('qty', 1))
+        price = item.get('price')
+        subtotal = item.get('subtotal')
+        if subtotal is None and price is not None and quantity is not None:
+            try:
+                subtotal = float(price) * int(quantity)
+            except (TypeError, ValueError):
+                subtotal = None
+        rows.append({
+            'order_id': order_id,
+            'ruten_item_id': item.get('item_id'),
+            'title': item.get('title', item.get('item_name')),
+            'price': price,
+            'quantity': quantity,
+            'subtotal': subtotal,
+            'created_at': datetime.utcnow()
+        })
+    return rows
+
+def replace_order_items(items_by_order_id: Dict[int, List[Dict[str, Any]]]) -> int:
+    """以批次刪除再插入的方式更新多筆訂單的商品明細"""
+    if not items_by_order_id:
+        return 0
+
+    rows = []
+    for order_id, items_data in items_by_order_id.items():
+        rows.extend(order_item_rows(order_id, items_data))
+
+    db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(list(items_by_order_id.keys()))))
+    if rows:
+        db.session.execute(insert(OrderItem), rows)
+    return len(rows)
+
+def _sync_rows(model, key_field: str, keyed_records, merge, create, shop_id: int = None) -> Dict[str, Any]:
+    """批次載入既有資料列並比對內容雜湊，只對有變動的資料列寫入
+
+    keyed_records 為 (露天ID, 露天資料) 清單；merge(record, existing) 回傳要寫入的欄位值，
+    create(record) 回傳新的 model 物件。新資料列屬於 shop_id；既有資料列維持原本的商店，
+    尚未屬於任何商店的資料列則歸到 shop_id。
+    """
+    key_column = getattr(model, key_field)
+    keys = list(dict.fromkeys(key for key, _ in keyed_records if key is not None))
+    existing_rows = {}
+    for chunk in chunked(keys, 500):
+        for row in model.query.filter(key_column.in_(chunk)):
+            existing_rows[getattr(row, key_field)] = row
+
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    changed = []
+    for key, record in keyed_records:
+        existing = existing_rows.get(key) if key is not None else None
+
+        if existing is None:
+            row = create(record)
+            row.shop_id = shop_id
+            db.session.add(row)
+            if key is not None:
+                existing_rows[key] = row
+            counts['inserted'] += 1
+            changed.append((row, record))
+            continue
+
+        values = merge(record, existing)
+        claim = shop_id is not None and existing.shop_id is None
+        if existing.content_hash == model.hash_values(values) and not claim:
+            counts['unchanged'] += 1
+            continue
+
+        for field, value in values.items():
+            setattr(existing, field, value)
+        if claim:
+            existing.shop_id = shop_id
+        existing.updated_at = datetime.utcnow()
+        counts['updated'] += 1
+        changed.append((existing, record))
+
+    counts['changed'] = changed
+    return counts
+
+def _sync_counts(counts: Dict[str, Any], fetched: int) -> Dict[str, int]:
+    return {
+        'synced_count': fetched,
+        'fetched': fetched,
+        'inserted': counts['inserted'],
+        'updated': counts['updated'],
+        'unchanged': counts['unchanged']
+    }
+
+def _str_or_none(value):
+    return str(value) if value is not None else None
+
+def sync_products_page(client, page: int = 1, page_size: int = 30, shop_id: int = None) -> Dict[str, int]:
+    """同步一頁露天商品"""
+    result = client.get_products(page=page, page_size=page_size)
+    _check_result(result, 'Failed to fetch products from Ruten')
+
+    products_data = result.get('data', {}).get('products', [])
+
+    def merge(product_data, existing):
+        return {
+            'title': product_data.get('title', existing.title),
+            'price': product_data.get('price', existing.price),
+            'stock': product_data.get('stock', existing.stock),
+            'status': product_data.get('status', existing.status),
+            'custom_no': product_data.get('custom_no', existing.custom_no)
+        }
+
+    def create(product_data):
+        return Product(
+            ruten_item_id=_str_or_none(product_data.get('item_id')),
+            title=product_data.get('title', ''),
+            description=product_data.get('description', ''),
+            price=product_data.get('price', 0),
+            stock=product_data.get('stock', 0),
+            status=product_data.get('status', 'offline'),
+            custom_no=product_data.get('custom_no')
+        )
+
+    # 同時新增同一商品會違反 ruten_item_id 的唯一限制
+    lock_for_transaction(db.session, PRODUCT_SYNC_LOCK)
+    counts = _sync_rows(
+        Product, 'ruten_item_id',
+        [(_str_or_none(product_data.get('item_id')), product_data) for product_data in products_data],
+        merge, create, shop_id=shop_id
+    )
+
+    db.session.commit()
+    return _sync_counts(counts, len(products_data))
+
+def sync_orders_page(client, page: int = 1, page_size: int = 30, start_date: str = None,
+                     end_date: str = None, order_status: str = 'All', shop_id: int = None) -> Dict[str, int]:
+    """同步一頁露天訂單，新增或有變動的訂單會一併更新商品明細"""
+    result = client.get_orders(
+        start_date=start_date,
+        end_date=end_date,
+        order_status=order_status,
+        page=page,
+        page_size=page_size
+    )
+    _check_result(result, 'Failed to fetch orders from Ruten')
+
+    orders_data = result.get('data', {}).get('orders', [])
+
+    def merge(order_data, existing):
+        return {
+            'buyer_name': order_data.get('buyer_name', existing.buyer_name),
+            'total_amount': order_data.get('total_amount', existing.total_amount),
+            'status': order_data.get('status', existing.status),
+            'order_date': _parse_order_date(order_data.get('order_date')) or existing.order_date
+        }
+
+    def create(order_data):
+        return Order(
+            ruten_order_id=_str_or_none(order_data.get('order_id')),
+            buyer_name=order_data.get('buyer_name', ''),
+            total_amount=order_data.get('total_amount', 0),
+            status=order_data.get('status', 'pending'),
+            order_date=_parse_order_date(order_data.get('order_date'))
+        )
+
+    # 分割後的 orders 沒有 ruten_order_id 的唯一限制，未依序執行時會重複建立訂單
+    lock_for_transaction(db.session, ORDER_SYNC_LOCK)
+    counts = _sync_rows(
+        Order, 'ruten_order_id',
+        [(_str_or_none(order_data.get('order_id')), order_data) for order_data in orders_data],
+        merge, create, shop_id=shop_id
+    )
+
+    # 新訂單需先 flush 取得主鍵，再批次寫入商品明細
+    items_by_order = [(order, order_data['items']) for order, order_data in counts['changed'] if 'items' in order_data]
+    if items_by_order:
+        db.session.flush()
+        replace_order_items({order.id: items for order, items in items_by_order})
+
+    db.session.commit()
+    return _sync_counts(counts, len(orders_data))
+
+def sync_categories(client, shop_id: int = None) -> Dict[str, int]:
+    """同步露天分類（分類 API 不分頁）"""
+    result = client.get_categories()
+    _check_result(result, 'Failed to fetch categories from Ruten')
+
+    categories_data = result.get('data', {}).get('categories', [])
+
+    def merge(category_data, existing):
+        return {
+            'name': category_data.get('name', existing.name),
+            'parent_id': category_data.get('parent_id', existing.parent_id)
+        }
+
+    def create(category_data):
+        return Category(
+            ruten_category_id=_str_or_none(category_data.get('category_id')),
+            name=category_data.get('name', ''),
+            parent_id=category_data.get('parent_id')
+        )
+
+    lock_for_transaction(db.session, CATEGORY_SYNC_LOCK)
+    counts = _sync_rows(
+        Category, 'ruten_category_id',
+        [(_str_or_none(category_data.get('category_id')), category_data) for category_data in categories_data],
+        merge, create, shop_id=shop_id
+    )
+
+    db.session.commit()
+    return _sync_counts(counts, len(categories_data))
+
+def sync_resource(resource: str, client, page_size: int = 30, max_pages: int = 1000,
+                  progress: Callable[[int, int], None] = None, shop_id: int = None, **params) -> Dict[str, int]:
+    """逐頁同步整個資源，直到露天回傳的資料不足一頁
+
+    progress(pages_done, rows_written) 會在每頁完成後呼叫。
+    """
+    if resource not in SYNC_RESOURCES:
+        raise ValueError(f"不支援的同步資源：{resource}")
+
+    totals = {'synced_count': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'pages': 0}
+
+    def accumulate(result):
+        for key in ('synced_count', 'inserted', 'updated', 'unchanged'):
+            totals[key] += result[key]
+        totals['pages'] += 1
+        if progress:
+            progress(totals['pages'], totals['inserted'] + totals['updated'])
+
+    if resource == 'categories':
+        accumulate(sync_categories(client, shop_id=shop_id))
+        return totals
+
+    sync_page = sync_products_page if resource == 'products' else sync_orders_page
+    for page in range(1, max_pages + 1):
+        result = sync_page(client, page=page, page_size=page_size, shop_id=shop_id, **params)
+        accumulate(result)
+        if result['fetched'] < page_size:
+            break
+    return totals
@@ -0,0 +1,155 @@
+import os
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from src.models.models import db, SyncJob
+
+logger = logging.getLogger(__name__)
+
+# 超過此秒數沒有心跳的工作視為已中斷（例如 worker 被回收）
+SYNC_JOB_STALE_SECONDS = int(os.getenv('SYNC_JOB_STALE_SECONDS', '300'))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+def _dedupe_key(resource: str, params: Dict[str, Any]) -> str:
+    """相同資源與參數的同步請求共用同一個工作"""
+    return f"{resource}:{json.dumps(params, sort_keys=True)}"
+
+def _expire_stale_jobs(dedupe_key: str) -> None:
+    """釋放心跳逾時的工作，讓新的請求可以重新開始"""
+    cutoff = datetime.utcnow() - timedelta(seconds=SYNC_JOB_STALE_SECONDS)
+    stale = SyncJob.query.filter(
+        SyncJob.dedupe_key == dedupe_key,
+        db.func.coalesce(SyncJob.heartbeat_at, SyncJob.created_at) < cutoff
+    ).all()
+    for job in stale:
+        logger.warning(f"Sync job {job.id} stalled, marking as failed")
+        job.status = 'failed'
+        job.error = 'Job stalled (no heartbeat)'
+        job.dedupe_key = None
+        job.finished_at = datetime.utcnow()
+    if stale:
+        db.session.commit()
+
+def _last_page_count(resource: str):
+    """上一次成功同步的頁數，用於估計剩餘時間"""
+    return db.session.execute(
+        db.select(SyncJob.pages_done)
+        .where(SyncJob.resource == resource, SyncJob.status == 'succeeded')
+        .order_by(SyncJob.finished_at.desc())
+        .limit(1)
+    ).scalar()
+
+def start_job(app, resource: str, params: Dict[str, Any]) -> Tuple[SyncJob, bool]:
+    """建立同步工作並在背景執行；相同的工作正在執行時直接回傳該工作
+
+    回傳 (job, created)。
+    """
+    dedupe_key = _dedupe_key(resource, params)
+    _expire_stale_jobs(dedupe_key)
+
+    existing = SyncJob.query.filter_by(dedupe_key=dedupe_key).first()
+    if existing:
+        return existing, False
+
+    job = SyncJob(
+        id=str(uuid.uuid4()),
+        resource=resource,
+        params=json.dumps(params, sort_keys=True),
+        dedupe_key=dedupe_key,
+        status='queued',
+        pages_estimate=_last_page_count(resource)
+    )
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 其他 worker 同時建立了相同的工作
+        db.session.rollback()
+        existing = SyncJob.query.filter_by(dedupe_key=dedupe_key).first()
+        if existing:
+            return existing, False
+        raise
+
+    threading.Thread(target=run_job, args=(app, job.id), daemon=True, name=f'sync-job-{job.id}').start()
+    return job, True
+
+def _finish_job(job_id: str, status: str, error: str = None) -> bool:
+    """寫入最終狀態；工作已因心跳逾時被標示為失敗（可能已有新的工作接手）時不覆寫"""
+    finished = db.session.execute(
+        db.update(SyncJob)
+        .where(SyncJob.id == job_id, SyncJob.status == 'running')
+        .values(status=status, error=error, dedupe_key=None, finished_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if not finished:
+        logger.warning(f"Sync job {job_id} finished after it was marked as stalled, keeping the stalled status")
+    return bool(finished)
+
+def run_job(app, job_id: str) -> None:
+    """在獨立的 app context 中執行同步工作並回報進度
+
+    未指定 shop_id 時所有商店並行同步，進度為各商店的總和。
+    """
+    from src.utils.shops import for_each_shop, get_client, sync_shop_ids
+    from src.utils.sync import sync_resource
+
+    with app.app_context():
+        job = db.session.get(SyncJob, job_id)
+        params = json.loads(job.params) if job.params else {}
+        resource = job.resource
+        now = datetime.utcnow()
+        started = db.session.execute(
+            db.update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.status == 'queued')
+            .values(status='running', started_at=now, heartbeat_at=now)
+        ).rowcount
+        db.session.commit()
+        if not started:
+            # 尚未開始就已被標示為逾時
+            db.session.remove()
+            return
+
+        progress_lock = threading.Lock()
+        progress_by_shop = {}
+
+        def sync_shop(shop_id):
+            def progress(pages_done, rows_written):
+                with progress_lock:
+                    progress_by_shop[shop_id] = (pages_done, rows_written)
+                    db.session.execute(
+                        db.update(SyncJob)
+                        .where(SyncJob.id == job_id, SyncJob.status == 'running')
+                        .values(
+                            pages_done=sum(pages for pages, _ in progress_by_shop.values()),
+                            rows_written=sum(rows for _, rows in progress_by_shop.values()),
+                            heartbeat_at=datetime.utcnow()
+                        )
+                    )
+                    db.session.commit()
+
+            return sync_resource(resource, get_client(shop_id), page_size=page_size,
+                                 max_pages=int(os.getenv('SYNC_MAX_PAGES', '1000')), progress=progress,
+                                 shop_id=shop_id, **params)
+
+        status, error = 'failed', None
+        try:
+            page_size = int(params.pop('page_size', os.getenv('SYNC_PAGE_SIZE', '30')))
+            shop_ids = [params.pop('shop_id')] if 'shop_id' in params else sync_shop_ids()
+            if not shop_ids:
+                raise ValueError('No Ruten credentials or active shops configured')
+            results = for_each_shop(app, sync_shop, shop_ids)
+            errors = [f"shop {shop_id}: {result}" for shop_id, result in results.items() if isinstance(result, Exception)]
+            status, error = ('failed', '; '.join(errors)) if errors else ('succeeded', None)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"Sync job {job_id} failed")
+            error = str(e)
+        finally:
+            _finish_job(job_id, status, error)
+            db.session.remove()